@@ -0,0 +1,5 @@
+"""
+Benchmarks - Phase 5
+Mesures de performance du CLI (démarrage) et de l'Agent
+(scénarios hors ligne avec un client Anthropic factice: python -m benchmarks)
+"""
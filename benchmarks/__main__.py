@@ -0,0 +1,6 @@
+"""Point d'entrée: python -m benchmarks (voir benchmarks/suite.py)"""
+
+import sys
+from benchmarks.suite import main
+
+sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Client Anthropic factice - Phase 5
+Remplace anthropic.Anthropic pour les benchmarks et les essais hors ligne:
+décisions scriptées, latence configurable, usage de tokens estimé
+
+Usage:
+    client = FakeClient([{"action": "list_files", "parameters": {"path": "."}}], latency=0.5)
+    agent.llm.client = client
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+# Une décision, ou une fonction (messages) -> décision
+Script = Union[Sequence[Dict[str, Any]], Callable[[List[Dict[str, Any]]], Dict[str, Any]]]
+
+
+class FakeTextBlock:
+    """Bloc de texte d'une réponse (content[0].text)"""
+    
+    def __init__(self, text: str):
+        self.type = "text"
+        self.text = text
+
+
+class FakeUsage:
+    """Équivalent de response.usage"""
+    
+    def __init__(self, input_tokens: int, output_tokens: int):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_read_input_tokens = 0
+        self.cache_creation_input_tokens = 0
+
+
+class FakeMessage:
+    """Équivalent de la réponse de messages.create"""
+    
+    def __init__(self, text: str, model: str, usage: FakeUsage):
+        self.content = [FakeTextBlock(text)]
+        self.model = model
+        self.role = "assistant"
+        self.stop_reason = "end_turn"
+        self.usage = usage
+
+
+def decision(action: str, reasoning: str = "Décision scriptée", **parameters: Any) -> Dict[str, Any]:
+    """Décision au format attendu par LLMInterface.parse_response"""
+    return {
+        "reasoning": reasoning,
+        "action": action,
+        "parameters": parameters,
+        "safety_check": "✅ Décision scriptée (client factice)"
+    }
+
+
+class FakeMessages:
+    """Équivalent de client.messages"""
+    
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+    
+    def create(self, **kwargs: Any) -> FakeMessage:
+        return self._client.respond(**kwargs)
+
+
+class FakeClient:
+    """
+    Client factice thread-safe
+    
+    Les décisions d'une liste sont servies en boucle; une fonction reçoit
+    les messages envoyés et retourne la décision. La latence simulée est
+    latency ± jitter secondes.
+    """
+    
+    def __init__(
+        self,
+        script: Script,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            script: Décisions (liste servie en boucle) ou fonction (messages) -> décision
+            latency: Latence moyenne simulée par appel (secondes)
+            jitter: Variation maximale de la latence (secondes)
+            seed: Graine de la variation (reproductibilité)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.messages = FakeMessages(self)
+        self._script = script
+        self._cycle: Optional[Iterator[Dict[str, Any]]] = (
+            None if callable(script) else itertools.cycle(list(script))
+        )
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def _next_decision(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self._cycle is None:
+            return self._script(messages)
+        with self._lock:
+            return next(self._cycle)
+    
+    def respond(self, **kwargs: Any) -> FakeMessage:
+        """Réponse scriptée à un appel messages.create"""
+        messages = kwargs.get("messages", [])
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        text = json.dumps(self._next_decision(messages), ensure_ascii=False)
+        prompt_chars = len(kwargs.get("system", "")) + sum(len(str(m.get("content", ""))) for m in messages)
+        usage = FakeUsage(input_tokens=prompt_chars // 4 + 1, output_tokens=len(text) // 4 + 1)
+        return FakeMessage(text, kwargs.get("model", "fake-model"), usage)
+    
+    def close(self) -> None:
+        pass
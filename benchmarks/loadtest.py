@@ -0,0 +1,463 @@
+"""
+Test de charge - Phase 5
+N sessions d'agent simultanées sur un LLM factice (client en mémoire, serveur
+Messages API local ou cassette), en boucle fermée ou à débit cible, avec débit,
+latences p50/p95/p99 par phase, taux d'erreur, pic de RSS et de descripteurs de fichiers
+Modes d'exécution comparés: threads, processus, asyncio
+
+Usage (via le CLI):
+    python cli.py --sessions 32 --requests 50 --modes thread,process,asyncio loadtest
+    python cli.py --sessions 64 --rate 200 --duration 30 --llm mock --latency-ms 300 loadtest
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_client import FakeClient
+from benchmarks.mock_server import MockMessagesServer, Responder
+from src.approval import StaticApprover
+from src.cassette import CassettePlayer
+from src.rate_limit import configure_scheduler
+from src.router import ModelRouter
+from src.runtime import AgentRuntime
+from src.timing import percentile
+
+logger = logging.getLogger(__name__)
+
+MODES = ("thread", "process", "asyncio")
+BACKENDS = ("fake", "mock", "replay")
+
+# Instructions rejouées par défaut (lecture, listing, métadonnées)
+DEFAULT_INSTRUCTIONS = [
+    "Lister les fichiers",
+    "Lire notes.txt",
+    "Infos sur data/config.json",
+    "Lire data/config.json",
+    "Lister data/",
+]
+
+# Intervalle d'échantillonnage de la RSS et des descripteurs (secondes)
+MONITOR_INTERVAL = 0.05
+
+
+def seed_workspace(path: Path) -> None:
+    """Fichiers lus par les instructions par défaut"""
+    (path / "data").mkdir(parents=True, exist_ok=True)
+    (path / "notes.txt").write_text("Notes de test de charge\n" * 50, encoding="utf-8")
+    (path / "data" / "config.json").write_text('{"workers": 4, "mode": "charge"}\n', encoding="utf-8")
+    for i in range(20):
+        (path / "data" / f"item_{i:02d}.txt").write_text(f"élément {i}\n", encoding="utf-8")
+
+
+def current_rss() -> Optional[int]:
+    """RSS courante du processus (octets), None hors Linux"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def open_fds() -> Optional[int]:
+    """Descripteurs de fichiers ouverts par le processus, None hors Linux"""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+class ResourceMonitor:
+    """Échantillonne RSS et descripteurs dans un thread pendant la mesure (pics)"""
+    
+    def __init__(self, interval: float = MONITOR_INTERVAL):
+        self.interval = interval
+        self.peak_rss: Optional[int] = None
+        self.peak_fds: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-monitor", daemon=True)
+    
+    def sample(self) -> None:
+        rss, fds = current_rss(), open_fds()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+        if fds is not None:
+            self.peak_fds = max(self.peak_fds or 0, fds)
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+    
+    def __enter__(self) -> "ResourceMonitor":
+        self.sample()
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def build_transport(config: Dict[str, Any]) -> Optional[Any]:
+    """Transport des appels API selon le backend (None = client Anthropic vers le serveur factice)"""
+    if config["llm"] == "fake":
+        responder = Responder()
+        return FakeClient(
+            lambda messages: responder.decision({"messages": messages}),
+            latency=config["latency_ms"] / 1000.0
+        )
+    if config["llm"] == "replay":
+        return CassettePlayer(config["cassette"], latency_scale=1.0)
+    return None
+
+
+def build_runtime(config: Dict[str, Any], workers: int) -> AgentRuntime:
+    return AgentRuntime(
+        max_workers=workers,
+        approver=StaticApprover(answer=False),
+        router=ModelRouter(tiers=[os.getenv("MODEL_NAME", "claude-3-5-haiku-20241022")]),
+        transport=build_transport(config)
+    )
+
+
+def session_workspace(config: Dict[str, Any], index: int) -> str:
+    root = Path(config["root"])
+    return str(root / f"session-{index:03d}" if config["isolate"] else root / "shared")
+
+
+def schedule(config: Dict[str, Any], index: int, sent: int, start: float) -> Optional[float]:
+    """
+    Instant prévu de la requête suivante d'une session (perf_counter)
+    
+    Returns:
+        None si la session a terminé (nombre de requêtes ou durée atteints)
+    """
+    if config["requests"] and sent >= config["requests"]:
+        return None
+    if config["rate"]:
+        # Débit cible: requêtes réparties entre les sessions, décalées d'une session à l'autre
+        interval = config["sessions"] / config["rate"]
+        at = start + (sent + index / config["sessions"]) * interval
+    else:
+        at = time.perf_counter()
+    if config["duration"] and at - start >= config["duration"]:
+        return None
+    return at
+
+
+def run_request(agent: Any, instruction: str, scheduled: float) -> Dict[str, Any]:
+    """Une requête; la latence part de l'instant prévu (l'attente d'un worker saturé compte)"""
+    try:
+        result = agent.process_request(instruction)
+        ok = result["status"] == "success"
+        return {
+            "latency": time.perf_counter() - scheduled,
+            "ok": ok,
+            "error": None if ok else str(result["execution_result"].get("error", result["action"]))[:120],
+            "timings": result.get("timings", {})
+        }
+    except Exception as e:
+        return {"latency": time.perf_counter() - scheduled, "ok": False, "error": str(e)[:120], "timings": {}}
+
+
+def run_session_sync(
+    runtime: AgentRuntime,
+    config: Dict[str, Any],
+    index: int,
+    start: float
+) -> List[Dict[str, Any]]:
+    """Boucle d'une session (threads et processus)"""
+    agent = runtime.session(f"load-{index}", working_dir=session_workspace(config, index))
+    instructions = config["instructions"]
+    records = []
+    sent = 0
+    while True:
+        at = schedule(config, index, sent, start)
+        if at is None:
+            return records
+        delay = at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        # Conversation courte: chaque requête repart d'une conversation vide
+        agent.llm.reset_conversation()
+        records.append(run_request(agent, instructions[(index + sent) % len(instructions)], at))
+        sent += 1
+
+
+async def run_session_async(
+    runtime: AgentRuntime,
+    executor: ThreadPoolExecutor,
+    config: Dict[str, Any],
+    index: int,
+    start: float
+) -> List[Dict[str, Any]]:
+    """Boucle d'une session (asyncio: attente sur la boucle, agent dans l'exécuteur)"""
+    loop = asyncio.get_running_loop()
+    agent = runtime.session(f"load-{index}", working_dir=session_workspace(config, index))
+    instructions = config["instructions"]
+    records = []
+    sent = 0
+    while True:
+        at = schedule(config, index, sent, start)
+        if at is None:
+            return records
+        delay = at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        agent.llm.reset_conversation()
+        instruction = instructions[(index + sent) % len(instructions)]
+        records.append(await loop.run_in_executor(executor, run_request, agent, instruction, at))
+        sent += 1
+
+
+def _run_threads(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    runtime = build_runtime(config, config["sessions"])
+    try:
+        start = time.perf_counter()
+        futures = [
+            runtime.submit(run_session_sync, runtime, config, index, start)
+            for index in range(config["sessions"])
+        ]
+        return [record for future in futures for record in future.result()]
+    finally:
+        runtime.close()
+
+
+def _run_asyncio(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    runtime = build_runtime(config, 1)
+    executor = ThreadPoolExecutor(max_workers=config["sessions"], thread_name_prefix="loadtest")
+    
+    async def run_all() -> List[List[Dict[str, Any]]]:
+        start = time.perf_counter()
+        return await asyncio.gather(*(
+            run_session_async(runtime, executor, config, index, start)
+            for index in range(config["sessions"])
+        ))
+    
+    try:
+        return [record for records in asyncio.run(run_all()) for record in records]
+    finally:
+        executor.shutdown(wait=True)
+        runtime.close()
+
+
+def _process_session(config: Dict[str, Any], index: int, start_at: float) -> Dict[str, Any]:
+    """Une session dans un processus enfant (runtime, client et caches propres)"""
+    logging.disable(logging.CRITICAL)
+    configure_scheduler(None)
+    runtime = build_runtime(config, 1)
+    with ResourceMonitor() as monitor:
+        # Départ commun: les processus démarrent à des instants différents
+        time.sleep(max(0.0, start_at - time.time()))
+        records = run_session_sync(runtime, config, index, time.perf_counter())
+        ended_at = time.time()
+        runtime.close()
+    return {"records": records, "ended_at": ended_at, "peak_rss": monitor.peak_rss, "peak_fds": monitor.peak_fds}
+
+
+def _run_processes(config: Dict[str, Any]) -> Dict[str, Any]:
+    start_at = time.time() + 1.0
+    with ProcessPoolExecutor(max_workers=config["sessions"]) as pool:
+        futures = [pool.submit(_process_session, config, index, start_at) for index in range(config["sessions"])]
+        outputs = [future.result() for future in futures]
+    return {
+        "records": [record for output in outputs for record in output["records"]],
+        # Du départ commun à la fin de la dernière session
+        "wall": max(output["ended_at"] for output in outputs) - start_at,
+        # Pics des enfants additionnés: borne haute de l'empreinte simultanée
+        "peak_rss": sum(output["peak_rss"] or 0 for output in outputs) or None,
+        "peak_fds": sum(output["peak_fds"] or 0 for output in outputs) or None
+    }
+
+
+def summarize(records: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    """Débit, latences (totales et par phase) et erreurs d'un ensemble de requêtes"""
+    latencies = sorted(record["latency"] for record in records)
+    phases: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in records:
+        for name, duration in record["timings"].items():
+            phases.setdefault(name, []).append(duration)
+        if not record["ok"]:
+            errors[record["error"]] = errors.get(record["error"], 0) + 1
+    
+    def distribution(values: List[float]) -> Dict[str, float]:
+        values = sorted(values)
+        return {
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99)
+        } if values else {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    
+    error_count = sum(errors.values())
+    return {
+        "requests": len(records),
+        "errors": error_count,
+        "error_rate": error_count / len(records) if records else 0.0,
+        "top_errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+        "wall_time": wall,
+        "throughput": len(records) / wall if wall > 0 else 0.0,
+        "latency": distribution(latencies),
+        "phases": {name: distribution(values) for name, values in sorted(phases.items())}
+    }
+
+
+def run_mode(mode: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Exécute le test de charge dans un mode
+    
+    Returns:
+        Résumé (summarize) complété de mode, peak_rss (octets) et peak_fds
+    """
+    logger.info("[LoadTest] Mode %s: %s sessions", mode, config['sessions'])
+    if mode == "process":
+        output = _run_processes(config)
+        wall = output["wall"]
+        peak_rss, peak_fds, records = output["peak_rss"], output["peak_fds"], output["records"]
+    else:
+        with ResourceMonitor() as monitor:
+            start = time.perf_counter()
+            records = _run_threads(config) if mode == "thread" else _run_asyncio(config)
+            wall = time.perf_counter() - start
+        peak_rss, peak_fds = monitor.peak_rss, monitor.peak_fds
+    summary = summarize(records, max(wall, 1e-9))
+    summary.update({"mode": mode, "peak_rss": peak_rss, "peak_fds": peak_fds})
+    return summary
+
+
+def run_loadtest(
+    modes: List[str],
+    sessions: int = 8,
+    requests: Optional[int] = 20,
+    duration: Optional[float] = None,
+    rate: Optional[float] = None,
+    llm: str = "fake",
+    latency_ms: float = 0.0,
+    cassette: Optional[str] = None,
+    base_url: Optional[str] = None,
+    isolate: bool = False,
+    instructions: Optional[List[str]] = None,
+    working_dir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Test de charge dans chacun des modes demandés
+    
+    Args:
+        modes: Modes d'exécution (thread, process, asyncio)
+        sessions: Sessions d'agent simultanées
+        requests: Requêtes par session (None: jusqu'à duration)
+        duration: Durée maximale de la mesure (secondes)
+        rate: Débit cible total (requêtes/s); None = boucle fermée (enchaînement immédiat)
+        llm: fake (client en mémoire), mock (serveur Messages API local) ou replay (cassette)
+        latency_ms: Latence simulée du LLM (fake, mock)
+        cassette: Cassette rejouée (replay)
+        base_url: Serveur Messages API déjà lancé (mock; sinon démarré ici)
+        isolate: Un espace de travail par session (sinon un espace partagé)
+        instructions: Instructions rejouées en boucle (défaut: DEFAULT_INSTRUCTIONS)
+        working_dir: Racine des espaces de travail (défaut: répertoire temporaire)
+    
+    Raises:
+        ValueError: Si la configuration est incohérente
+    """
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ValueError(f"Mode inconnu: {', '.join(unknown)} (attendu: {', '.join(MODES)})")
+    if llm not in BACKENDS:
+        raise ValueError(f"Backend inconnu: {llm} (attendu: {', '.join(BACKENDS)})")
+    if llm == "replay" and not cassette:
+        raise ValueError("--llm replay nécessite une cassette (--replay)")
+    if not requests and not duration:
+        raise ValueError("Indiquer un nombre de requêtes par session ou une durée")
+    
+    configure_scheduler(None)
+    server = None
+    if llm == "mock" and not base_url:
+        server = MockMessagesServer(latency_ms=latency_ms).start()
+        base_url = server.url
+    if base_url:
+        # Hérité par les processus enfants (create_client lit ANTHROPIC_BASE_URL)
+        os.environ["ANTHROPIC_BASE_URL"] = base_url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "loadtest")
+    
+    temporary = tempfile.TemporaryDirectory() if working_dir is None else None
+    root = Path(working_dir or temporary.name)
+    config = {
+        "sessions": max(1, sessions),
+        "requests": requests,
+        "duration": duration,
+        "rate": rate,
+        "llm": llm,
+        "latency_ms": latency_ms,
+        "cassette": cassette,
+        "isolate": isolate,
+        "instructions": instructions or DEFAULT_INSTRUCTIONS,
+        "root": str(root)
+    }
+    try:
+        workspaces = (
+            [root / f"session-{index:03d}" for index in range(config["sessions"])]
+            if isolate else [root / "shared"]
+        )
+        for workspace in workspaces:
+            seed_workspace(workspace)
+        return [run_mode(mode, config) for mode in modes]
+    finally:
+        if server is not None:
+            server.stop()
+        if temporary is not None:
+            temporary.cleanup()
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    """Tableau comparatif des modes (une colonne par mode)"""
+    def ms(value: float) -> str:
+        return f"{value * 1000:.1f}ms"
+    
+    def mib(value: Optional[int]) -> str:
+        return f"{value / (1024 * 1024):.1f}Mo" if value else "-"
+    
+    rows = [
+        ("requêtes", [str(result["requests"]) for result in results]),
+        ("débit", [f"{result['throughput']:.1f}/s" for result in results]),
+        ("erreurs", [f"{result['errors']} ({result['error_rate'] * 100:.1f}%)" for result in results]),
+        ("latence p50", [ms(result["latency"]["p50"]) for result in results]),
+        ("latence p95", [ms(result["latency"]["p95"]) for result in results]),
+        ("latence p99", [ms(result["latency"]["p99"]) for result in results]),
+    ]
+    phases = sorted({name for result in results for name in result["phases"]})
+    for name in phases:
+        rows.append((
+            f"{name} p50/p95/p99",
+            [
+                "/".join(ms(result["phases"][name][q]) for q in ("p50", "p95", "p99"))
+                if name in result["phases"] else "-"
+                for result in results
+            ]
+        ))
+    rows.append(("pic RSS", [mib(result["peak_rss"]) for result in results]))
+    rows.append(("pic descripteurs", [str(result["peak_fds"] or "-") for result in results]))
+    
+    label_width = max(len(label) for label, _ in rows) + 2
+    width = max(24, *(len(value) + 2 for _, values in rows for value in values))
+    lines = ["", "📈 TEST DE CHARGE", "=" * (label_width + width * len(results))]
+    lines.append(" " * label_width + "".join(f"{result['mode']:>{width}}" for result in results))
+    lines.append("-" * (label_width + width * len(results)))
+    for label, values in rows:
+        lines.append(f"{label:<{label_width}}" + "".join(f"{value:>{width}}" for value in values))
+    for result in results:
+        for error, count in result["top_errors"].items():
+            lines.append(f"❌ [{result['mode']}] {count}× {error}")
+    lines.append("=" * (label_width + width * len(results)))
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    sys.exit("Utiliser: python cli.py loadtest (voir python cli.py loadtest --help)")
@@ -0,0 +1,418 @@
+"""
+Serveur Messages API factice - Phase 5
+Remplace l'API Anthropic en local pour les tests de charge: POST /v1/messages
+(réponse JSON ou flux SSE identiques au format du SDK), décisions scriptées ou
+dérivées de l'instruction, latence selon une distribution, erreurs 429 et 529 injectées
+
+Usage:
+    python -m benchmarks.mock_server --port 8089 --latency-ms 300 --distribution lognormal --rate-429 0.05
+    ANTHROPIC_API_KEY=test python cli.py --base-url http://127.0.0.1:8089 "Lister les fichiers"
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.context import extract_paths  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Début du contexte d'historique ajouté à l'instruction (voir src.context)
+CONTEXT_MARKER = "\n\nCONTEXTE D'HISTORIQUE"
+
+# Taille des fragments de texte d'un flux SSE
+STREAM_CHUNK_CHARS = 16
+
+
+def last_instruction(body: Dict[str, Any]) -> str:
+    """Dernière instruction utilisateur d'une requête, sans contexte d'historique"""
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") != "user":
+            continue
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        return str(content).split(CONTEXT_MARKER, 1)[0]
+    return ""
+
+
+def _render(value: Any, variables: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace("{" + name + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {key: _render(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, variables) for item in value]
+    return value
+
+
+def load_script(path: str) -> List[Dict[str, Any]]:
+    """Décisions d'un fichier JSONL (une décision par ligne)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Responder:
+    """
+    Décisions du serveur
+    
+    Avec un script, les décisions sont servies en boucle; les chaînes peuvent
+    contenir {instruction} et {path} (premier chemin cité par l'instruction).
+    Sans script: read_file du premier chemin cité, sinon list_files du répertoire courant.
+    """
+    
+    def __init__(self, script: Optional[List[Dict[str, Any]]] = None):
+        self._cycle: Optional[Iterator[Dict[str, Any]]] = itertools.cycle(script) if script else None
+        self._lock = threading.Lock()
+    
+    def decision(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        instruction = last_instruction(body)
+        paths = extract_paths(instruction)
+        if self._cycle is not None:
+            with self._lock:
+                template = next(self._cycle)
+            return _render(template, {"instruction": instruction, "path": paths[0] if paths else "."})
+        if paths:
+            action, parameters = "read_file", {"path": paths[0]}
+        else:
+            action, parameters = "list_files", {"path": "."}
+        return {
+            "reasoning": f"Décision du serveur factice pour: {instruction[:80]}",
+            "action": action,
+            "parameters": parameters,
+            "safety_check": "✅ Décision du serveur factice"
+        }
+
+
+class MockStats:
+    """Compteurs du serveur (thread-safe)"""
+    
+    def __init__(self):
+        self.counts: Dict[str, int] = {
+            "requests": 0, "ok": 0, "streamed": 0, "rate_limited": 0, "overloaded": 0, "bad_request": 0
+        }
+        self.connections = 0
+        self._lock = threading.Lock()
+    
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+    
+    def connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+    
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts, connections=self.connections)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # File d'attente de connexions à la hauteur de centaines de clients simultanés
+    request_queue_size = 512
+    daemon_threads = True
+
+
+class MockMessagesServer:
+    """
+    Serveur HTTP/1.1 (connexions persistantes, un thread par connexion)
+    
+    Exemple:
+        server = MockMessagesServer(latency_ms=200, rate_429=0.05).start()
+        os.environ["ANTHROPIC_BASE_URL"] = server.url
+        ...
+        server.stop()
+    """
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        responder: Optional[Responder] = None,
+        latency_ms: float = 0.0,
+        distribution: str = "fixed",
+        sigma: float = 0.5,
+        token_delay_ms: float = 0.0,
+        rate_429: float = 0.0,
+        rate_529: float = 0.0,
+        retry_after_ms: int = 100,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            host, port: Adresse d'écoute (port 0 = port libre choisi par le système)
+            responder: Décisions servies (défaut: dérivées de l'instruction)
+            latency_ms: Latence moyenne avant la réponse (ou le premier événement SSE)
+            distribution: fixed, uniform (0 à 2×moyenne), exponential ou lognormal
+            sigma: Écart-type du logarithme pour la distribution lognormal
+            token_delay_ms: Délai entre deux fragments d'un flux SSE
+            rate_429: Proportion de réponses 429 rate_limit_error
+            rate_529: Proportion de réponses 529 overloaded_error
+            retry_after_ms: Délai annoncé par les en-têtes retry-after des erreurs
+            seed: Graine du tirage (latences et erreurs reproductibles)
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Distribution inconnue: {distribution} (attendu: {', '.join(DISTRIBUTIONS)})")
+        self.responder = responder or Responder()
+        self.latency = latency_ms / 1000.0
+        self.distribution = distribution
+        self.sigma = sigma
+        self.token_delay = token_delay_ms / 1000.0
+        self.rate_429 = rate_429
+        self.rate_529 = rate_529
+        self.retry_after_ms = retry_after_ms
+        self.stats = MockStats()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = _HTTPServer((host, port), self._handler_class())
+    
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def sample_latency(self) -> float:
+        """Latence d'une réponse selon la distribution (secondes)"""
+        if self.latency <= 0:
+            return 0.0
+        with self._random_lock:
+            if self.distribution == "uniform":
+                return self._random.uniform(0.0, 2 * self.latency)
+            if self.distribution == "exponential":
+                return self._random.expovariate(1.0 / self.latency)
+            if self.distribution == "lognormal":
+                # Moyenne conservée: mu = ln(moyenne) - sigma²/2
+                mu = math.log(self.latency) - self.sigma ** 2 / 2
+                return self._random.lognormvariate(mu, self.sigma)
+            return self.latency
+    
+    def sample_error(self) -> Optional[int]:
+        """Code d'erreur à injecter (429, 529) ou None"""
+        with self._random_lock:
+            draw = self._random.random()
+        if draw < self.rate_429:
+            return 429
+        if draw < self.rate_429 + self.rate_529:
+            return 529
+        return None
+    
+    def _handler_class(self) -> type:
+        server = self
+        
+        class Handler(MockHandler):
+            mock = server
+        
+        return Handler
+    
+    def start(self) -> "MockMessagesServer":
+        """Sert en arrière-plan (thread démon)"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+    
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Requêtes /v1/messages et /stats"""
+    
+    protocol_version = "HTTP/1.1"
+    mock: MockMessagesServer
+    
+    def setup(self) -> None:
+        super().setup()
+        self.mock.stats.connection()
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("[MockServer] %s " + format, self.address_string(), *args)
+    
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:16]}")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_error(self, status: int, error_type: str, message: str) -> None:
+        headers = {}
+        if status in (429, 529):
+            headers = {
+                "retry-after-ms": str(self.mock.retry_after_ms),
+                "retry-after": str(max(1, math.ceil(self.mock.retry_after_ms / 1000)))
+            }
+        self._send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, headers)
+    
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.mock.stats.snapshot())
+        else:
+            self._send_error(404, "not_found_error", f"Chemin inconnu: {self.path}")
+    
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.path.split("?", 1)[0].rstrip("/") != "/v1/messages":
+            self._send_error(404, "not_found_error", f"Chemin inconnu: {self.path}")
+            return
+        self.mock.stats.add("requests")
+        try:
+            body = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            self.mock.stats.add("bad_request")
+            self._send_error(400, "invalid_request_error", "Corps JSON invalide")
+            return
+        
+        error = self.mock.sample_error()
+        if error == 429:
+            self.mock.stats.add("rate_limited")
+            self._send_error(429, "rate_limit_error", "Limite de débit atteinte (serveur factice)")
+            return
+        if error == 529:
+            self.mock.stats.add("overloaded")
+            self._send_error(529, "overloaded_error", "Surcharge (serveur factice)")
+            return
+        
+        delay = self.mock.sample_latency()
+        if delay > 0:
+            time.sleep(delay)
+        
+        text = json.dumps(self.mock.responder.decision(body), ensure_ascii=False)
+        prompt_chars = len(str(body.get("system", ""))) + sum(
+            len(str(message.get("content", ""))) for message in body.get("messages", [])
+        )
+        message = {
+            "id": f"msg_mock_{uuid.uuid4().hex[:16]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock-model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": prompt_chars // 4 + 1, "output_tokens": len(text) // 4 + 1}
+        }
+        if body.get("stream"):
+            self.mock.stats.add("streamed")
+            self._stream(message)
+        else:
+            self._send_json(200, message)
+        self.mock.stats.add("ok")
+    
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+    
+    def _event(self, name: str, payload: Dict[str, Any]) -> None:
+        data = json.dumps({"type": name, **payload}, ensure_ascii=False)
+        self._write_chunk(f"event: {name}\ndata: {data}\n\n".encode("utf-8"))
+    
+    def _stream(self, message: Dict[str, Any]) -> None:
+        """Flux SSE au format du SDK (message_start … message_stop), en transfert chunked"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("request-id", f"req_mock_{uuid.uuid4().hex[:16]}")
+        self.end_headers()
+        
+        text = message["content"][0]["text"]
+        usage = message["usage"]
+        start = dict(
+            message,
+            content=[],
+            stop_reason=None,
+            usage={"input_tokens": usage["input_tokens"], "output_tokens": 1}
+        )
+        self._event("message_start", {"message": start})
+        self._event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        self._event("ping", {})
+        for offset in range(0, len(text), STREAM_CHUNK_CHARS):
+            if self.mock.token_delay > 0:
+                time.sleep(self.mock.token_delay)
+            self._event("content_block_delta", {
+                "index": 0,
+                "delta": {"type": "text_delta", "text": text[offset:offset + STREAM_CHUNK_CHARS]}
+            })
+        self._event("content_block_stop", {"index": 0})
+        self._event("message_delta", {
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]}
+        })
+        self._event("message_stop", {})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.mock_server", description="Serveur Messages API factice")
+    parser.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute")
+    parser.add_argument("--port", type=int, default=8089, help="Port d'écoute")
+    parser.add_argument("--script", help="Décisions JSONL servies en boucle ({instruction}, {path} remplacés)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence moyenne (ms)")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="fixed", help="Distribution des latences")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Dispersion de la distribution lognormal")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="Délai entre fragments SSE (ms)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Proportion de réponses 429")
+    parser.add_argument("--rate-529", type=float, default=0.0, help="Proportion de réponses 529 (surcharge)")
+    parser.add_argument("--retry-after-ms", type=int, default=100, help="Délai annoncé par retry-after")
+    parser.add_argument("--seed", type=int, help="Graine du tirage aléatoire")
+    parser.add_argument("--verbose", action="store_true", help="Journaliser chaque requête")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+    server = MockMessagesServer(
+        host=args.host,
+        port=args.port,
+        responder=Responder(load_script(args.script) if args.script else None),
+        latency_ms=args.latency_ms,
+        distribution=args.distribution,
+        sigma=args.sigma,
+        token_delay_ms=args.token_delay_ms,
+        rate_429=args.rate_429,
+        rate_529=args.rate_529,
+        retry_after_ms=args.retry_after_ms,
+        seed=args.seed
+    )
+    print(f"🧪 Serveur factice: {server.url}/v1/messages (statistiques: {server.url}/stats)")
+    print(f"   ANTHROPIC_API_KEY=test python cli.py --base-url {server.url} \"Lister les fichiers\"")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n📊 {json.dumps(server.stats.snapshot())}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark de démarrage - Phase 5
+Mesure le temps d'import du CLI et le temps de réponse des commandes locales
+(--help, history, premier prompt interactif), chacune dans un processus neuf
+
+Usage:
+    python benchmarks/startup.py [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+CLI = str(ROOT / "cli.py")
+
+IMPORT_SNIPPET = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import cli\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(elapsed, 'anthropic' in sys.modules)\n"
+)
+
+
+def _env() -> Dict[str, str]:
+    """Environnement sans clé API: les chemins mesurés ne doivent pas en dépendre"""
+    env = dict(os.environ)
+    env.pop("ANTHROPIC_API_KEY", None)
+    env["PYTHONUNBUFFERED"] = "1"
+    env["AGENT_SOCKET"] = os.path.join(tempfile.gettempdir(), "agent-cli-benchmark-none.sock")
+    return env
+
+
+def measure_import() -> float:
+    """Temps d'import du module cli (dans le processus, hors démarrage interpréteur)"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    ).stdout.split()
+    if output[1] == "True":
+        print("⚠️  Le SDK anthropic est importé au démarrage du CLI", file=sys.stderr)
+    return float(output[0])
+
+
+def measure_command(args: List[str]) -> Callable[[], float]:
+    """Temps total (processus compris) d'une commande CLI"""
+    def run() -> float:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, CLI] + args,
+            cwd=ROOT, env=_env(), capture_output=True, check=True
+        )
+        return time.perf_counter() - start
+    return run
+
+
+def measure_first_prompt(working_dir: str) -> float:
+    """Temps jusqu'à l'affichage du premier prompt du mode interactif"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, CLI, "--working-dir", working_dir, "interactive"],
+        cwd=ROOT, env=_env(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    buffer = b""
+    while b"Assistant>" not in buffer:
+        chunk = process.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError("Le mode interactif s'est terminé avant le prompt")
+        buffer += chunk
+    elapsed = time.perf_counter() - start
+    process.communicate(b"exit\n", timeout=10)
+    return elapsed
+
+
+def report(name: str, samples: List[float]) -> None:
+    print(
+        f"  {name:<22} médiane {statistics.median(samples) * 1000:8.1f}ms | "
+        f"min {min(samples) * 1000:8.1f}ms | max {max(samples) * 1000:8.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de démarrage du CLI")
+    parser.add_argument("--runs", type=int, default=10, help="Nombre de mesures par scénario")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as working_dir:
+        scenarios = {
+            "import cli": measure_import,
+            "python cli.py --help": measure_command(["--help"]),
+            "python cli.py history": measure_command(["history"]),
+            "premier prompt": lambda: measure_first_prompt(working_dir)
+        }
+        print(f"\n⏱️  Démarrage du CLI ({args.runs} mesures par scénario)")
+        print("-" * 72)
+        for name, scenario in scenarios.items():
+            report(name, [scenario() for _ in range(args.runs)])
+        print("-" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Suite de benchmarks hors ligne - Phase 5
+Scénarios de bout en bout (Agent complet, client Anthropic factice) avec
+débit, percentiles de latence et pic mémoire, comparés à un fichier de référence
+
+Usage:
+    python -m benchmarks                       # tous les scénarios
+    python -m benchmarks --quick --scenario single_read --scenario listing_10k
+    python -m benchmarks --save-baseline       # enregistre la référence
+"""
+
+import argparse
+import gc
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_client import FakeClient, Script, decision  # noqa: E402
+from src.agent import Agent  # noqa: E402
+from src.approval import StaticApprover  # noqa: E402
+from src.rate_limit import configure_scheduler  # noqa: E402
+from src.router import ModelRouter  # noqa: E402
+from src.timing import percentile  # noqa: E402
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+
+# Opération mesurée et nettoyage du scénario
+Prepared = Tuple[Callable[[], None], Callable[[], None]]
+
+
+def make_agent(
+    working_dir: str,
+    script: Script,
+    latency: float = 0.0,
+    history_file: Optional[str] = None
+) -> Agent:
+    """Agent complet branché sur un client factice (un seul niveau de modèle, aucune limite de débit)"""
+    agent = Agent(
+        working_dir=working_dir,
+        history_file=history_file,
+        approver=StaticApprover(answer=False),
+        router=ModelRouter(tiers=["fake-model"])
+    )
+    agent.llm.client = FakeClient(script, latency=latency)
+    return agent
+
+
+def one_shot(agent: Agent, instruction: str) -> Callable[[], None]:
+    """Instruction indépendante (conversation remise à zéro, comme en one-shot/daemon)"""
+    def op() -> None:
+        agent.llm.reset_conversation()
+        result = agent.process_request(instruction)
+        if result["status"] != "success":
+            raise RuntimeError(f"Échec du scénario: {result['execution_result']}")
+    return op
+
+
+def setup_single_read(working_dir: str, latency: float) -> Prepared:
+    Path(working_dir, "notes.txt").write_text("Bonjour le monde\n" * 64, encoding="utf-8")
+    agent = make_agent(working_dir, [decision("read_file", path="notes.txt")], latency)
+    return one_shot(agent, "Lire notes.txt"), agent.close
+
+
+def setup_large_read(working_dir: str, latency: float) -> Prepared:
+    Path(working_dir, "big.txt").write_text("ligne de données volumineuse\n" * 300_000, encoding="utf-8")
+    agent = make_agent(working_dir, [decision("read_file", path="big.txt")], latency)
+    return one_shot(agent, "Lire big.txt"), agent.close
+
+
+def setup_big_edit(working_dir: str, latency: float) -> Prepared:
+    content = "contenu réécrit\n" * 250_000
+    Path(working_dir, "big.txt").write_text(content, encoding="utf-8")
+    agent = make_agent(working_dir, [decision("edit_file", path="big.txt", content=content)], latency)
+    return one_shot(agent, "Modifier big.txt"), agent.close
+
+
+def setup_listing(working_dir: str, latency: float) -> Prepared:
+    directory = Path(working_dir, "many")
+    directory.mkdir()
+    for i in range(10_000):
+        (directory / f"file_{i:05d}.txt").touch()
+    agent = make_agent(working_dir, [decision("list_files", path="many")], latency)
+    return one_shot(agent, "Lister many/"), agent.close
+
+
+def setup_command(working_dir: str, latency: float) -> Prepared:
+    agent = make_agent(working_dir, [decision("execute_command", command='echo "bonjour"')], latency)
+    return one_shot(agent, "Afficher bonjour"), agent.close
+
+
+def setup_history(working_dir: str, latency: float) -> Prepared:
+    agent = make_agent(
+        working_dir,
+        [decision("get_working_directory")],
+        latency,
+        history_file=str(Path(working_dir, "history.jsonl"))
+    )
+    return one_shot(agent, "Répertoire courant"), agent.close
+
+
+def setup_interactive(working_dir: str, latency: float) -> Prepared:
+    for name in ("a.txt", "b.txt", "c.txt"):
+        Path(working_dir, name).write_text(f"Contenu de {name}\n" * 20, encoding="utf-8")
+    script = [
+        decision("read_file", path="a.txt"),
+        decision("list_files", path="."),
+        decision("get_file_info", path="b.txt"),
+        decision("read_file", path="c.txt"),
+        decision("create_file", path="notes.txt", content="Notes de session\n")
+    ]
+    agent = make_agent(working_dir, script, latency)
+    instructions = ["Lire a.txt", "Lister", "Infos b.txt", "Lire c.txt", "Noter dans notes.txt"]
+    turn = [0]
+    
+    # Conversation continue: l'historique et le contexte grandissent à chaque tour
+    def op() -> None:
+        result = agent.process_request(instructions[turn[0] % len(instructions)])
+        turn[0] += 1
+        if result["status"] != "success":
+            raise RuntimeError(f"Échec du scénario: {result['execution_result']}")
+    return op, agent.close
+
+
+# nom -> (description, opérations, opérations en mode --quick, préparation)
+SCENARIOS: Dict[str, Tuple[str, int, int, Callable[[str, float], Prepared]]] = {
+    "single_read": ("Lecture d'un petit fichier", 500, 100, setup_single_read),
+    "large_read": ("Lecture d'un fichier de 8 Mo", 20, 5, setup_large_read),
+    "big_edit": ("Édition d'un fichier de 4 Mo", 10, 3, setup_big_edit),
+    "listing_10k": ("Listing d'un répertoire de 10 000 entrées", 30, 5, setup_listing),
+    "command": ("Exécution d'une commande (echo)", 50, 10, setup_command),
+    "history_10k": ("Historique persistant jusqu'à 10 000 actions", 10_000, 1_000, setup_history),
+    "interactive_session": ("Session interactive continue", 500, 100, setup_interactive),
+}
+
+
+def run_scenario(name: str, ops: int, latency: float, memory: bool = True) -> Dict[str, Any]:
+    """
+    Exécute un scénario dans un répertoire temporaire neuf
+    
+    Returns:
+        Dict avec ops, ops_per_sec, p50_ms, p95_ms, p99_ms et peak_mib (None sans mesure mémoire)
+    """
+    _, _, _, setup = SCENARIOS[name]
+    latencies: List[float] = []
+    with tempfile.TemporaryDirectory() as working_dir:
+        op, teardown = setup(working_dir, latency)
+        try:
+            op()  # préchauffage (imports, client, caches)
+            gc.collect()
+            start = time.perf_counter()
+            for _ in range(ops):
+                op_start = time.perf_counter()
+                op()
+                latencies.append(time.perf_counter() - op_start)
+            wall = time.perf_counter() - start
+        finally:
+            teardown()
+    
+    peak_mib = None
+    if memory:
+        # Passe séparée: tracemalloc ralentit les allocations et fausserait les latences
+        with tempfile.TemporaryDirectory() as working_dir:
+            op, teardown = setup(working_dir, latency)
+            try:
+                gc.collect()
+                tracemalloc.start()
+                for _ in range(ops):
+                    op()
+                peak_mib = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            finally:
+                tracemalloc.stop()
+                teardown()
+    
+    latencies.sort()
+    return {
+        "ops": ops,
+        "ops_per_sec": ops / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_mib": peak_mib
+    }
+
+
+def compare(result: Dict[str, Any], reference: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Régressions par rapport à la référence
+    
+    Returns:
+        Descriptions des métriques dégradées de plus de threshold (fraction)
+    """
+    regressions = []
+    if reference.get("ops_per_sec") and result["ops_per_sec"] < reference["ops_per_sec"] * (1 - threshold):
+        regressions.append(f"débit {result['ops_per_sec']:.1f} < {reference['ops_per_sec']:.1f} ops/s")
+    for key in ("p95_ms", "peak_mib"):
+        if reference.get(key) and result.get(key) is not None and result[key] > reference[key] * (1 + threshold):
+            regressions.append(f"{key} {result[key]:.2f} > {reference[key]:.2f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks hors ligne de l'Agent")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scénario à exécuter (répétable)")
+    parser.add_argument("--quick", action="store_true", help="Moins d'opérations par scénario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée du LLM (ms)")
+    parser.add_argument("--no-memory", action="store_true", help="Ne pas mesurer le pic mémoire")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Fichier de référence JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Dégradation tolérée (0.2 = 20%%)")
+    parser.add_argument("--json", dest="json_output", help="Écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+    
+    # Mesurer le code, pas les journaux ni un débit imposé par l'environnement
+    logging.disable(logging.CRITICAL)
+    configure_scheduler(None)
+    
+    baseline_path = Path(args.baseline)
+    baseline: Dict[str, Any] = {}
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    
+    names = args.scenario or list(SCENARIOS)
+    results: Dict[str, Any] = {}
+    regressed = False
+    print(f"\n📊 Benchmarks ({'rapide' if args.quick else 'complet'}, latence LLM {args.latency:.0f}ms)")
+    print("-" * 96)
+    print(f"  {'scénario':<22}{'ops':>7}{'ops/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'pic mém.':>11}")
+    for name in names:
+        description, ops, quick_ops, _ = SCENARIOS[name]
+        result = run_scenario(
+            name,
+            quick_ops if args.quick else ops,
+            args.latency / 1000.0,
+            memory=not args.no_memory
+        )
+        results[name] = result
+        memory = f"{result['peak_mib']:.1f}Mo" if result["peak_mib"] is not None else "-"
+        print(
+            f"  {name:<22}{result['ops']:>7}{result['ops_per_sec']:>10.1f}"
+            f"{result['p50_ms']:>8.2f}ms{result['p95_ms']:>8.2f}ms{result['p99_ms']:>8.2f}ms{memory:>11}"
+        )
+        if name in baseline:
+            regressions = compare(result, baseline[name], args.threshold)
+            if regressions:
+                regressed = True
+                print(f"    ⚠️  Régression: {'; '.join(regressions)}")
+            else:
+                print("    ✅ Conforme à la référence")
+    print("-" * 96)
+    
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"💾 Référence enregistrée: {baseline_path}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,18 +5,36 @@ Support de l'historique des actions et meilleur formatting
 """
 
 import typer
+import json
 import os
+import signal
+import sys
 import logging
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from src.agent import Agent
-from src.logger import Logger
+from src.agent import Agent, format_history
+from src.batch import BatchRunner, parse_batch
+from src.cassette import open_cassette
+from src.daemon import AgentDaemon, daemon_supported, send_request
+from src.rate_limit import RateScheduler
+from src.approval import ApprovalPolicy, Approver, InteractiveApprover, StaticApprover
+from src.history import ActionHistory, parse_since
+from src.history_store import open_history_store
+from src.events import configure_events
+from src.history_writer import install_signal_handlers
+from src.logger import Logger, default_log_file
+from src.render import OUTPUT_FORMATS, default_max_lines, iter_json, page_chunks, write_chunks
+from src.tracing import configure_tracing, summarize_trace
+from src.usage import TokenBudget, UsageTracker
 
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
+# Aide en texte brut: le rendu Rich coûte plus que le reste du démarrage
 app = typer.Typer(
-    help="Agent IA CLI - Exécute des tâches avec intelligence artificielle"
+    help="Agent IA CLI - Exécute des tâches avec intelligence artificielle",
+    rich_markup_mode=None
 )
 
 def check_env():
@@ -27,15 +45,205 @@ def check_env():
         typer.echo("   Voir .env.example pour le modèle")
         raise typer.Exit(code=1)
 
+def build_approval(
+    approval_policy: Optional[str] = None,
+    allow_delete: Optional[List[str]] = None,
+    deny_delete: Optional[List[str]] = None,
+    max_deletes: Optional[int] = None,
+    dry_run: bool = False,
+    non_interactive: bool = False
+) -> Tuple[ApprovalPolicy, Approver]:
+    """
+    Construit la politique d'approbation à partir du fichier et des flags CLI
+    
+    Sans terminal (stdin redirigé) ou avec --non-interactive, les suppressions
+    non couvertes par une règle allow sont refusées sans appeler input().
+    """
+    try:
+        policy = ApprovalPolicy.from_file(approval_policy) if approval_policy else ApprovalPolicy()
+    except ValueError as e:
+        typer.echo(f"❌ Erreur: {str(e)}")
+        raise typer.Exit(code=1)
+    
+    policy.merge(
+        allow=allow_delete,
+        deny=deny_delete,
+        max_deletes=max_deletes,
+        dry_run=dry_run
+    )
+    
+    if non_interactive or not sys.stdin.isatty():
+        approver: Approver = StaticApprover(answer=False)
+    else:
+        approver = InteractiveApprover()
+    return policy, approver
+
+def format_token_usage(usage: UsageTracker) -> str:
+    """Formate les tokens consommés par une session (total et par action)"""
+    lines = [f"🔢 Tokens de la session: {usage.total.format()} ({usage.total.calls} appels)"]
+    limit = usage.budget.max_session_tokens
+    if limit is not None:
+        lines.append(f"   Budget: {usage.total.total_tokens}/{limit}")
+    for action, action_usage in sorted(usage.by_action.items()):
+        lines.append(f"  - {action}: {action_usage.format()} ({action_usage.calls} appels)")
+    return "\n".join(lines) + "\n"
+
+def use_base_url(base_url: Optional[str]) -> None:
+    """Dirige les clients Anthropic du processus vers base_url (voir create_client)"""
+    if base_url:
+        os.environ["ANTHROPIC_BASE_URL"] = base_url
+
+def resolve_log_file(log_file: Optional[str], debug: bool) -> Optional[str]:
+    """Fichier de log: --log-file, sinon le fichier utilisateur par défaut (console seule en debug)"""
+    if log_file:
+        return log_file
+    return None if debug else default_log_file()
+
+def open_transport(record: Optional[str], replay: Optional[str], replay_latency: float) -> Any:
+    """Transport cassette des options --record / --replay (None sans ces options)"""
+    try:
+        return open_cassette(record, replay, replay_latency)
+    except (OSError, ValueError) as e:
+        typer.echo(f"❌ Erreur: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+
+def start_tracing(trace: str, trace_format: Optional[str]) -> None:
+    """Active l'export des spans vers le fichier de trace"""
+    try:
+        configure_tracing(trace, trace_format)
+    except (OSError, ValueError) as e:
+        typer.echo(f"❌ Erreur: {str(e)}")
+        raise typer.Exit(code=1)
+    typer.echo(f"🧵 Trace: {trace}\n")
+
+def start_events(events: str, event_sample: Optional[str]) -> None:
+    """Active le journal d'événements structurés (JSONL échantillonné)"""
+    try:
+        configure_events(events, event_sample)
+    except (OSError, ValueError) as e:
+        typer.echo(f"❌ Erreur: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"🧾 Événements: {events}\n", err=True)
+
+def resolve_output(output_format: str, max_lines: Optional[int]) -> Optional[int]:
+    """
+    Vérifie --format et retourne la troncature effective
+    (--max-lines, 0 = tout; défaut: tronqué dans un terminal seulement)
+    """
+    if output_format not in OUTPUT_FORMATS:
+        typer.echo(f"❌ Erreur: format inconnu: {output_format} (attendu: {', '.join(OUTPUT_FORMATS)})", err=True)
+        raise typer.Exit(code=1)
+    return max_lines if max_lines is not None else default_max_lines(sys.stdout)
+
+def show_result(
+    agent: Agent,
+    result: Dict[str, Any],
+    timings: bool,
+    output_format: str = "text",
+    max_lines: Optional[int] = None,
+    pager: bool = False
+) -> None:
+    """
+    Affiche un résultat au fil de l'eau, sans construire le texte complet
+    
+    json: une ligne JSON par résultat; pager: affichage complet dans le pager ($PAGER)
+    si la sortie est un terminal; sinon texte tronqué à max_lines.
+    """
+    if output_format == "json":
+        write_chunks(iter_json(result), sys.stdout)
+        return
+    if pager and sys.stdout.isatty():
+        page_chunks(agent.iter_output(result, show_timings=timings))
+        return
+    write_chunks(agent.iter_output(result, show_timings=timings, max_lines=max_lines), sys.stdout)
+    typer.echo()
+
+def forward_to_daemon(
+    instruction: str,
+    working_dir: str,
+    history_file: Optional[str],
+    timings: bool,
+    socket_path: Optional[str],
+    max_lines: Optional[int] = None
+) -> None:
+    """
+    Exécute l'instruction via le daemon s'il répond
+    
+    Ne retourne pas si le daemon a traité la requête (typer.Exit avec le code de sortie);
+    retourne sans rien faire si aucun daemon n'écoute.
+    """
+    request = {
+        "op": "run",
+        "instruction": instruction,
+        "working_dir": str(Path(working_dir).resolve()),
+        "history_file": str(Path(history_file).expanduser().resolve()) if history_file else None,
+        "timings": timings,
+        "max_lines": max_lines
+    }
+    try:
+        response = send_request(request, socket_path)
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning("Daemon injoignable, exécution locale: %s", e)
+        return
+    if response is None:
+        return
+    
+    if not response.get("success"):
+        typer.echo(f"❌ Erreur daemon: {response.get('error', 'Erreur inconnue')}")
+        raise typer.Exit(code=1)
+    typer.echo(response["output"])
+    raise typer.Exit(code=1 if response.get("status") == "error" else 0)
+
 @app.callback(invoke_without_command=True)
 def main(
     ctx: typer.Context,
-    instruction: str = typer.Argument(None, help="L'instruction pour l'agent ou une commande (interactive, history)"),
+    instruction: str = typer.Argument(None, help="L'instruction pour l'agent ou une commande (interactive, history, batch, serve, traces, loadtest)"),
     working_dir: str = typer.Option(".", help="Répertoire de travail pour l'agent"),
     debug: bool = typer.Option(False, "--debug", help="Mode debug activé"),
+    log_file: str = typer.Option(None, "--log-file", help="Fichier de log (défaut: agent-cli/agent.log dans le répertoire d'état utilisateur)"),
     history_file: str = typer.Option(None, "--history-file", help="Fichier pour persister l'historique"),
     show_history: bool = typer.Option(False, "--show-history", help="Afficher l'historique avant d'exécuter"),
-    clear_history: bool = typer.Option(False, "--clear-history", help="Vider l'historique au démarrage")
+    clear_history: bool = typer.Option(False, "--clear-history", help="Vider l'historique au démarrage"),
+    approval_policy: str = typer.Option(None, "--approval-policy", help="Fichier JSON de politique d'approbation (allow, deny, max_deletes, dry_run)"),
+    allow_delete: List[str] = typer.Option(None, "--allow-delete", help="Glob de fichiers supprimables sans confirmation (répétable)"),
+    deny_delete: List[str] = typer.Option(None, "--deny-delete", help="Glob de fichiers dont la suppression est interdite (répétable)"),
+    max_deletes: int = typer.Option(None, "--max-deletes", help="Nombre maximum de suppressions par session"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Simuler les suppressions sans les exécuter"),
+    non_interactive: bool = typer.Option(False, "--non-interactive", help="Ne jamais demander de confirmation (refus par défaut)"),
+    timings: bool = typer.Option(False, "--timings", help="Afficher le détail du temps par phase (LLM, sécurité, outil, historique)"),
+    max_lines: int = typer.Option(None, "--max-lines", help="Lignes de contenu affichées au plus, début et fin (0 = tout; défaut: 200 dans un terminal)"),
+    output_format: str = typer.Option("text", "--format", help="Format du résultat: text ou json (une ligne JSON par résultat)"),
+    pager: bool = typer.Option(False, "--pager", help="[interactive] Afficher les résultats dans le pager ($PAGER)"),
+    trace: str = typer.Option(None, "--trace", help="Fichier de trace des spans (JSONL, ou Chrome trace-event pour .json)"),
+    trace_format: str = typer.Option(None, "--trace-format", help="Format de trace: jsonl ou chrome"),
+    events: str = typer.Option(None, "--events", help="Journal d'événements structurés (un objet JSON par ligne)"),
+    event_sample: str = typer.Option(None, "--event-sample", help="Taux d'échantillonnage des événements: info=0.01,error=1,tool.read_file=0.1"),
+    filter_expr: str = typer.Option(None, "--filter", help="[history] Filtres key=value (action=read_file,status=error)"),
+    since: str = typer.Option(None, "--since", help="[history] Actions depuis une date ISO ou une durée (30m, 12h, 7d)"),
+    limit: int = typer.Option(None, "--limit", help="[history] Nombre maximum d'actions affichées"),
+    slowest: bool = typer.Option(False, "--slowest", help="[history] Trier par temps d'exécution décroissant"),
+    batch_input: str = typer.Option(None, "--input", help="[batch] Fichier d'instructions JSONL (défaut: stdin)"),
+    batch_output: str = typer.Option(None, "--output", help="[batch] Fichier de résultats JSONL (défaut: stdout)"),
+    workers: int = typer.Option(4, "--workers", help="[batch] Nombre de workers"),
+    isolate: bool = typer.Option(False, "--isolate", help="[batch] Un espace de travail <working-dir>/<id> par instruction"),
+    rpm: float = typer.Option(None, "--rpm", help="[batch] Limite globale de requêtes API par minute"),
+    itpm: float = typer.Option(None, "--itpm", help="[batch] Limite globale de tokens d'entrée par minute"),
+    otpm: float = typer.Option(None, "--otpm", help="[batch] Limite globale de tokens de sortie par minute"),
+    max_session_tokens: int = typer.Option(None, "--max-session-tokens", help="Budget de tokens de la session (appels refusés au-delà)"),
+    max_prompt_tokens: int = typer.Option(None, "--max-prompt-tokens", help="Taille maximale du prompt en tokens (anciens échanges retirés)"),
+    record: str = typer.Option(None, "--record", help="Enregistrer les appels API dans cette cassette (JSONL)"),
+    replay: str = typer.Option(None, "--replay", help="Rejouer les appels API depuis cette cassette (sans réseau)"),
+    replay_latency: float = typer.Option(0.0, "--replay-latency", help="Facteur de latence du rejeu (1 = d'origine, 0 = aucune)"),
+    base_url: str = typer.Option(None, "--base-url", help="URL de l'API Messages (serveur factice local, proxy); défaut: $ANTHROPIC_BASE_URL"),
+    sessions: int = typer.Option(8, "--sessions", help="[loadtest] Sessions d'agent simultanées"),
+    requests: int = typer.Option(None, "--requests", help="[loadtest] Requêtes par session (défaut: 20 sans --duration)"),
+    duration: float = typer.Option(None, "--duration", help="[loadtest] Durée maximale de la mesure (secondes)"),
+    rate: float = typer.Option(None, "--rate", help="[loadtest] Débit cible total en requêtes/s (défaut: boucle fermée)"),
+    modes: str = typer.Option("thread", "--modes", help="[loadtest] Modes comparés: thread,process,asyncio"),
+    llm: str = typer.Option("fake", "--llm", help="[loadtest] LLM factice: fake (en mémoire), mock (serveur local) ou replay (--replay)"),
+    latency_ms: float = typer.Option(0.0, "--latency-ms", help="[loadtest] Latence simulée du LLM (ms)"),
+    socket_path: str = typer.Option(None, "--socket", help="Socket du daemon (défaut: $AGENT_SOCKET, $XDG_RUNTIME_DIR/agent-cli.sock ou ~/.local/state/agent-cli/agent.sock)"),
+    use_daemon: bool = typer.Option(False, "--daemon/--no-daemon", help="Transmettre l'instruction au daemon s'il tourne (suppressions hors politique du daemon refusées, sans confirmation)")
 ):
     """
     Lance l'Agent IA pour traiter une instruction ou une commande
@@ -52,14 +260,107 @@ def main(
         return
     
     # Vérifier si l'instruction est en fact une commande connue
-    if instruction in ["interactive", "history"]:
+    if instruction in ["interactive", "history", "traces", "batch", "serve", "loadtest"]:
         # Rediriger vers la commande appropriée
         if instruction == "interactive":
             # Pour le mode interactif, utiliser creations_ia par défaut si working_dir est "."
             final_working_dir = "creations_ia" if working_dir == "." else working_dir
-            ctx.invoke(interactive, working_dir=final_working_dir, history_file=history_file, debug=debug)
+            ctx.invoke(
+                interactive,
+                working_dir=final_working_dir,
+                history_file=history_file,
+                debug=debug,
+                log_file=log_file,
+                approval_policy=approval_policy,
+                allow_delete=allow_delete,
+                deny_delete=deny_delete,
+                max_deletes=max_deletes,
+                dry_run=dry_run,
+                non_interactive=non_interactive,
+                timings=timings,
+                max_lines=max_lines,
+                output_format=output_format,
+                pager=pager,
+                trace=trace,
+                trace_format=trace_format,
+                events=events,
+                event_sample=event_sample,
+                max_session_tokens=max_session_tokens,
+                max_prompt_tokens=max_prompt_tokens,
+                record=record,
+                replay=replay,
+                replay_latency=replay_latency,
+                base_url=base_url
+            )
         elif instruction == "history":
-            ctx.invoke(history, working_dir=working_dir, history_file=history_file)
+            ctx.invoke(
+                history,
+                working_dir=working_dir,
+                history_file=history_file,
+                filter_expr=filter_expr,
+                since=since,
+                limit=limit,
+                slowest=slowest
+            )
+        elif instruction == "traces":
+            ctx.invoke(traces, trace=trace, limit=limit)
+        elif instruction == "serve":
+            ctx.invoke(
+                serve,
+                socket_path=socket_path,
+                debug=debug,
+                approval_policy=approval_policy,
+                allow_delete=allow_delete,
+                deny_delete=deny_delete,
+                max_deletes=max_deletes,
+                dry_run=dry_run
+            )
+        elif instruction == "batch":
+            ctx.invoke(
+                batch,
+                batch_input=batch_input,
+                batch_output=batch_output,
+                working_dir=working_dir,
+                workers=workers,
+                isolate=isolate,
+                rpm=rpm,
+                itpm=itpm,
+                otpm=otpm,
+                max_session_tokens=max_session_tokens,
+                max_prompt_tokens=max_prompt_tokens,
+                record=record,
+                replay=replay,
+                replay_latency=replay_latency,
+                base_url=base_url,
+                debug=debug,
+                log_file=log_file,
+                approval_policy=approval_policy,
+                allow_delete=allow_delete,
+                deny_delete=deny_delete,
+                max_deletes=max_deletes,
+                dry_run=dry_run,
+                trace=trace,
+                trace_format=trace_format,
+                events=events,
+                event_sample=event_sample
+            )
+        elif instruction == "loadtest":
+            ctx.invoke(
+                loadtest,
+                sessions=sessions,
+                requests=requests,
+                duration=duration,
+                rate=rate,
+                modes=modes,
+                llm=llm,
+                latency_ms=latency_ms,
+                replay=replay,
+                base_url=base_url,
+                isolate=isolate,
+                batch_input=batch_input,
+                batch_output=batch_output,
+                debug=debug
+            )
         return
     
     # Si pas d'instruction fournie, afficher l'aide
@@ -67,14 +368,29 @@ def main(
         typer.echo(ctx.get_help())
         raise typer.Exit(code=0)
     
-    # Vérifier l'environnement
-    check_env()
+    # Transmettre au daemon sur demande (--daemon) et s'il tourne: il n'a pas de
+    # terminal pour confirmer une suppression (options locales: exécution dans ce processus)
+    local_only = (
+        not use_daemon or debug or log_file or show_history or clear_history or trace or events or dry_run
+        or approval_policy or allow_delete or deny_delete or max_deletes is not None
+        or max_session_tokens is not None or max_prompt_tokens is not None
+        or record or replay or base_url or output_format != "text"
+    )
+    max_lines = resolve_output(output_format, max_lines)
+    if not local_only:
+        forward_to_daemon(instruction, working_dir, history_file, timings, socket_path, max_lines)
+    
+    # Vérifier l'environnement (le rejeu d'une cassette n'a pas besoin de clé API)
+    if not replay:
+        check_env()
+    use_base_url(base_url)
+    transport = open_transport(record, replay, replay_latency)
     
     # Configurer le logging
     log_level = logging.DEBUG if debug else logging.INFO
     Logger.configure(
         level=log_level,
-        log_file=os.path.join(working_dir, ".agent.log") if not debug else None
+        log_file=resolve_log_file(log_file, debug)
     )
     
     if debug:
@@ -85,9 +401,28 @@ def main(
         typer.echo(f"❌ Erreur: Le répertoire de travail n'existe pas: {working_dir}")
         raise typer.Exit(code=1)
     
+    policy, approver = build_approval(
+        approval_policy, allow_delete, deny_delete, max_deletes, dry_run, non_interactive
+    )
+    
+    # Vider le journal d'historique en file sur SIGINT/SIGTERM
+    install_signal_handlers()
+    
+    if trace:
+        start_tracing(trace, trace_format)
+    if events:
+        start_events(events, event_sample)
+    
     try:
         # Créer l'agent (avec ou sans fichier d'historique)
-        agent = Agent(working_dir=working_dir, history_file=history_file)
+        agent = Agent(
+            working_dir=working_dir,
+            history_file=history_file,
+            approval_policy=policy,
+            approver=approver,
+            token_budget=TokenBudget(max_session_tokens, max_prompt_tokens),
+            transport=transport
+        )
         
         # Vider l'historique si demandé
         if clear_history:
@@ -99,12 +434,12 @@ def main(
             typer.echo(agent.format_history_output())
         
         # Traiter l'instruction
-        typer.echo(f"⏳ Traitement de: '{instruction}'\n")
+        typer.echo(f"⏳ Traitement de: '{instruction}'\n", err=output_format == "json")
         result = agent.process_request(instruction)
         
-        # Afficher le résultat formaté
-        formatted_output = agent.format_output(result)
-        typer.echo(formatted_output)
+        # Afficher le résultat formaté (écrit au fil de l'eau)
+        show_result(agent, result, timings, output_format, max_lines)
+        agent.close()
         
         # Retourner le code de sortie approprié
         if result['status'] == 'error':
@@ -123,28 +458,381 @@ def main(
 @app.command()
 def history(
     working_dir: str = typer.Option(".", help="Répertoire de travail de l'agent"),
-    history_file: str = typer.Option(None, help="Fichier d'historique")
+    history_file: str = typer.Option(None, help="Fichier d'historique"),
+    filter_expr: str = typer.Option(None, "--filter", help="Filtres key=value séparés par des virgules (action=read_file,status=error)"),
+    since: str = typer.Option(None, "--since", help="Actions depuis une date ISO ou une durée (30m, 12h, 7d)"),
+    limit: int = typer.Option(None, "--limit", help="Nombre maximum d'actions affichées"),
+    slowest: bool = typer.Option(False, "--slowest", help="Trier par temps d'exécution décroissant")
 ):
     """
     Affiche l'historique des actions exécutées
     
-    Exemple:
+    Exemples:
         python cli.py history --history-file ~/.agent_history.json
+        python cli.py history --history-file ~/.agent.db --filter status=error --since 7d
+        python cli.py history --history-file ~/.agent.db --slowest --limit 5
     """
-    check_env()
+    if filter_expr or since or limit or slowest:
+        query_history(history_file, filter_expr, since, limit, slowest)
+        return
     
+    # Lecture locale: ni Agent, ni SDK Anthropic, ni clé API
     try:
-        agent = Agent(working_dir=working_dir, history_file=history_file)
-        typer.echo(agent.format_history_output())
+        action_history = ActionHistory()
+        if history_file:
+            action_history.attach_file(history_file, lock=False)
+        typer.echo(format_history(action_history))
+        action_history.close()
     except Exception as e:
         typer.echo(f"❌ Erreur: {str(e)}")
         raise typer.Exit(code=1)
 
+def query_history(
+    history_file: Optional[str],
+    filter_expr: Optional[str],
+    since: Optional[str],
+    limit: Optional[int],
+    slowest: bool
+) -> None:
+    """Exécute une requête filtrée sur le fichier d'historique et affiche le résultat"""
+    if not history_file:
+        typer.echo("❌ Erreur: --history-file requis pour filtrer l'historique")
+        raise typer.Exit(code=1)
+    
+    filters = {}
+    for part in (filter_expr or "").split(","):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition("=")
+        key, value = key.strip(), value.strip()
+        if not sep or key not in ("action", "status") or not value:
+            typer.echo(f"❌ Erreur: filtre invalide '{part}' (attendu: action=... ou status=...)")
+            raise typer.Exit(code=1)
+        filters[key] = value
+    
+    try:
+        since_iso = parse_since(since) if since else None
+    except ValueError as e:
+        typer.echo(f"❌ Erreur: {str(e)}")
+        raise typer.Exit(code=1)
+    
+    store = open_history_store(history_file)
+    try:
+        records = store.query(
+            since=since_iso,
+            action=filters.get("action"),
+            status=filters.get("status"),
+            slowest=slowest,
+            limit=limit or 20
+        )
+    finally:
+        store.close()
+    title = "🐢 ACTIONS LES PLUS LENTES" if slowest else "🔎 ACTIONS CORRESPONDANTES"
+    output = ["\n" + "="*60, title, "-"*60]
+    for i, action in enumerate(records, 1):
+        status_emoji = "✅" if action.get('status') == 'success' else "❌"
+        output.append(
+            f"{i}. {status_emoji} {action.get('action', '?')} "
+            f"({action.get('execution_time', 0):.3f}s) - {action.get('timestamp', '?')}"
+        )
+    if not records:
+        output.append("Aucune action trouvée")
+    output.append("="*60 + "\n")
+    typer.echo("\n".join(output))
+
+@app.command()
+def traces(
+    trace: str = typer.Option(None, "--trace", help="Fichier de trace JSONL à analyser"),
+    limit: int = typer.Option(None, "--limit", help="Nombre de requêtes les plus lentes affichées")
+):
+    """
+    Résume un fichier de trace JSONL: percentiles par span et requêtes les plus lentes
+    
+    Exemples:
+        python cli.py --trace ~/.agent_trace.jsonl traces
+        python cli.py --trace ~/.agent_trace.jsonl --limit 10 traces
+    """
+    if not trace:
+        typer.echo("❌ Erreur: --trace requis pour analyser une trace")
+        raise typer.Exit(code=1)
+    
+    try:
+        summary = summarize_trace(trace, slowest=limit or 5)
+    except (OSError, KeyError) as e:
+        typer.echo(f"❌ Erreur: trace illisible {trace} ({str(e)})")
+        raise typer.Exit(code=1)
+    
+    output = ["\n" + "="*60, "🧵 SPANS (ms)", "-"*60]
+    output.append(f"  {'span':<24} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, stats in sorted(summary["spans"].items()):
+        output.append(
+            f"  {name:<24} {stats['count']:>6} {stats['p50'] * 1000:>9.1f} "
+            f"{stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}"
+        )
+    output.append("-"*60)
+    output.append("🐢 REQUÊTES LES PLUS LENTES")
+    for i, root in enumerate(summary["slowest"], 1):
+        attributes = root.get("attributes", {})
+        output.append(
+            f"{i}. {root['duration'] * 1000:.1f}ms [{root['trace_id']}] "
+            f"{attributes.get('action', '?')} - {attributes.get('instruction', '')[:60]}"
+        )
+    if not summary["spans"]:
+        output.append("Aucun span trouvé")
+    output.append("="*60 + "\n")
+    typer.echo("\n".join(output))
+
+@app.command()
+def serve(
+    socket_path: str = typer.Option(None, "--socket", help="Socket du daemon (défaut: $AGENT_SOCKET, $XDG_RUNTIME_DIR/agent-cli.sock ou ~/.local/state/agent-cli/agent.sock)"),
+    max_agents: int = typer.Option(16, "--max-agents", help="Nombre maximum d'agents chauds (un par répertoire/historique)"),
+    debug: bool = typer.Option(False, "--debug", help="Mode debug activé"),
+    approval_policy: str = typer.Option(None, "--approval-policy", help="Fichier JSON de politique d'approbation (allow, deny, max_deletes, dry_run)"),
+    allow_delete: List[str] = typer.Option(None, "--allow-delete", help="Glob de fichiers supprimables sans confirmation (répétable)"),
+    deny_delete: List[str] = typer.Option(None, "--deny-delete", help="Glob de fichiers dont la suppression est interdite (répétable)"),
+    max_deletes: int = typer.Option(None, "--max-deletes", help="Nombre maximum de suppressions par session"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Simuler les suppressions sans les exécuter")
+):
+    """
+    Lance le daemon: agents chauds derrière un socket Unix local
+    
+    Tant qu'il tourne, `python cli.py --daemon "instruction"` lui transmet l'instruction
+    (sauf avec --debug, --trace, --events et les options d'approbation, exécutées localement).
+    Les suppressions hors politique sont refusées (aucune confirmation interactive).
+    Un fichier d'historique servi par le daemon est verrouillé: une exécution locale sur le
+    même fichier n'y écrit pas (utiliser --daemon ou un autre fichier).
+    
+    Exemples:
+        python cli.py serve
+        python cli.py --allow-delete "tmp/*" --max-deletes 10 serve
+    """
+    if not daemon_supported():
+        typer.echo("❌ Erreur: sockets Unix non disponibles sur cette plateforme")
+        raise typer.Exit(code=1)
+    
+    check_env()
+    Logger.configure(level=logging.DEBUG if debug else logging.INFO)
+    
+    policy, approver = build_approval(
+        approval_policy, allow_delete, deny_delete, max_deletes, dry_run, non_interactive=True
+    )
+    daemon = AgentDaemon(
+        socket_path=socket_path,
+        approval_policy=policy,
+        approver=approver,
+        max_agents=max_agents
+    )
+    # SIGTERM: sortie propre (fermeture des agents, suppression du socket)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    typer.echo(f"🔌 Daemon en écoute sur {daemon.socket_path} (pid {os.getpid()})")
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        typer.echo(f"❌ Erreur: {str(e)}")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        typer.echo("\n👋 Daemon arrêté")
+
+@app.command()
+def batch(
+    batch_input: str = typer.Option(None, "--input", help="Fichier d'instructions JSONL (défaut: stdin)"),
+    batch_output: str = typer.Option(None, "--output", help="Fichier de résultats JSONL (défaut: stdout)"),
+    working_dir: str = typer.Option(".", help="Répertoire de travail des agents"),
+    workers: int = typer.Option(4, "--workers", help="Nombre de workers"),
+    isolate: bool = typer.Option(False, "--isolate", help="Un espace de travail <working-dir>/<id> par instruction"),
+    rpm: float = typer.Option(None, "--rpm", help="Limite globale de requêtes API par minute"),
+    itpm: float = typer.Option(None, "--itpm", help="Limite globale de tokens d'entrée par minute"),
+    otpm: float = typer.Option(None, "--otpm", help="Limite globale de tokens de sortie par minute"),
+    max_session_tokens: int = typer.Option(None, "--max-session-tokens", help="Budget de tokens par session (appels refusés au-delà)"),
+    max_prompt_tokens: int = typer.Option(None, "--max-prompt-tokens", help="Taille maximale du prompt en tokens (anciens échanges retirés)"),
+    record: str = typer.Option(None, "--record", help="Enregistrer les appels API dans cette cassette (JSONL)"),
+    replay: str = typer.Option(None, "--replay", help="Rejouer les appels API depuis cette cassette (sans réseau)"),
+    replay_latency: float = typer.Option(0.0, "--replay-latency", help="Facteur de latence du rejeu (1 = d'origine, 0 = aucune)"),
+    base_url: str = typer.Option(None, "--base-url", help="URL de l'API Messages (serveur factice local, proxy); défaut: $ANTHROPIC_BASE_URL"),
+    debug: bool = typer.Option(False, "--debug", help="Mode debug activé"),
+    log_file: str = typer.Option(None, "--log-file", help="Fichier de log (défaut: agent-cli/agent.log dans le répertoire d'état utilisateur)"),
+    approval_policy: str = typer.Option(None, "--approval-policy", help="Fichier JSON de politique d'approbation (allow, deny, max_deletes, dry_run)"),
+    allow_delete: List[str] = typer.Option(None, "--allow-delete", help="Glob de fichiers supprimables sans confirmation (répétable)"),
+    deny_delete: List[str] = typer.Option(None, "--deny-delete", help="Glob de fichiers dont la suppression est interdite (répétable)"),
+    max_deletes: int = typer.Option(None, "--max-deletes", help="Nombre maximum de suppressions par session"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Simuler les suppressions sans les exécuter"),
+    trace: str = typer.Option(None, "--trace", help="Fichier de trace des spans (JSONL, ou Chrome trace-event pour .json)"),
+    trace_format: str = typer.Option(None, "--trace-format", help="Format de trace: jsonl ou chrome"),
+    events: str = typer.Option(None, "--events", help="Journal d'événements structurés (un objet JSON par ligne)"),
+    event_sample: str = typer.Option(None, "--event-sample", help="Taux d'échantillonnage des événements: info=0.01,error=1,tool.read_file=0.1")
+):
+    """
+    Exécute un lot d'instructions en parallèle dans un seul processus
+    
+    Entrée: une instruction par ligne, ou {"id": ..., "instruction": ...} en JSONL.
+    Les résultats sont écrits en JSONL dans l'ordre de complétion; les suppressions
+    non couvertes par la politique sont refusées (aucune confirmation interactive).
+    
+    Exemples:
+        python cli.py --input nightly.jsonl --output results.jsonl --workers 8 batch
+        cat instructions.txt | python cli.py --rpm 50 --itpm 50000 --isolate batch
+        python cli.py --input nightly.jsonl --replay nightly.cassette.jsonl batch
+    """
+    if not replay:
+        check_env()
+    use_base_url(base_url)
+    transport = open_transport(record, replay, replay_latency)
+    
+    Logger.configure(
+        level=logging.DEBUG if debug else logging.WARNING,
+        log_file=resolve_log_file(log_file, debug)
+    )
+    
+    if not Path(working_dir).exists():
+        typer.echo(f"❌ Erreur: Le répertoire de travail n'existe pas: {working_dir}", err=True)
+        raise typer.Exit(code=1)
+    
+    try:
+        if batch_input and batch_input != "-":
+            with open(batch_input, 'r', encoding='utf-8') as f:
+                items = parse_batch(f)
+        else:
+            items = parse_batch(sys.stdin)
+        # Sans limite explicite: ordonnanceur du processus (AGENT_RPM, AGENT_INPUT_TPM, AGENT_OUTPUT_TPM)
+        rate_limiter = RateScheduler(rpm, itpm, otpm) if rpm or itpm or otpm else None
+    except (OSError, ValueError) as e:
+        typer.echo(f"❌ Erreur: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    
+    policy, approver = build_approval(
+        approval_policy, allow_delete, deny_delete, max_deletes, dry_run, non_interactive=True
+    )
+    if trace:
+        start_tracing(trace, trace_format)
+    if events:
+        start_events(events, event_sample)
+    
+    runner = BatchRunner(
+        working_dir=working_dir,
+        workers=workers,
+        isolate=isolate,
+        approval_policy=policy,
+        approver=approver,
+        rate_limiter=rate_limiter,
+        token_budget=TokenBudget(max_session_tokens, max_prompt_tokens),
+        transport=transport
+    )
+    out = open(batch_output, 'w', encoding='utf-8') if batch_output else sys.stdout
+    
+    def write_result(record):
+        out.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        out.flush()
+    
+    try:
+        stats = runner.run(items, write_result)
+    except KeyboardInterrupt:
+        typer.echo("\n\n⚠️  Interruption par l'utilisateur", err=True)
+        raise typer.Exit(code=130)
+    finally:
+        runner.close()
+        if out is not sys.stdout:
+            out.close()
+    
+    summary = stats.summary()
+    typer.echo(
+        f"📦 Batch: {summary['total']} instructions | ✅ {summary['success_count']} | "
+        f"❌ {summary['error_count']} | {summary['wall_time']:.2f}s | "
+        f"{summary['throughput']:.2f} instr/s | p50 {summary['p50']:.3f}s | p95 {summary['p95']:.3f}s",
+        err=True
+    )
+    if stats.tokens.calls:
+        typer.echo(f"🔢 Tokens: {stats.tokens.format()} ({stats.tokens.calls} appels)", err=True)
+    if summary['error_count']:
+        raise typer.Exit(code=1)
+
+@app.command()
+def loadtest(
+    sessions: int = typer.Option(8, "--sessions", help="Sessions d'agent simultanées"),
+    requests: int = typer.Option(None, "--requests", help="Requêtes par session (défaut: 20 sans --duration)"),
+    duration: float = typer.Option(None, "--duration", help="Durée maximale de la mesure (secondes)"),
+    rate: float = typer.Option(None, "--rate", help="Débit cible total en requêtes/s (défaut: boucle fermée)"),
+    modes: str = typer.Option("thread", "--modes", help="Modes comparés: thread,process,asyncio"),
+    llm: str = typer.Option("fake", "--llm", help="LLM factice: fake (en mémoire), mock (serveur local) ou replay (--replay)"),
+    latency_ms: float = typer.Option(0.0, "--latency-ms", help="Latence simulée du LLM (ms)"),
+    replay: str = typer.Option(None, "--replay", help="Cassette rejouée avec --llm replay"),
+    base_url: str = typer.Option(None, "--base-url", help="Serveur Messages API déjà lancé (--llm mock)"),
+    isolate: bool = typer.Option(False, "--isolate", help="Un espace de travail par session (défaut: espace partagé)"),
+    batch_input: str = typer.Option(None, "--input", help="Instructions rejouées (texte ou JSONL, voir batch)"),
+    batch_output: str = typer.Option(None, "--output", help="Rapport JSON"),
+    debug: bool = typer.Option(False, "--debug", help="Mode debug activé")
+):
+    """
+    Test de charge: sessions simultanées sur un LLM factice, rapport de débit et de latences
+    
+    Les instructions sont rejouées en boucle fermée (--requests, --duration) ou à débit
+    cible (--rate). Le rapport compare les modes d'exécution demandés.
+    
+    Exemples:
+        python cli.py --sessions 32 --requests 50 --modes thread,process,asyncio loadtest
+        python cli.py --sessions 64 --rate 200 --duration 30 --llm mock --latency-ms 300 loadtest
+    """
+    from benchmarks.loadtest import format_report, run_loadtest
+    
+    Logger.configure(level=logging.DEBUG if debug else logging.ERROR)
+    
+    instructions = None
+    try:
+        if batch_input:
+            with open(batch_input, 'r', encoding='utf-8') as f:
+                instructions = [item["instruction"] for item in parse_batch(f)]
+        typer.echo(f"⏳ Test de charge: {sessions} sessions | modes {modes} | LLM {llm}\n", err=True)
+        results = run_loadtest(
+            modes=[mode.strip() for mode in modes.split(",") if mode.strip()],
+            sessions=sessions,
+            requests=requests if requests or duration else 20,
+            duration=duration,
+            rate=rate,
+            llm=llm,
+            latency_ms=latency_ms,
+            cassette=replay,
+            base_url=base_url,
+            isolate=isolate,
+            instructions=instructions
+        )
+    except (OSError, ValueError) as e:
+        typer.echo(f"❌ Erreur: {str(e)}", err=True)
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        typer.echo("\n\n⚠️  Interruption par l'utilisateur", err=True)
+        raise typer.Exit(code=130)
+    
+    typer.echo(format_report(results))
+    if batch_output:
+        with open(batch_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
 @app.command()
 def interactive(
     working_dir: str = typer.Option("creations_ia", help="Répertoire de travail pour l'agent (défaut: creations_ia)"),
     history_file: str = typer.Option(None, help="Fichier pour persister l'historique"),
-    debug: bool = typer.Option(False, "--debug", help="Mode debug activé")
+    debug: bool = typer.Option(False, "--debug", help="Mode debug activé"),
+    log_file: str = typer.Option(None, "--log-file", help="Fichier de log (défaut: agent-cli/agent.log dans le répertoire d'état utilisateur)"),
+    approval_policy: str = typer.Option(None, "--approval-policy", help="Fichier JSON de politique d'approbation (allow, deny, max_deletes, dry_run)"),
+    allow_delete: List[str] = typer.Option(None, "--allow-delete", help="Glob de fichiers supprimables sans confirmation (répétable)"),
+    deny_delete: List[str] = typer.Option(None, "--deny-delete", help="Glob de fichiers dont la suppression est interdite (répétable)"),
+    max_deletes: int = typer.Option(None, "--max-deletes", help="Nombre maximum de suppressions par session"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Simuler les suppressions sans les exécuter"),
+    non_interactive: bool = typer.Option(False, "--non-interactive", help="Ne jamais demander de confirmation (refus par défaut)"),
+    timings: bool = typer.Option(False, "--timings", help="Afficher le détail du temps par phase (LLM, sécurité, outil, historique)"),
+    max_lines: int = typer.Option(None, "--max-lines", help="Lignes de contenu affichées au plus, début et fin (0 = tout; défaut: 200 dans un terminal)"),
+    output_format: str = typer.Option("text", "--format", help="Format du résultat: text ou json (une ligne JSON par résultat)"),
+    pager: bool = typer.Option(False, "--pager", help="Afficher les résultats dans le pager ($PAGER)"),
+    trace: str = typer.Option(None, "--trace", help="Fichier de trace des spans (JSONL, ou Chrome trace-event pour .json)"),
+    trace_format: str = typer.Option(None, "--trace-format", help="Format de trace: jsonl ou chrome"),
+    events: str = typer.Option(None, "--events", help="Journal d'événements structurés (un objet JSON par ligne)"),
+    event_sample: str = typer.Option(None, "--event-sample", help="Taux d'échantillonnage des événements: info=0.01,error=1,tool.read_file=0.1"),
+    max_session_tokens: int = typer.Option(None, "--max-session-tokens", help="Budget de tokens de la session (appels refusés au-delà)"),
+    max_prompt_tokens: int = typer.Option(None, "--max-prompt-tokens", help="Taille maximale du prompt en tokens (anciens échanges retirés)"),
+    record: str = typer.Option(None, "--record", help="Enregistrer les appels API dans cette cassette (JSONL)"),
+    replay: str = typer.Option(None, "--replay", help="Rejouer les appels API depuis cette cassette (sans réseau)"),
+    replay_latency: float = typer.Option(0.0, "--replay-latency", help="Facteur de latence du rejeu (1 = d'origine, 0 = aucune)"),
+    base_url: str = typer.Option(None, "--base-url", help="URL de l'API Messages (serveur factice local, proxy); défaut: $ANTHROPIC_BASE_URL")
 ):
     """
     Lance le CLI en mode INTERACTIF - conversation continu avec l'agent
@@ -153,15 +841,20 @@ def interactive(
         python cli.py interactive (utilise creations_ia par défaut)
         python cli.py interactive --working-dir ./data
         python cli.py interactive --debug
+        python cli.py interactive --pager
     """
-    # Vérifier l'environnement
-    check_env()
+    max_lines = resolve_output(output_format, max_lines)
+    
+    # Sans clé API, seules les commandes locales (history, help, pwd) fonctionnent
+    if not os.getenv("ANTHROPIC_API_KEY") and not replay:
+        typer.echo("⚠️  ANTHROPIC_API_KEY non configurée: seules les commandes locales sont disponibles")
+        typer.echo("   Voir .env.example pour le modèle\n")
     
     # Configurer le logging
     log_level = logging.DEBUG if debug else logging.INFO
     Logger.configure(
         level=log_level,
-        log_file=os.path.join(working_dir, ".agent.log") if not debug else None
+        log_file=resolve_log_file(log_file, debug)
     )
     
     if debug:
@@ -177,9 +870,30 @@ def interactive(
             typer.echo(f"❌ Erreur: Impossible de créer le répertoire {working_dir}: {str(e)}")
             raise typer.Exit(code=1)
     
+    policy, approver = build_approval(
+        approval_policy, allow_delete, deny_delete, max_deletes, dry_run, non_interactive
+    )
+    
+    # Vider le journal d'historique en file sur SIGINT/SIGTERM
+    install_signal_handlers()
+    
+    if trace:
+        start_tracing(trace, trace_format)
+    if events:
+        start_events(events, event_sample)
+    use_base_url(base_url)
+    transport = open_transport(record, replay, replay_latency)
+    
     try:
         # Créer l'agent
-        agent = Agent(working_dir=working_dir, history_file=history_file)
+        agent = Agent(
+            working_dir=working_dir,
+            history_file=history_file,
+            approval_policy=policy,
+            approver=approver,
+            token_budget=TokenBudget(max_session_tokens, max_prompt_tokens),
+            transport=transport
+        )
         
         # Banner d'accueil
         typer.echo(f"""
@@ -195,6 +909,7 @@ def interactive(
   • 'clear' → Vider l'historique
   • 'help' → Afficher cette aide
   • 'pwd' → Afficher le répertoire courant
+  • 'tokens' → Tokens consommés par la session
 
 ⚡ Tapez vos instructions en langage naturel:
   • "Créer un fichier (fichier.txt)"
@@ -237,6 +952,7 @@ def interactive(
   • 'history' → Afficher l'historique
   • 'clear' → Vider l'historique
   • 'pwd' → Répertoire courant
+  • 'tokens' → Tokens consommés par la session
   
 📝 Exemples d'instructions:
   • "Lire README.md"
@@ -246,6 +962,10 @@ def interactive(
 """)
                     continue
                 
+                if instruction.lower() == 'tokens':
+                    typer.echo(format_token_usage(agent.llm.usage))
+                    continue
+                
                 if instruction.lower() == 'pwd':
                     typer.echo(f"📂 Répertoire: {Path(working_dir).resolve()}\n")
                     continue
@@ -254,9 +974,8 @@ def interactive(
                 typer.echo(f"⏳ Traitement...\n")
                 result = agent.process_request(instruction)
                 
-                # Afficher le résultat formaté
-                formatted_output = agent.format_output(result)
-                typer.echo(formatted_output)
+                # Afficher le résultat formaté (écrit au fil de l'eau)
+                show_result(agent, result, timings, output_format, max_lines, pager)
                 
             except KeyboardInterrupt:
                 typer.echo("\n\n⚠️  Interruption par l'utilisateur")
@@ -265,6 +984,8 @@ def interactive(
                 typer.echo("\n👋 Au revoir!")
                 break
         
+        agent.close()
+        
     except Exception as e:
         typer.echo(f"❌ Erreur fatale: {str(e)}")
         if debug:
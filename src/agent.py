@@ -5,41 +5,99 @@ Intègre l'historique des actions et meilleur logging
 """
 
 import logging
-import time
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+from src.context import ContextBuilder, summarize_action
+from src.events import request_scope
 from src.llm_interface import LLMInterface
 from src.executor import Executor
+from src.tools import Tools
+from src.cache import ContentCache
+from src.prefetch import Prefetcher
+from src.render import iter_text
 from src.history import ActionHistory
+from src.approval import ApprovalPolicy, Approver
+from src.rate_limit import RateScheduler
+from src.router import OUTCOME_PARSE_ERROR, ModelRouter, classify_outcome
+from src.timing import PhaseTimer, format_timings, timed
+from src.tracing import span
+from src.usage import TokenBudget, TokenUsage
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(levelname)s] %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class Agent:
     """Agent IA qui traite les instructions utilisateur"""
     
-    def __init__(self, working_dir: str = ".", history_file: Optional[str] = None):
+    def __init__(
+        self,
+        working_dir: str = ".",
+        history_file: Optional[str] = None,
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        spill_blobs: bool = False,
+        rate_limiter: Optional[RateScheduler] = None,
+        workspace_lock: Optional[threading.Lock] = None,
+        llm: Optional[LLMInterface] = None,
+        tools: Optional[Tools] = None,
+        token_budget: Optional[TokenBudget] = None,
+        context_tokens: int = 400,
+        router: Optional[ModelRouter] = None,
+        prefetch: bool = True,
+        transport: Optional[Any] = None,
+        prefetch_submit: Optional[Callable[..., Any]] = None
+    ):
         """
         Initialise l'agent avec LLM, Executor et historique
         
         Args:
             working_dir: Répertoire de travail
             history_file: Fichier optionnel pour charger/sauvegarder l'historique
+            approval_policy: Politique d'approbation des suppressions
+            approver: Approbateur des actions dangereuses (défaut: confirmation terminal)
+            spill_blobs: Conserver les résultats complets dans <history_file>.blobs/
+            rate_limiter: Ordonnanceur de débit API partagé entre agents
+            workspace_lock: Verrou des outils partagé entre agents du même répertoire
+            llm: Interface LLM fournie par AgentRuntime (client partagé)
+            tools: Outils partagés du répertoire (AgentRuntime)
+            token_budget: Limites de tokens de la session (ignoré si llm est fourni)
+            context_tokens: Budget de tokens du contexte d'historique (0 = désactivé)
+            router: Routeur de modèles, partagé par AgentRuntime (créé sinon)
+            prefetch: Précharger les chemins probables pendant l'appel au LLM
+            transport: Transport des appels API (cassette), ignoré si llm est fourni
+            prefetch_submit: Soumission au pool de préchargement (AgentRuntime), jamais au pool des requêtes
         """
-        self.llm = LLMInterface()
-        self.executor = Executor(working_dir=working_dir)
+        self.llm = llm or LLMInterface(
+            include_history=True,
+            rate_limiter=rate_limiter,
+            budget=token_budget,
+            transport=transport
+        )
+        self.context_builder = ContextBuilder(max_tokens=context_tokens)
+        self._owns_router = router is None
+        self.router = router or ModelRouter()
+        self.executor = Executor(
+            working_dir=working_dir,
+            approval_policy=approval_policy,
+            approver=approver,
+            workspace_lock=workspace_lock,
+            tools=tools or Tools(working_dir=working_dir, cache=ContentCache())
+        )
+        self.prefetcher = Prefetcher(
+            self.executor.tools,
+            validator=self.executor.safety.validate_file_path,
+            max_paths=8 if prefetch else 0,
+            submit=prefetch_submit
+        )
         self.history = ActionHistory()
         self.history_file = history_file
         
-        # Charger l'historique existant si fourni
+        # Charger l'historique existant; les nouvelles actions sont écrites
+        # par un thread dédié, hors du chemin de la requête
         if history_file:
-            self.history.load_from_file(history_file)
-        
-        logger.info(f"Agent initialisé | working_dir: {working_dir}")
+            self.history.attach_file(history_file, background=True, spill_blobs=spill_blobs)
         
+        logger.info("Agent initialisé | working_dir: %s", working_dir)
+    
     def process_request(self, instruction: str) -> Dict[str, Any]:
         """
         Traite une demande utilisateur complète:
@@ -50,112 +108,234 @@ class Agent:
         
         Args:
             instruction: L'instruction de l'utilisateur
-            
+        
         Returns:
-            Dict avec: instruction, reasoning, action, result, status, execution_time
+            Dict avec: instruction, reasoning, action, result, status, execution_time, timings, usage,
+            model (modèle de la décision finale), escalated_from (premier modèle si escalade)
+            et prefetch_hit (cible préchargée, None si l'action n'est pas une lecture)
         """
-        start_time = time.time()
-        logger.info(f"[Agent] Traitement de: '{instruction}'")
-        
-        # Étape 1: Appel au LLM pour décider l'action
-        logger.info("[Agent] Analyse et décision via LLM...")
-        # Transmettre les dernières actions au LLM pour le contexte
-        recent_actions = self.history.get_recent_actions(count=5)
-        llm_response = self.llm.call_llm(instruction, recent_actions=recent_actions)
-        
-        reasoning = llm_response.get("reasoning", "N/A")
-        action = llm_response.get("action", "error")
-        parameters = llm_response.get("parameters", {})
-        safety_check = llm_response.get("safety_check", "N/A")
-        
-        logger.info(f"[Agent Reasoning] {reasoning}")
-        logger.info(f"[Agent Decision] Action: {action}")
-        logger.info(f"[Sécurité] {safety_check}")
-        
-        # Étape 2: Exécution de l'action
-        logger.info(f"[Agent] Exécution de l'action: {action}")
-        execution_result = self.executor.execute_action(action, parameters)
-        
-        # Calculer le temps d'exécution
-        execution_time = time.time() - start_time
-        
-        # Détermine le statut (succès si aucune erreur)
-        status = "success" if execution_result.get("success", True) else "error"
-        
-        # Étape 3: Enregistrement dans l'historique
-        self.history.record_action(
-            action=action,
-            parameters=parameters,
-            result=execution_result,
-            reasoning=reasoning,
-            execution_time=execution_time,
-            status=status
-        )
-        
-        # Sauvegarder l'historique si un fichier est spécifié
-        if self.history_file:
-            self.history.save_to_file(self.history_file)
-        
-        # Étape 4: Formatage du résultat
-        result = {
-            "instruction": instruction,
-            "reasoning": reasoning,
-            "action": action,
-            "parameters": parameters,
-            "security_check": safety_check,
-            "execution_result": execution_result,
-            "execution_time": execution_time,
-            "status": status
-        }
-        
-        logger.info(f"[Agent] Résultat: {status} ({execution_time:.3f}s)")
+        timer = PhaseTimer()
+        with request_scope(), span("agent.request", instruction=instruction[:200]) as request_span:
+            logger.info("[Agent] Traitement de: '%s'", instruction)
+            
+            # Étape 1: Appel au LLM pour décider l'action
+            logger.info("[Agent] Analyse et décision via LLM...")
+            # Contexte: actions passées les plus pertinentes pour cette instruction
+            # (phase à part: llm.prompt est chronométré par call_llm)
+            with timed(timer, "context"):
+                recent_records = self.history.recent_records(self.context_builder.max_candidates)
+                # Pendant que le LLM réfléchit, réchauffer le cache avec les chemins probables
+                prefetch_task = self.prefetcher.start(instruction, recent_records[-5:])
+                history_context = self.context_builder.build(
+                    instruction, recent_records, self.llm.usage.chars_per_token
+                )
+            
+            # Modèle choisi par le routeur; escalade vers un niveau supérieur si la tentative échoue
+            decision = self.router.route(instruction)
+            escalated_from = None
+            total_usage = TokenUsage()
+            while True:
+                with span("llm.decision", model=decision.model) as llm_span:
+                    llm_response = self.llm.call_llm(
+                        instruction, timer=timer, history_context=history_context, model=decision.model
+                    )
+                    
+                    reasoning = llm_response.get("reasoning", "N/A")
+                    action = llm_response.get("action", "error")
+                    parameters = llm_response.get("parameters", {})
+                    safety_check = llm_response.get("safety_check", "N/A")
+                    llm_span.set_attribute("action", action)
+                    llm_span.set_attribute("success", action != "error")
+                    if llm_response.get("usage"):
+                        call_usage = TokenUsage.from_dict(llm_response["usage"])
+                        total_usage.add(call_usage)
+                        llm_span.set_attribute("tokens", call_usage.total_tokens)
+                
+                logger.info("[Agent Reasoning] %s", reasoning)
+                logger.info("[Agent Decision] Action: %s (%s)", action, decision.model)
+                logger.info("[Sécurité] %s", safety_check)
+                
+                # Étape 2: Exécution de l'action
+                logger.info("[Agent] Exécution de l'action: %s", action)
+                if prefetch_task is not None:
+                    prefetch_task.cancel()
+                execution_result = self.executor.execute_action(action, parameters, timer)
+                
+                outcome = classify_outcome(llm_response, execution_result)
+                self.router.record(decision, outcome, action)
+                next_decision = self.router.escalate(decision, outcome)
+                if next_decision is None:
+                    break
+                
+                # Nouvelle tentative: oublier l'échange raté, mais décrire l'échec au modèle suivant
+                self.llm.discard_last_exchange()
+                if outcome == OUTCOME_PARSE_ERROR:
+                    failure = "réponse non conforme au format JSON demandé"
+                else:
+                    failure = summarize_action(action, parameters, execution_result, "error")
+                history_context = (
+                    (history_context or "")
+                    + f"\n\nTENTATIVE PRÉCÉDENTE ÉCHOUÉE ({outcome}): {failure}\n"
+                )
+                escalated_from = escalated_from or decision.model
+                decision = next_decision
+            
+            usage = total_usage.to_dict() if total_usage.calls else None
+            prefetch_hit = self.prefetcher.record(prefetch_task, action, parameters)
+            
+            # Calculer le temps d'exécution (horloge monotone)
+            execution_time = timer.elapsed()
+            
+            # Détermine le statut (succès si aucune erreur)
+            status = "success" if execution_result.get("success", True) else "error"
+            
+            # Étape 3: Enregistrement dans l'historique (ajouté au journal si history_file)
+            self.history.record_action(
+                action=action,
+                parameters=parameters,
+                result=execution_result,
+                reasoning=reasoning,
+                execution_time=execution_time,
+                status=status,
+                timings=timer.as_dict(),
+                timer=timer,
+                usage=usage
+            )
+            
+            # Étape 4: Formatage du résultat
+            result = {
+                "instruction": instruction,
+                "reasoning": reasoning,
+                "action": action,
+                "parameters": parameters,
+                "security_check": safety_check,
+                "execution_result": execution_result,
+                "execution_time": execution_time,
+                "status": status,
+                "timings": timer.as_dict(),
+                "usage": usage,
+                "model": decision.model,
+                "escalated_from": escalated_from,
+                "prefetch_hit": prefetch_hit
+            }
+            
+            request_span.set_attribute("action", action)
+            request_span.set_attribute("status", status)
+            request_span.set_attribute("model", decision.model)
+            request_span.set_attribute("escalated_from", escalated_from)
+            if total_usage.calls:
+                request_span.set_attribute("tokens", total_usage.total_tokens)
+            logger.info("[Agent] Résultat: %s (%.3fs)", status, execution_time)
         
         return result
     
-    def format_output(self, result: Dict[str, Any]) -> str:
+    def format_output(
+        self,
+        result: Dict[str, Any],
+        show_timings: bool = False,
+        max_lines: Optional[int] = None
+    ) -> str:
         """
         Formate le résultat pour affichage utilisateur
         
         Args:
             result: Résultat de process_request
-            
+            show_timings: Afficher le détail du temps par phase
+            max_lines: Lignes du contenu affichées au plus (None = tout)
+        
         Returns:
             String formaté pour affichage
         """
-        output = []
-        output.append("\n" + "="*60)
-        output.append(f"📋 Instruction: {result['instruction']}")
-        output.append("-"*60)
-        output.append(f"🧠 Reasoning: {result['reasoning']}")
-        output.append(f"🎯 Action: {result['action']}")
-        output.append(f"🔒 Sécurité: {result['security_check']}")
-        output.append(f"⏱️  Temps d'exécution: {result['execution_time']:.3f}s")
-        output.append("-"*60)
+        return "".join(self.iter_output(result, show_timings, max_lines))
+    
+    def iter_output(
+        self,
+        result: Dict[str, Any],
+        show_timings: bool = False,
+        max_lines: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Produit l'affichage du résultat morceau par morceau (même texte que format_output)
+        
+        Le contenu d'une lecture ou la sortie d'une commande n'est pas recopié dans une
+        chaîne intermédiaire; au-delà de max_lines, seuls le début et la fin sont produits.
+        
+        Args:
+            result: Résultat de process_request
+            show_timings: Afficher le détail du temps par phase
+            max_lines: Lignes du contenu affichées au plus (None = tout)
+        
+        Yields:
+            Morceaux de texte à écrire dans l'ordre
+        """
+        yield "\n" + "="*60 + "\n"
+        yield f"📋 Instruction: {result['instruction']}\n"
+        yield "-"*60 + "\n"
+        yield f"🧠 Reasoning: {result['reasoning']}\n"
+        yield f"🎯 Action: {result['action']}\n"
+        yield f"🔒 Sécurité: {result['security_check']}\n"
+        if result.get('escalated_from'):
+            yield f"🧭 Modèle: {result['model']} (escalade depuis {result['escalated_from']})\n"
+        yield f"⏱️  Temps d'exécution: {result['execution_time']:.3f}s\n"
+        if show_timings and result.get('timings'):
+            yield "⏱️  Détail par phase:\n"
+            yield format_timings(result['timings'], result['execution_time']) + "\n"
+            if result.get('prefetch_hit') is not None:
+                prefetch = self.prefetcher.stats()
+                yield (
+                    f"🔮 Préchargement: {'cible en cache' if result['prefetch_hit'] else 'cible manquée'} | "
+                    f"taux de succès {prefetch['hit_rate']:.0%} ({prefetch['hits']}/{prefetch['hits'] + prefetch['misses']})\n"
+                )
+        if result.get('usage'):
+            usage = TokenUsage.from_dict(result['usage'])
+            session = self.llm.usage.total
+            yield (
+                f"🔢 Tokens: {usage.format()} | session {session.total_tokens} "
+                f"({session.calls} appels)\n"
+            )
+        yield "-"*60 + "\n"
         
         exec_result = result['execution_result']
         if result['status'] == 'success' and exec_result.get('success'):
-            output.append("✅ RÉSULTAT:")
+            yield "✅ RÉSULTAT:\n"
             if 'content' in exec_result:
-                output.append(f"\n{exec_result['content']}")
+                yield "\n"
+                yield from iter_text(str(exec_result['content']), max_lines)
+                yield "\n"
             elif 'message' in exec_result:
-                output.append(f"{exec_result['message']}")
+                yield f"{exec_result['message']}\n"
             elif 'output' in exec_result:
-                output.append(f"{exec_result['output']}")
+                yield from iter_text(str(exec_result['output']), max_lines)
+                yield "\n"
             elif 'working_dir' in exec_result:
-                output.append(f"Répertoire: {exec_result['working_dir']}")
+                yield f"Répertoire: {exec_result['working_dir']}\n"
             elif 'items' in exec_result:
-                output.append(f"Items: {len(exec_result['items'])}")
+                yield f"Items: {len(exec_result['items'])}\n"
                 for item in exec_result['items'][:10]:  # Afficher max 10
                     size = item.get('size', 0)
                     item_type = 'dossier' if not item.get('is_file', False) else f'{size}b'
-                    output.append(f"  - {item['name']} ({item_type})")
+                    yield f"  - {item['name']} ({item_type})\n"
         else:
-            output.append("❌ ERREUR:")
+            yield "❌ ERREUR:\n"
             error_msg = exec_result.get('error', 'Erreur inconnue')
-            output.append(f"{error_msg}")
+            yield f"{error_msg}\n"
+        
+        writer_stats = self.history.writer_stats()
+        if writer_stats is not None:
+            yield (
+                f"💾 Écriture: file {writer_stats['queue_depth']} | "
+                f"{writer_stats['flush_count']} flush | "
+                f"latence moy. {writer_stats['average_flush_latency'] * 1000:.1f}ms "
+                f"(max {writer_stats['max_flush_latency'] * 1000:.1f}ms)\n"
+            )
         
-        output.append("="*60 + "\n")
-        return "\n".join(output)
+        yield "="*60 + "\n"
+    
+    def close(self) -> None:
+        """Libère les ressources de l'agent (journal d'historique, journal de routage propre)"""
+        self.history.close()
+        if self._owns_router:
+            self.router.close()
     
     def get_history_summary(self) -> Dict[str, Any]:
         """
@@ -173,29 +353,62 @@ class Agent:
         Returns:
             Historique formaté
         """
-        summary = self.history.get_action_summary()
-        output = []
-        output.append("\n" + "="*60)
-        output.append("📊 HISTORIQUE DES ACTIONS")
-        output.append("-"*60)
-        output.append(f"Nombre total d'actions: {summary['total_actions']}")
-        output.append(f"  ✅ Succès: {summary['success_count']}")
-        output.append(f"  ❌ Erreurs: {summary['error_count']}")
-        output.append(f"Temps total d'exécution: {summary['total_execution_time']:.3f}s")
-        
-        if summary['total_actions'] > 0:
-            output.append(f"Temps moyen: {summary['average_execution_time']:.3f}s")
-            output.append(f"Première action: {summary['first_action']}")
-            output.append(f"Dernière action: {summary['last_action']}")
-            
-            output.append("\n🔄 10 Dernières actions:")
-            output.append("-"*60)
-            for i, action in enumerate(self.history.get_recent_actions(10), 1):
-                status_emoji = "✅" if action['status'] == 'success' else "❌"
-                output.append(
-                    f"{i}. {status_emoji} {action['action']} "
-                    f"({action['execution_time']:.3f}s) - {action['timestamp']}"
-                )
+        return format_history(self.history)
+
+
+def format_history(history: ActionHistory) -> str:
+    """
+    Formate un historique pour affichage (sans Agent ni client API)
+    
+    Args:
+        history: Historique des actions
+    
+    Returns:
+        Historique formaté
+    """
+    summary = history.get_action_summary()
+    output = []
+    output.append("\n" + "="*60)
+    output.append("📊 HISTORIQUE DES ACTIONS")
+    output.append("-"*60)
+    output.append(f"Nombre total d'actions: {summary['total_actions']}")
+    output.append(f"  ✅ Succès: {summary['success_count']}")
+    output.append(f"  ❌ Erreurs: {summary['error_count']}")
+    output.append(f"Temps total d'exécution: {summary['total_execution_time']:.3f}s")
+    
+    if summary['total_actions'] > 0:
+        output.append(f"Temps moyen: {summary['average_execution_time']:.3f}s")
+        output.append(
+            f"Latence p50/p95 (approx.): ≤{summary['p50_execution_time']:.3f}s / "
+            f"≤{summary['p95_execution_time']:.3f}s"
+        )
+        output.append(f"Première action: {summary['first_action']}")
+        output.append(f"Dernière action: {summary['last_action']}")
+        
+        token_usage = history.get_token_usage()
+        if token_usage:
+            output.append("\n🔢 Tokens par action:")
+            for action, totals in sorted(token_usage.items()):
+                usage = TokenUsage.from_dict(totals)
+                output.append(f"  - {action}: {usage.format()} ({usage.calls} appels)")
         
-        output.append("="*60 + "\n")
-        return "\n".join(output)
+        output.append("\n🔄 10 Dernières actions:")
+        output.append("-"*60)
+        for i, action in enumerate(history.get_recent_actions(10), 1):
+            status_emoji = "✅" if action['status'] == 'success' else "❌"
+            output.append(
+                f"{i}. {status_emoji} {action['action']} "
+                f"({action['execution_time']:.3f}s) - {action['timestamp']}"
+            )
+    
+    writer_stats = history.writer_stats()
+    if writer_stats is not None:
+        output.append(
+            f"💾 Écriture: file {writer_stats['queue_depth']} | "
+            f"{writer_stats['flush_count']} flush | "
+            f"latence moy. {writer_stats['average_flush_latency'] * 1000:.1f}ms "
+            f"(max {writer_stats['max_flush_latency'] * 1000:.1f}ms)"
+        )
+    
+    output.append("="*60 + "\n")
+    return "\n".join(output)
@@ -0,0 +1,233 @@
+"""
+Politiques d'approbation - Phase 5
+Décide des actions dangereuses (delete_file) sans bloquer sur input()
+Règles glob allow/deny, quota de suppressions par session, dry-run et approbateurs pluggables
+"""
+
+import fnmatch
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Approver(ABC):
+    """
+    Interface d'approbation des actions dangereuses
+    
+    Les implémentations ne doivent jamais bloquer indéfiniment:
+    les modes batch et serveur utilisent des approbateurs non interactifs.
+    """
+    
+    @abstractmethod
+    def approve(self, action_type: str, description: str) -> bool:
+        """
+        Décide si une action dangereuse peut être exécutée
+        
+        Args:
+            action_type: Type d'action (delete_file, etc.)
+            description: Description détaillée de l'action
+        
+        Returns:
+            True si l'action est approuvée, False sinon
+        """
+
+
+class InteractiveApprover(Approver):
+    """Demande confirmation sur le terminal (comportement historique)"""
+    
+    def approve(self, action_type: str, description: str) -> bool:
+        try:
+            response = input(
+                f"\n⚠️  ACTION DANGEREUSE DÉTECTÉE: {action_type}\n"
+                f"Description: {description}\n"
+                f"Êtes-vous CERTAIN? (oui/non): "
+            )
+            return response.lower() in ['oui', 'yes', 'o', 'y']
+        except EOFError:
+            # En cas d'entrée non disponible (scripts), refuser
+            logger.error("Impossible de confirmer action dangereuse: pas d'entrée disponible")
+            return False
+
+
+class StaticApprover(Approver):
+    """Réponse fixe, sans aucune interaction (modes batch et serveur)"""
+    
+    def __init__(self, answer: bool = False):
+        """
+        Args:
+            answer: Décision renvoyée pour toute action non couverte par la politique
+        """
+        self.answer = answer
+    
+    def approve(self, action_type: str, description: str) -> bool:
+        logger.info(
+            "Approbation non interactive: %s -> %s", action_type, 'oui' if self.answer else 'non'
+        )
+        return self.answer
+
+
+class ApprovalPolicy:
+    """
+    Politique d'approbation des suppressions
+    
+    Ordre d'évaluation pour un chemin:
+    1. deny (glob) → refus immédiat
+    2. quota max_deletes atteint → refus
+    3. allow (glob) → approuvé sans interaction
+    4. sinon → délégué à l'approbateur
+    """
+    
+    def __init__(
+        self,
+        allow: Optional[List[str]] = None,
+        deny: Optional[List[str]] = None,
+        max_deletes: Optional[int] = None,
+        dry_run: bool = False
+    ):
+        """
+        Args:
+            allow: Globs de chemins dont la suppression est approuvée d'office
+            deny: Globs de chemins dont la suppression est toujours refusée
+            max_deletes: Nombre maximum de suppressions par session (None = illimité)
+            dry_run: Si True, les suppressions approuvées ne sont pas exécutées
+        """
+        self.allow = list(allow or [])
+        self.deny = list(deny or [])
+        self.max_deletes = max_deletes
+        self.dry_run = dry_run
+        self.delete_count = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_file(cls, filepath: str) -> "ApprovalPolicy":
+        """
+        Charge une politique depuis un fichier JSON
+        
+        Format:
+            {"allow": ["tmp/*"], "deny": ["*.py"], "max_deletes": 5, "dry_run": false}
+        
+        Args:
+            filepath: Chemin du fichier de politique
+        
+        Returns:
+            ApprovalPolicy
+        
+        Raises:
+            ValueError: Si le fichier est invalide
+        """
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Politique d'approbation invalide: {filepath} ({str(e)})")
+        
+        if not isinstance(data, dict):
+            raise ValueError(f"Politique d'approbation invalide: {filepath} (objet JSON attendu)")
+        
+        return cls.from_dict(data)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ApprovalPolicy":
+        """Construit une politique depuis un dictionnaire"""
+        return cls(
+            allow=data.get("allow", []),
+            deny=data.get("deny", []),
+            max_deletes=data.get("max_deletes"),
+            dry_run=bool(data.get("dry_run", False))
+        )
+    
+    def merge(
+        self,
+        allow: Optional[List[str]] = None,
+        deny: Optional[List[str]] = None,
+        max_deletes: Optional[int] = None,
+        dry_run: bool = False
+    ) -> "ApprovalPolicy":
+        """
+        Ajoute des règles (typiquement issues des flags CLI) à la politique
+        
+        Returns:
+            La politique elle-même
+        """
+        self.allow.extend(allow or [])
+        self.deny.extend(deny or [])
+        if max_deletes is not None:
+            self.max_deletes = max_deletes
+        self.dry_run = self.dry_run or dry_run
+        return self
+    
+    @staticmethod
+    def resolve_path(path: str, working_dir: Optional[Path] = None) -> Optional[str]:
+        """
+        Chemin comparé aux globs: résolu dans le répertoire de travail
+        ('.', '//', '..' et liens symboliques), en notation POSIX relative
+        
+        Args:
+            path: Chemin tel que donné par le LLM
+            working_dir: Répertoire de travail (défaut: répertoire courant)
+        
+        Returns:
+            Chemin relatif, ou None s'il sort du répertoire de travail
+        """
+        root = Path(working_dir or ".").resolve()
+        try:
+            return (root / path.replace('\\', '/')).resolve().relative_to(root).as_posix()
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def _matches(path: str, patterns: List[str]) -> bool:
+        name = Path(path).name
+        return any(
+            fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern)
+            for pattern in patterns
+        )
+    
+    def evaluate_delete(
+        self,
+        path: str,
+        approver: Approver,
+        working_dir: Optional[Path] = None
+    ) -> Tuple[bool, str]:
+        """
+        Évalue une demande de suppression
+        
+        Le compteur de suppressions n'est incrémenté que si la suppression est approuvée.
+        
+        Args:
+            path: Chemin relatif au répertoire de travail
+            approver: Approbateur pour les chemins non couverts par allow
+            working_dir: Répertoire de travail dans lequel le chemin est résolu
+        
+        Returns:
+            Tuple (is_approved, error_message)
+        """
+        relative = self.resolve_path(path, working_dir)
+        if relative is None:
+            return False, f"❌ Suppression hors du répertoire de travail: {path}"
+        if self._matches(relative, self.deny):
+            return False, f"❌ Suppression interdite par la politique: {path}"
+        
+        with self._lock:
+            if self.max_deletes is not None and self.delete_count >= self.max_deletes:
+                return False, f"❌ Quota de suppressions atteint ({self.max_deletes} par session)"
+            
+            if self._matches(relative, self.allow):
+                logger.info("Suppression approuvée par la politique: %s", path)
+                self.delete_count += 1
+                return True, ""
+        
+        if not approver.approve("delete_file", f"Supprimer le fichier: {path}"):
+            return False, "❌ Suppression annulée par l'utilisateur"
+        
+        with self._lock:
+            # Re-vérifier le quota: l'approbateur peut avoir été concurrent
+            if self.max_deletes is not None and self.delete_count >= self.max_deletes:
+                return False, f"❌ Quota de suppressions atteint ({self.max_deletes} par session)"
+            self.delete_count += 1
+        return True, ""
@@ -0,0 +1,238 @@
+"""
+Mode batch - Phase 5
+Exécute un lot d'instructions sur un pool de workers (un seul processus)
+Résultats diffusés en JSONL dans l'ordre de complétion, étiquetés par id d'entrée
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from src.approval import ApprovalPolicy, Approver
+from src.rate_limit import PRIORITY_BATCH, RateScheduler
+from src.runtime import AgentRuntime
+from src.timing import percentile
+from src.usage import TokenBudget, TokenUsage
+
+logger = logging.getLogger(__name__)
+
+
+def parse_batch(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Lit les instructions d'un lot
+    
+    Chaque ligne est soit un objet JSON {"id": ..., "instruction": ...},
+    soit une instruction en texte brut (id = numéro de ligne).
+    Les ids doivent être uniques (session et espace de travail par id).
+    
+    Args:
+        lines: Lignes du fichier d'entrée (ou de stdin)
+    
+    Returns:
+        Liste de {"id", "instruction"}
+    
+    Raises:
+        ValueError: Si une ligne JSON n'a pas d'instruction, ou si un id est en double
+    """
+    items = []
+    seen_ids = set()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Ligne {number}: JSON invalide ({str(e)})")
+            instruction = data.get("instruction")
+            if not isinstance(instruction, str) or not instruction.strip():
+                raise ValueError(f"Ligne {number}: champ 'instruction' manquant")
+            item = {"id": data.get("id", number), "instruction": instruction}
+        else:
+            item = {"id": number, "instruction": line}
+        if str(item["id"]) in seen_ids:
+            raise ValueError(f"Ligne {number}: id en double: {item['id']}")
+        seen_ids.add(str(item["id"]))
+        items.append(item)
+    return items
+
+
+def workspace_name(item_id: Any) -> str:
+    """
+    Nom de l'espace de travail isolé d'une entrée (un seul composant de chemin)
+    
+    Les caractères hors [\w.-] sont remplacés; un id modifié ou fait uniquement de
+    points ("." et ".." désigneraient la racine du lot ou son parent) reçoit un
+    suffixe d'empreinte, pour ne jamais sortir de la racine ni partager un espace.
+    """
+    raw = str(item_id)
+    name = re.sub(r'[^\w.-]', '_', raw)
+    if name == raw and name.strip('.'):
+        return name
+    digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:12]
+    return f"{name.strip('.') or 'id'}-{digest}"
+
+
+class BatchStats:
+    """Débit et latences d'un lot"""
+    
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.success_count = 0
+        self.error_count = 0
+        self.wall_time = 0.0
+        self.tokens = TokenUsage()
+    
+    def add(self, record: Dict[str, Any]) -> None:
+        """Comptabilise le résultat d'une instruction"""
+        self.latencies.append(record.get("execution_time", 0.0))
+        if record.get("status") == "success":
+            self.success_count += 1
+        else:
+            self.error_count += 1
+        if record.get("usage"):
+            self.tokens.add(TokenUsage.from_dict(record["usage"]))
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec total, success_count, error_count, wall_time,
+            throughput (instructions/s), p50 et p95 (secondes), tokens
+        """
+        latencies = sorted(self.latencies)
+        return {
+            "total": len(latencies),
+            "success_count": self.success_count,
+            "error_count": self.error_count,
+            "wall_time": self.wall_time,
+            "throughput": len(latencies) / self.wall_time if self.wall_time > 0 else 0.0,
+            "p50": percentile(latencies, 0.50) if latencies else 0.0,
+            "p95": percentile(latencies, 0.95) if latencies else 0.0,
+            "tokens": self.tokens.to_dict()
+        }
+
+
+class BatchRunner:
+    """
+    Exécute des instructions en parallèle sur un AgentRuntime
+    
+    Deux modes:
+    - partagé (défaut): une session par worker sur le même répertoire,
+      appels aux outils sérialisés par le verrou de l'espace de travail
+    - isolé: une session neuve par instruction, dans <working_dir>/<id>
+    """
+    
+    def __init__(
+        self,
+        working_dir: str = ".",
+        workers: int = 4,
+        isolate: bool = False,
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        rate_limiter: Optional[RateScheduler] = None,
+        token_budget: Optional[TokenBudget] = None,
+        transport: Optional[Any] = None
+    ):
+        """
+        Args:
+            working_dir: Répertoire de travail (racine des espaces isolés)
+            workers: Nombre de workers
+            isolate: Un espace de travail et une session par instruction
+            approval_policy: Politique d'approbation commune (quota global)
+            approver: Approbateur (défaut: refus, jamais d'interaction)
+            rate_limiter: Limite de débit API commune à tous les workers
+            token_budget: Limites de tokens de chaque session
+            transport: Transport des appels API (cassette) commun aux workers
+        """
+        self.working_dir = working_dir
+        self.isolate = isolate
+        self.runtime = AgentRuntime(
+            max_workers=workers,
+            approval_policy=approval_policy,
+            approver=approver,
+            rate_limiter=rate_limiter,
+            token_budget=token_budget,
+            transport=transport
+        )
+    
+    def _run_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"id": item["id"], "instruction": item["instruction"]}
+        session_id = None
+        try:
+            if self.isolate:
+                workspace = Path(self.working_dir) / workspace_name(item["id"])
+                workspace.mkdir(parents=True, exist_ok=True)
+                session_id = f"item-{item['id']}"
+                agent = self.runtime.session(
+                    session_id, working_dir=str(workspace), priority=PRIORITY_BATCH
+                )
+            else:
+                agent = self.runtime.session(
+                    f"worker-{threading.current_thread().name}",
+                    working_dir=self.working_dir,
+                    priority=PRIORITY_BATCH
+                )
+                # Instructions indépendantes: pas de conversation partagée entre entrées
+                agent.llm.reset_conversation()
+            result = agent.process_request(item["instruction"])
+            record.update({
+                "action": result["action"],
+                "parameters": result["parameters"],
+                "status": result["status"],
+                "execution_time": result["execution_time"],
+                "execution_result": result["execution_result"],
+                "usage": result.get("usage")
+            })
+        except Exception as e:
+            logger.error("[Batch] Erreur sur l'entrée %s: %s", item['id'], e)
+            record.update({
+                "status": "error",
+                "execution_time": time.perf_counter() - start,
+                "error": str(e)
+            })
+        finally:
+            if session_id is not None:
+                self.runtime.close_session(session_id)
+        return record
+    
+    def run(
+        self,
+        items: List[Dict[str, Any]],
+        on_result: Callable[[Dict[str, Any]], None]
+    ) -> BatchStats:
+        """
+        Exécute le lot et transmet chaque résultat dès qu'il est disponible
+        
+        Args:
+            items: Entrées produites par parse_batch
+            on_result: Appelé (depuis le thread principal) pour chaque résultat
+        
+        Returns:
+            BatchStats du lot
+        """
+        stats = BatchStats()
+        start = time.perf_counter()
+        logger.info(
+            "[Batch] %s instructions | %s workers | isolé: %s",
+            len(items), self.runtime.max_workers, self.isolate
+        )
+        
+        futures = [self.runtime.submit(self._run_item, item) for item in items]
+        for future in as_completed(futures):
+            record = future.result()
+            stats.add(record)
+            on_result(record)
+        
+        stats.wall_time = time.perf_counter() - start
+        return stats
+    
+    def close(self) -> None:
+        """Ferme les sessions et le runtime"""
+        self.runtime.close()
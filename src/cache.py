@@ -0,0 +1,189 @@
+"""
+Cache de contenu - Phase 5
+Contenu des fichiers lus, partagé entre sessions et validé par (mtime, taille)
+Borné en octets, éviction LRU, thread-safe
+Listings de répertoires gardés quelques secondes, le temps qu'une décision du LLM
+les utilise, et validés par le mtime du répertoire
+Pas de cache des os.stat: le valider coûterait un os.stat
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, taille, contenu)
+CacheEntry = Tuple[int, int, str]
+
+# (instant de mise en cache, mtime_ns du répertoire, entrées)
+ListingEntry = Tuple[float, int, List[Dict[str, Any]]]
+
+# Nombre maximal de listings conservés
+MAX_METADATA_ENTRIES = 4096
+
+
+class ContentCache:
+    """Cache LRU du contenu texte des fichiers"""
+    
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_file_bytes: int = 1024 * 1024,
+        metadata_ttl: float = 5.0
+    ):
+        """
+        Args:
+            max_bytes: Taille totale maximale du cache
+            max_file_bytes: Les fichiers plus gros ne sont pas mis en cache
+            metadata_ttl: Durée de validité des listings (secondes);
+                les écritures passant par Tools les invalident immédiatement
+        """
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.metadata_ttl = metadata_ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.metadata_hits = 0
+        self.metadata_misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._listings: "OrderedDict[str, ListingEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, path: Union[str, Path], stat: Optional[os.stat_result] = None) -> Optional[str]:
+        """
+        Contenu en cache si le fichier n'a pas changé depuis sa mise en cache
+        
+        Args:
+            path: Chemin absolu du fichier
+            stat: Résultat de os.stat déjà disponible (évite un appel système)
+        
+        Returns:
+            Contenu, ou None (absent ou périmé)
+        """
+        key = str(path)
+        if stat is None:
+            try:
+                stat = os.stat(key)
+            except OSError:
+                self.invalidate(key)
+                return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+    
+    def put(self, path: Union[str, Path], content: str, stat: os.stat_result) -> None:
+        """
+        Met un contenu en cache (ignoré au-delà de max_file_bytes)
+        
+        Args:
+            path: Chemin absolu du fichier
+            content: Contenu lu
+            stat: os.stat du fichier au moment de la lecture
+        """
+        if stat.st_size > self.max_file_bytes:
+            return
+        key = str(path)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, content)
+            self.size += stat.st_size
+            while self.size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted[1]
+    
+    def read_text(self, path: Union[str, Path]) -> str:
+        """
+        Lit un fichier texte (UTF-8) en passant par le cache
+        
+        Raises:
+            OSError, UnicodeDecodeError: Comme open()/read()
+        """
+        stat = os.stat(path)
+        content = self.get(path, stat)
+        if content is not None:
+            return content
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.put(path, content, stat)
+        return content
+    
+    def list_dir(self, path: Union[str, Path]) -> List[Dict[str, Any]]:
+        """
+        Entrées d'un répertoire (name, is_file, size)
+        
+        Le listing est réutilisé pendant metadata_ttl tant que le mtime du
+        répertoire n'a pas changé (ajout, suppression ou renommage d'entrée).
+        
+        Raises:
+            OSError: Comme os.scandir
+        """
+        key = str(path)
+        dir_mtime = os.stat(key).st_mtime_ns
+        now = time.monotonic()
+        with self._lock:
+            entry = self._listings.get(key)
+            if entry is not None and entry[1] == dir_mtime and now - entry[0] < self.metadata_ttl:
+                self.metadata_hits += 1
+                return entry[2]
+            self.metadata_misses += 1
+        items = []
+        with os.scandir(key) as entries:
+            for item in entries:
+                is_file = item.is_file()
+                items.append({
+                    "name": item.name,
+                    "is_file": is_file,
+                    "size": item.stat().st_size if is_file else 0
+                })
+        with self._lock:
+            self._listings[key] = (now, dir_mtime, items)
+            self._listings.move_to_end(key)
+            if len(self._listings) > MAX_METADATA_ENTRIES:
+                self._listings.popitem(last=False)
+        return items
+    
+    def invalidate(self, path: Union[str, Path]) -> None:
+        """Retire un fichier du cache (après écriture ou suppression), avec le listing parent"""
+        key = str(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+            self._listings.pop(key, None)
+            self._listings.pop(os.path.dirname(key), None)
+    
+    def invalidate_metadata(self) -> None:
+        """Oublie tous les listings (après une commande pouvant modifier des fichiers)"""
+        with self._lock:
+            self._listings.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec entries, bytes, hits, misses et hit_rate (contenu),
+            metadata_hits et metadata_misses (listings)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "metadata_hits": self.metadata_hits,
+                "metadata_misses": self.metadata_misses
+            }
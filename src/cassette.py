@@ -0,0 +1,265 @@
+"""
+Cassettes d'appels API - Phase 5
+Enregistre les paires requête/réponse réelles dans un fichier JSONL, puis les rejoue
+sans réseau ni coût de tokens (latence d'origine, réduite ou nulle)
+Les requêtes sont appariées par empreinte du prompt normalisé
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional
+from src.llm_interface import create_client
+from src.usage import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# Début du contexte d'historique ajouté à l'instruction (voir src.context)
+CONTEXT_MARKER = "\n\nCONTEXTE D'HISTORIQUE"
+
+
+class CassetteMiss(LookupError):
+    """Aucune réponse enregistrée pour cette requête"""
+
+
+def _normalize(text: Any) -> str:
+    return " ".join(str(text).split())
+
+
+def request_key(system: str, messages: List[Dict[str, Any]]) -> str:
+    """
+    Empreinte du prompt complet (prompt système et messages, espaces normalisés)
+    
+    Le modèle n'en fait pas partie: une cassette reste valable quand le routage change.
+    """
+    normalized = {
+        "system": _normalize(system),
+        "messages": [
+            {"role": message.get("role"), "content": _normalize(message.get("content", ""))}
+            for message in messages
+        ]
+    }
+    payload = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def instruction_key(messages: List[Dict[str, Any]]) -> str:
+    """Empreinte de la dernière instruction seule (sans contexte d'historique)"""
+    content = str(messages[-1].get("content", "")) if messages else ""
+    instruction = content.split(CONTEXT_MARKER, 1)[0]
+    return hashlib.sha256(_normalize(instruction).encode("utf-8")).hexdigest()
+
+
+class CassetteTextBlock:
+    """Bloc de texte rejoué (content[0].text)"""
+    
+    def __init__(self, text: str):
+        self.type = "text"
+        self.text = text
+
+
+class CassetteUsage:
+    """Équivalent de response.usage"""
+    
+    def __init__(self, usage: Dict[str, Any]):
+        self.input_tokens = int(usage.get("input_tokens", 0) or 0)
+        self.output_tokens = int(usage.get("output_tokens", 0) or 0)
+        self.cache_read_input_tokens = int(usage.get("cache_read_input_tokens", 0) or 0)
+        self.cache_creation_input_tokens = int(usage.get("cache_creation_input_tokens", 0) or 0)
+
+
+class CassetteResponse:
+    """Réponse rejouée, avec les champs lus par LLMInterface"""
+    
+    def __init__(self, entry: Dict[str, Any]):
+        self.content = [CassetteTextBlock(entry["text"])]
+        self.model = entry.get("model")
+        self.role = "assistant"
+        self.stop_reason = entry.get("stop_reason", "end_turn")
+        self.usage = CassetteUsage(entry.get("usage") or {})
+
+
+class _Messages:
+    """Équivalent de client.messages"""
+    
+    def __init__(self, create: Callable[..., Any]):
+        self.create = create
+
+
+class CassetteRecorder:
+    """
+    Transport enregistreur: transmet chaque appel au vrai client et ajoute
+    la paire requête/réponse à la cassette (une ligne JSON par appel)
+    
+    Thread-safe; la cassette est complétée, jamais réécrite.
+    """
+    
+    def __init__(self, path: str, client_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            path: Fichier cassette (JSONL)
+            client_factory: Client réel, créé au premier appel (défaut: create_client)
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recorded = 0
+        self.messages = _Messages(self.create)
+        self._client_factory = client_factory or create_client
+        self._client: Any = None
+        self._lock = threading.Lock()
+    
+    @property
+    def client(self) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+    
+    def create(self, **kwargs: Any) -> Any:
+        """Appel réel (messages.create), enregistré s'il réussit"""
+        start = time.perf_counter()
+        response = self.client.messages.create(**kwargs)
+        latency = time.perf_counter() - start
+        
+        messages = kwargs.get("messages", [])
+        usage = getattr(response, "usage", None)
+        entry = {
+            "key": request_key(kwargs.get("system", ""), messages),
+            "instruction_key": instruction_key(messages),
+            "instruction": str(messages[-1].get("content", ""))[:200] if messages else "",
+            "model": kwargs.get("model"),
+            "text": response.content[0].text,
+            "stop_reason": getattr(response, "stop_reason", None),
+            "usage": TokenUsage.from_response(usage).to_dict() if usage is not None else None,
+            "latency": latency,
+            "recorded_at": time.time()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.recorded += 1
+        logger.debug("[Cassette] Enregistré: %s (%.2fs)", entry['key'][:12], latency)
+        return response
+    
+    def close(self) -> None:
+        close = getattr(self._client, "close", None)
+        if callable(close):
+            close()
+
+
+class CassettePlayer:
+    """
+    Transport de rejeu: répond depuis la cassette, sans réseau
+    
+    Appariement par empreinte du prompt complet, sinon (strict=False) par
+    empreinte de la dernière instruction seule. Les réponses d'une même empreinte
+    sont rejouées dans l'ordre d'enregistrement; la dernière est réutilisée ensuite.
+    """
+    
+    def __init__(self, path: str, latency_scale: float = 0.0, strict: bool = False):
+        """
+        Args:
+            path: Fichier cassette (JSONL) produit par CassetteRecorder
+            latency_scale: Facteur appliqué aux latences enregistrées (1 = d'origine, 0 = aucune)
+            strict: Exiger le même prompt complet (contexte d'historique compris)
+        
+        Raises:
+            FileNotFoundError: Si la cassette n'existe pas
+        """
+        self.path = Path(path).expanduser()
+        self.latency_scale = max(0.0, latency_scale)
+        self.strict = strict
+        self.hits = 0
+        self.fallbacks = 0
+        self.misses = 0
+        self.messages = _Messages(self.create)
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._by_instruction: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._load()
+    
+    def _load(self) -> None:
+        count = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("[Cassette] Ligne %s ignorée (JSON invalide)", number)
+                    continue
+                self._by_key.setdefault(entry["key"], deque()).append(entry)
+                self._by_instruction.setdefault(entry.get("instruction_key", ""), deque()).append(entry)
+                count += 1
+        logger.info("[Cassette] %s réponses chargées depuis %s", count, self.path)
+    
+    @staticmethod
+    def _take(entries: Optional[Deque[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        if not entries:
+            return None
+        return entries.popleft() if len(entries) > 1 else entries[0]
+    
+    def create(self, **kwargs: Any) -> CassetteResponse:
+        """
+        Réponse enregistrée pour la requête (messages.create)
+        
+        Raises:
+            CassetteMiss: Si aucune réponse ne correspond
+        """
+        messages = kwargs.get("messages", [])
+        key = request_key(kwargs.get("system", ""), messages)
+        with self._lock:
+            entry = self._take(self._by_key.get(key))
+            if entry is not None:
+                self.hits += 1
+            elif not self.strict:
+                entry = self._take(self._by_instruction.get(instruction_key(messages)))
+                if entry is not None:
+                    self.fallbacks += 1
+            if entry is None:
+                self.misses += 1
+        if entry is None:
+            raise CassetteMiss(f"Aucune réponse enregistrée pour cette requête ({key[:12]})")
+        
+        delay = float(entry.get("latency") or 0.0) * self.latency_scale
+        if delay > 0:
+            time.sleep(delay)
+        return CassetteResponse(entry)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict avec hits (prompt identique), fallbacks (instruction seule) et misses
+        """
+        with self._lock:
+            return {"hits": self.hits, "fallbacks": self.fallbacks, "misses": self.misses}
+    
+    def close(self) -> None:
+        pass
+
+
+def open_cassette(
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    latency_scale: float = 0.0
+) -> Optional[Any]:
+    """
+    Transport correspondant aux options --record / --replay (None si aucune)
+    
+    Raises:
+        ValueError: Si les deux options sont données
+    """
+    if record and replay:
+        raise ValueError("--record et --replay sont incompatibles")
+    if record:
+        return CassetteRecorder(record)
+    if replay:
+        return CassettePlayer(replay, latency_scale=latency_scale)
+    return None
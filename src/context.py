@@ -0,0 +1,230 @@
+"""
+Contexte d'historique - Phase 5
+Sélectionne les actions passées pertinentes pour une nouvelle instruction
+(chemins mentionnés, récence, échecs) et les emballe dans un budget de tokens
+à partir de résumés d'une ligne calculés à l'enregistrement
+"""
+
+import logging
+import re
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from src.digest import preview_text
+
+logger = logging.getLogger(__name__)
+
+# Longueur maximale d'un résumé d'action (une ligne dans le prompt)
+SUMMARY_CHARS = 160
+
+# Paramètres qui désignent un fichier ou un répertoire
+PATH_PARAMETERS = ("path", "source", "destination")
+
+# Mots ressemblant à un chemin: contient un séparateur ou une extension
+_PATH_PATTERN = re.compile(r"[\w.~-]*[\w-](?:/[\w.-]+)+/?|[\w-]+\.[A-Za-z0-9]{1,8}\b")
+
+# Poids du score de pertinence
+PATH_WEIGHT = 4.0
+FAILURE_WEIGHT = 1.5
+RECENCY_WEIGHT = 2.0
+RECENCY_HALF_LIFE = 5  # actions
+
+CONTEXT_HEADER = (
+    "\n\nCONTEXTE D'HISTORIQUE (actions précédentes pertinentes, "
+    "de la plus ancienne à la plus récente):"
+)
+CONTEXT_FOOTER = (
+    "Utilise ce contexte pour éviter de refaire les mêmes actions "
+    "et pour coordonner les tâches logiquement."
+)
+
+
+def _single_line(text: str, limit: int) -> str:
+    # Découpe préalable: les contenus lus peuvent être volumineux
+    text = " ".join(str(text)[:limit * 4].split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def path_keys(path: str) -> Set[str]:
+    """Formes comparables d'un chemin: chemin normalisé et nom de fichier"""
+    normalized = path.strip().replace("\\", "/")
+    while normalized.startswith("./"):
+        normalized = normalized[2:]
+    normalized = str(PurePosixPath(normalized or "."))
+    keys = {normalized.lower()}
+    name = PurePosixPath(normalized).name
+    if name:
+        keys.add(name.lower())
+    return keys
+
+
+def extract_paths(text: str) -> List[str]:
+    """Chemins et noms de fichiers cités dans un texte, tels qu'écrits (sans doublon)"""
+    return list(dict.fromkeys(match.rstrip("/.") or match for match in _PATH_PATTERN.findall(text)))
+
+
+def mentioned_paths(text: str) -> Set[str]:
+    """Chemins et noms de fichiers cités dans un texte (voir path_keys)"""
+    keys: Set[str] = set()
+    for match in extract_paths(text):
+        keys |= path_keys(match)
+    return keys
+
+
+def record_paths(parameters: Dict[str, Any]) -> Set[str]:
+    """Chemins touchés par une action (paramètres de chemin et commande)"""
+    keys: Set[str] = set()
+    for name in PATH_PARAMETERS:
+        value = parameters.get(name)
+        if isinstance(value, str) and value:
+            keys |= path_keys(value)
+    command = parameters.get("command")
+    if isinstance(command, str):
+        keys |= mentioned_paths(command)
+    return keys
+
+
+def summarize_action(
+    action: str,
+    parameters: Dict[str, Any],
+    result: Dict[str, Any],
+    status: str
+) -> str:
+    """
+    Résumé d'une ligne d'une action (calculé une fois par enregistrement)
+    
+    Returns:
+        Ex: "✅ read_file path=notes.txt → Bonjour le monde…"
+    """
+    status_symbol = "✅" if status == "success" else "❌"
+    arguments = " ".join(
+        f"{name}={_single_line(value, 60)}"
+        for name, value in parameters.items()
+        if name != "content" and isinstance(value, (str, int, float))
+    )
+    summary = f"{status_symbol} {action}"
+    if arguments:
+        summary += f" {arguments}"
+    
+    if not isinstance(result, dict):
+        outcome = None
+    elif status != "success" or not result.get("success", True):
+        outcome = f"Erreur: {result.get('error', 'Inconnue')}"
+    else:
+        outcome = preview_text(result)
+        if outcome is None:
+            outcome = result.get("message")
+    if outcome:
+        summary += f" → {_single_line(outcome, SUMMARY_CHARS)}"
+    return _single_line(summary, SUMMARY_CHARS)
+
+
+class ContextBuilder:
+    """
+    Construit le contexte d'historique d'une instruction
+    
+    Score d'une action passée:
+    - chemins en commun avec l'instruction (poids le plus fort)
+    - récence (décroissance exponentielle, demi-vie en nombre d'actions)
+    - échec récent ou sur les mêmes chemins (évite de répéter une erreur)
+    Les actions sont ensuite retenues par score décroissant tant que le budget
+    de tokens le permet, puis présentées dans l'ordre chronologique.
+    """
+    
+    def __init__(self, max_tokens: int = 400, max_candidates: int = 100, min_score: float = 0.5):
+        """
+        Args:
+            max_tokens: Budget de tokens du contexte
+            max_candidates: Nombre d'actions récentes examinées
+            min_score: Score minimal pour qu'une action soit retenue
+        """
+        self.max_tokens = max_tokens
+        self.max_candidates = max_candidates
+        self.min_score = min_score
+    
+    def score(self, record: Any, mentioned: Set[str], age: int) -> float:
+        """
+        Pertinence d'une action pour l'instruction
+        
+        Args:
+            record: ActionRecord (action, parameters, status)
+            mentioned: Chemins cités par l'instruction (mentioned_paths)
+            age: 0 pour l'action la plus récente, 1 pour la précédente, etc.
+        """
+        recency = 0.5 ** (age / RECENCY_HALF_LIFE)
+        overlap = len(mentioned & record_paths(record.parameters)) if mentioned else 0
+        score = RECENCY_WEIGHT * recency + PATH_WEIGHT * overlap
+        if record.status != "success":
+            score += FAILURE_WEIGHT * (recency + overlap)
+        return score
+    
+    def select(
+        self,
+        instruction: str,
+        records: Sequence[Any],
+        chars_per_token: float = 4.0
+    ) -> List[Tuple[float, Any]]:
+        """
+        Actions retenues pour le contexte
+        
+        Args:
+            instruction: Nouvelle instruction
+            records: ActionRecord, du plus ancien au plus récent
+            chars_per_token: Ratio caractères/token pour estimer le budget
+        
+        Returns:
+            Liste de (score, record) dans l'ordre chronologique
+        """
+        if not records or self.max_tokens <= 0:
+            return []
+        mentioned = mentioned_paths(instruction)
+        candidates = records[-self.max_candidates:]
+        newest = len(candidates) - 1
+        ranked = sorted(
+            (
+                (self.score(record, mentioned, newest - position), position, record)
+                for position, record in enumerate(candidates)
+            ),
+            key=lambda entry: (-entry[0], -entry[1])
+        )
+        
+        budget_chars = self.max_tokens * chars_per_token - len(CONTEXT_HEADER) - len(CONTEXT_FOOTER)
+        selected = []
+        seen: Set[str] = set()
+        for score, position, record in ranked:
+            if score < self.min_score:
+                break
+            # Actions répétées à l'identique: seule la plus pertinente est gardée
+            if record.summary in seen:
+                continue
+            cost = len(record.summary) + 1
+            if cost > budget_chars:
+                continue
+            budget_chars -= cost
+            seen.add(record.summary)
+            selected.append((position, score, record))
+        selected.sort(key=lambda entry: entry[0])
+        return [(score, record) for _, score, record in selected]
+    
+    def build(
+        self,
+        instruction: str,
+        records: Sequence[Any],
+        chars_per_token: float = 4.0
+    ) -> Optional[str]:
+        """
+        Texte du contexte à ajouter à l'instruction
+        
+        Returns:
+            Contexte formaté, ou None si aucune action n'est pertinente
+        """
+        selected = self.select(instruction, records, chars_per_token)
+        if not selected:
+            return None
+        lines = [CONTEXT_HEADER]
+        lines.extend(f"- {record.summary}" for _, record in selected)
+        lines.append(CONTEXT_FOOTER)
+        logger.debug(
+            "Contexte historique: %s/%s actions retenues",
+            len(selected), min(len(records), self.max_candidates)
+        )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,262 @@
+"""
+Mode daemon - Phase 5
+Garde des Agents chauds (client API, historique chargé) derrière un socket Unix local
+Le CLI transmet ses instructions au daemon quand il tourne, sans démarrage à froid
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from src.agent import Agent
+from src.approval import ApprovalPolicy, Approver
+from src.logger import default_state_dir
+from src.runtime import AgentRuntime
+
+logger = logging.getLogger(__name__)
+
+# Taille maximale d'une requête ou d'une réponse (une ligne JSON)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def daemon_supported() -> bool:
+    """True si la plateforme fournit les sockets Unix"""
+    return hasattr(socket, "AF_UNIX")
+
+
+def default_socket_path() -> str:
+    """
+    Chemin du socket: $AGENT_SOCKET, sinon $XDG_RUNTIME_DIR/agent-cli.sock,
+    sinon agent.sock dans le répertoire d'état de l'utilisateur
+    (jamais un nom prévisible dans le répertoire temporaire partagé)
+    """
+    env_path = os.getenv("AGENT_SOCKET")
+    if env_path:
+        return env_path
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / "agent-cli.sock")
+    return str(Path(default_state_dir()) / "agent.sock")
+
+
+def owned_by_current_user(path: str) -> bool:
+    """True si le fichier appartient à l'utilisateur courant (un autre utilisateur a pu créer le socket)"""
+    if not hasattr(os, "getuid"):
+        return True
+    try:
+        return os.stat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message, default=str, ensure_ascii=False).encode('utf-8') + b"\n")
+
+
+def _receive(stream: Any) -> Optional[Dict[str, Any]]:
+    line = stream.readline(MAX_MESSAGE_BYTES)
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class AgentDaemon:
+    """
+    Serveur de requêtes sur socket Unix
+    
+    Une session AgentRuntime chaude par (working_dir, history_file), réutilisée
+    d'une requête à l'autre (client API, cache et espaces de travail partagés);
+    les requêtes d'une même session sont sérialisées, les autres s'exécutent en parallèle.
+    """
+    
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        max_agents: int = 16
+    ):
+        """
+        Args:
+            socket_path: Chemin du socket (défaut: default_socket_path())
+            approval_policy: Politique d'approbation de toutes les requêtes
+            approver: Approbateur (défaut: refus, jamais d'interaction)
+            max_agents: Nombre maximum d'Agents chauds (les plus anciens sont fermés)
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.runtime = AgentRuntime(approval_policy=approval_policy, approver=approver)
+        self.max_agents = max(1, max_agents)
+        self.request_count = 0
+        self._agents: "OrderedDict[str, Tuple[Agent, threading.Lock]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingMixIn] = None
+    
+    def _agent(self, working_dir: str, history_file: Optional[str]) -> Tuple[Agent, threading.Lock]:
+        """Agent chaud pour un répertoire (créé au premier usage)"""
+        session_id = f"{working_dir}|{history_file or ''}"
+        with self._lock:
+            entry = self._agents.get(session_id)
+            if entry is not None:
+                self._agents.move_to_end(session_id)
+                return entry
+            agent = self.runtime.session(session_id, working_dir=working_dir, history_file=history_file)
+            entry = (agent, threading.Lock())
+            self._agents[session_id] = entry
+            evicted = []
+            while len(self._agents) > self.max_agents:
+                evicted.append(self._agents.popitem(last=False)[0])
+        for old_session_id in evicted:
+            self.runtime.close_session(old_session_id)
+        return entry
+    
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Traite une requête client
+        
+        Opérations:
+            {"op": "ping"}
+            {"op": "run", "instruction": ..., "working_dir": ..., "history_file": ...,
+             "timings": bool, "max_lines": int}
+            {"op": "shutdown"}
+        
+        Returns:
+            Réponse JSON ({"success": ..., ...})
+        """
+        op = request.get("op")
+        if op == "ping":
+            with self._lock:
+                agents = len(self._agents)
+            return {"success": True, "pid": os.getpid(), "agents": agents, "requests": self.request_count}
+        
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, name="daemon-shutdown", daemon=True).start()
+            return {"success": True}
+        
+        if op != "run":
+            return {"success": False, "error": f"Opération inconnue: {op}"}
+        
+        instruction = request.get("instruction")
+        working_dir = request.get("working_dir")
+        if not instruction or not working_dir:
+            return {"success": False, "error": "Champs 'instruction' et 'working_dir' requis"}
+        if not Path(working_dir).is_dir():
+            return {"success": False, "error": f"Le répertoire de travail n'existe pas: {working_dir}"}
+        
+        agent, agent_lock = self._agent(working_dir, request.get("history_file"))
+        with agent_lock:
+            # Même sémantique qu'un appel one-shot: conversation LLM vierge
+            agent.llm.reset_conversation()
+            result = agent.process_request(instruction)
+            output = agent.format_output(
+                result, show_timings=bool(request.get("timings")), max_lines=request.get("max_lines")
+            )
+        with self._lock:
+            self.request_count += 1
+        return {"success": True, "status": result["status"], "output": output}
+    
+    def serve_forever(self) -> None:
+        """
+        Écoute sur le socket jusqu'à shutdown()
+        
+        Raises:
+            RuntimeError: Si un daemon répond déjà sur ce socket
+        """
+        if ping_daemon(self.socket_path) is not None:
+            raise RuntimeError(f"Un daemon tourne déjà sur {self.socket_path}")
+        # Socket orphelin d'un daemon arrêté brutalement
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        Path(self.socket_path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = _receive(self.rfile)
+                    if request is None:
+                        return
+                    response = daemon.handle(request)
+                except Exception as e:
+                    logger.error("[Daemon] Erreur requête: %s", e)
+                    response = {"success": False, "error": str(e)}
+                _send(self.connection, response)
+        
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+        
+        old_umask = os.umask(0o077)
+        try:
+            self._server = Server(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+        
+        logger.info("[Daemon] En écoute sur %s (pid %s)", self.socket_path, os.getpid())
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.close()
+    
+    def shutdown(self) -> None:
+        """Arrête la boucle du serveur (depuis un autre thread)"""
+        if self._server is not None:
+            self._server.shutdown()
+    
+    def close(self) -> None:
+        """Ferme les sessions chaudes (vide leurs journaux d'historique) et le runtime"""
+        with self._lock:
+            self._agents.clear()
+        self.runtime.close()
+
+
+def send_request(
+    request: Dict[str, Any],
+    socket_path: Optional[str] = None,
+    timeout: Optional[float] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Envoie une requête au daemon
+    
+    Args:
+        request: Requête JSON (voir AgentDaemon.handle)
+        socket_path: Chemin du socket (défaut: default_socket_path())
+        timeout: Délai maximum (secondes), None = illimité
+    
+    Returns:
+        Réponse du daemon, ou None si aucun daemon n'écoute
+        (ou si le socket n'appartient pas à l'utilisateur courant)
+    """
+    if not daemon_supported():
+        return None
+    path = socket_path or default_socket_path()
+    if not os.path.exists(path):
+        return None
+    if not owned_by_current_user(path):
+        logger.warning("[Daemon] Socket ignoré, il n'appartient pas à l'utilisateur courant: %s", path)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    with sock, sock.makefile('rb') as stream:
+        _send(sock, request)
+        return _receive(stream)
+
+
+def ping_daemon(socket_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Infos du daemon (pid, agents, requests), ou None s'il ne répond pas"""
+    try:
+        return send_request({"op": "ping"}, socket_path, timeout=2.0)
+    except (OSError, ValueError):
+        return None
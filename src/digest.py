@@ -0,0 +1,147 @@
+"""
+Empreintes de résultats - Phase 5
+Remplace les charges utiles (contenu lu, sortie de commande, listing) par un résumé compact:
+taille, hash, aperçu borné et pointeur optionnel vers un blob déporté sur disque
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Champs volumineux des résultats de Tools
+PAYLOAD_FIELDS = ("content", "output", "items")
+
+# Longueur maximale conservée pour les champs texte courts (message, error)
+MAX_TEXT_CHARS = 500
+
+Blob = Tuple[str, bytes]
+
+
+class BlobStore:
+    """Stockage adressé par contenu (sha256) des charges utiles déportées"""
+    
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Répertoire des blobs
+        """
+        self.directory = Path(directory)
+    
+    def path_for(self, sha256: str) -> Path:
+        """Chemin d'un blob (sous-répertoire par préfixe de hash)"""
+        return self.directory / sha256[:2] / sha256
+    
+    def write(self, sha256: str, data: bytes) -> None:
+        """Écrit un blob s'il n'existe pas déjà (remplacement atomique)"""
+        path = self.path_for(sha256)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    
+    def read(self, sha256: str) -> Optional[bytes]:
+        """Relit un blob (None s'il est absent)"""
+        try:
+            return self.path_for(sha256).read_bytes()
+        except OSError:
+            return None
+
+
+def _payload_bytes(field: str, value: Any) -> Tuple[bytes, str]:
+    """Sérialise une charge utile et construit son aperçu texte"""
+    if field == "items" and isinstance(value, list):
+        data = json.dumps(value, default=str, ensure_ascii=False).encode('utf-8')
+        names = [str(item.get("name", "?")) if isinstance(item, dict) else str(item) for item in value]
+        return data, ", ".join(names)
+    text = value if isinstance(value, str) else json.dumps(value, default=str, ensure_ascii=False)
+    return text.encode('utf-8'), text
+
+
+def is_digest(result: Any) -> bool:
+    """True si le résultat est déjà une empreinte (ou ne contient aucune charge utile)"""
+    return isinstance(result, dict) and not any(field in result for field in PAYLOAD_FIELDS)
+
+
+def digest_result(
+    result: Dict[str, Any],
+    preview_chars: int = 200,
+    spill: bool = False
+) -> Tuple[Dict[str, Any], List[Blob]]:
+    """
+    Construit l'empreinte compacte d'un résultat d'exécution
+    
+    Les champs scalaires (success, path, command, count, ...) sont conservés,
+    message/error sont bornés, et chaque charge utile est remplacée par
+    result["digests"][champ] = {bytes, lines, sha256, preview, truncated[, blob]}.
+    
+    Args:
+        result: Résultat retourné par Executor/Tools
+        preview_chars: Longueur maximale de l'aperçu
+        spill: Si True, les charges utiles plus longues que l'aperçu sont
+            retournées comme blobs à écrire (pointeur "blob" = sha256)
+    
+    Returns:
+        Tuple (empreinte, blobs à écrire [(sha256, données)])
+    """
+    if not isinstance(result, dict):
+        return {"success": False, "error": str(result)[:MAX_TEXT_CHARS]}, []
+    if is_digest(result):
+        return result, []
+    
+    digest: Dict[str, Any] = {}
+    digests: Dict[str, Any] = {}
+    blobs: List[Blob] = []
+    
+    for key, value in result.items():
+        if key in PAYLOAD_FIELDS:
+            data, text = _payload_bytes(key, value)
+            sha256 = hashlib.sha256(data).hexdigest()
+            truncated = len(text) > preview_chars
+            summary = {
+                "bytes": len(data),
+                "sha256": sha256,
+                "preview": text[:preview_chars],
+                "truncated": truncated
+            }
+            if key == "items" and isinstance(value, list):
+                summary["count"] = len(value)
+            else:
+                summary["lines"] = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+            if spill and truncated:
+                summary["blob"] = sha256
+                blobs.append((sha256, data))
+            digests[key] = summary
+        elif key in ("message", "error") and isinstance(value, str):
+            digest[key] = value[:MAX_TEXT_CHARS]
+        elif isinstance(value, (bool, int, float)) or value is None:
+            digest[key] = value
+        elif isinstance(value, str):
+            digest[key] = value[:MAX_TEXT_CHARS]
+    
+    if digests:
+        digest["digests"] = digests
+    return digest, blobs
+
+
+def preview_text(result: Dict[str, Any]) -> Optional[str]:
+    """
+    Aperçu textuel d'un résultat (brut ou empreinte)
+    
+    Returns:
+        Aperçu du contenu/sortie, ou None si absent
+    """
+    for field in ("content", "output"):
+        if isinstance(result.get(field), str):
+            return result[field]
+        summary = result.get("digests", {}).get(field)
+        if summary:
+            return summary.get("preview", "")
+    return None
@@ -0,0 +1,270 @@
+"""
+Journal d'événements structurés - Phase 5
+Un objet JSON par événement (requête, décision LLM, sécurité, outil, sous-processus),
+avec identifiant de requête, phase, action, durée, octets et tokens
+Les événements sont les spans de src.tracing (écouteur de fin de span), sans
+instrumentation parallèle
+Échantillonnage par niveau et par type d'événement (ex: 1% des succès, 100% des échecs)
+Aucun coût mesurable quand le journal est désactivé
+"""
+
+import atexit
+import json
+import logging
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+from src.tracing import Span, set_span_listener
+
+logger = logging.getLogger(__name__)
+
+# Identifiant de la requête en cours
+_request_id: ContextVar[Optional[str]] = ContextVar("event_request_id", default=None)
+
+# Spans émis comme événements: phase par nom de span, sinon par préfixe (avant le premier ".")
+SPAN_PHASES = {
+    "agent.request": "request",
+    "llm.decision": "llm",
+    "safety.approval": "approval",
+    "safety": "safety",
+    "tool": "tool",
+    "subprocess": "subprocess"
+}
+
+# Attributs de span gardés dans la trace seulement (texte libre de l'utilisateur)
+TRACE_ONLY_ATTRIBUTES = ("instruction",)
+
+# Journal global (None = journal désactivé)
+_event_log: Optional["EventLog"] = None
+
+
+class SamplingPolicy:
+    """
+    Taux d'échantillonnage (0 à 1) par niveau et par type d'événement
+    
+    Le taux d'un événement est cherché dans l'ordre: "<type>:<niveau>", "<type>",
+    puis de même pour chaque préfixe du type ("tool:error", "tool" pour "tool.read_file"),
+    puis "<niveau>" et enfin le défaut.
+    Le tirage dépend de l'identifiant de requête: à taux égal, les événements
+    d'une même requête sont gardés ou écartés ensemble.
+    """
+    
+    def __init__(self, rates: Optional[Dict[str, float]] = None, default: float = 1.0):
+        """
+        Args:
+            rates: Taux par clé (niveau, type ou préfixe de type, éventuellement suivi de ":<niveau>")
+            default: Taux des événements sans règle
+        """
+        self.rates = {key: min(1.0, max(0.0, float(rate))) for key, rate in (rates or {}).items()}
+        self.default = min(1.0, max(0.0, default))
+        self._resolved: Dict[Tuple[str, str], float] = {}
+    
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "SamplingPolicy":
+        """
+        Lit une spécification "clé=taux" séparée par des virgules
+        
+        Exemple: "info=0.01,warning=1,error=1,safety=0.001" ("*" fixe le défaut)
+        
+        Raises:
+            ValueError: Si une règle ou un taux est invalide
+        """
+        rates: Dict[str, float] = {}
+        default = 1.0
+        for rule in (spec or "").split(","):
+            rule = rule.strip()
+            if not rule:
+                continue
+            key, separator, value = rule.partition("=")
+            if not separator or not key.strip():
+                raise ValueError(f"Règle d'échantillonnage invalide: {rule} (attendu: clé=taux)")
+            rate = float(value)
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"Taux d'échantillonnage hors de [0, 1]: {rule}")
+            if key.strip() == "*":
+                default = rate
+            else:
+                rates[key.strip()] = rate
+        return cls(rates, default)
+    
+    def rate(self, event: str, level: str) -> float:
+        """Taux applicable à un type d'événement et un niveau"""
+        cache_key = (event, level)
+        rate = self._resolved.get(cache_key)
+        if rate is None:
+            rate = self._resolve(event, level)
+            self._resolved[cache_key] = rate
+        return rate
+    
+    def _resolve(self, event: str, level: str) -> float:
+        parts = event.split(".")
+        for prefix in (".".join(parts[:i]) for i in range(len(parts), 0, -1)):
+            for key in (f"{prefix}:{level}", prefix):
+                if key in self.rates:
+                    return self.rates[key]
+        return self.rates.get(level, self.default)
+    
+    def keep(self, event: str, level: str, request_id: Optional[str]) -> Tuple[bool, float]:
+        """
+        Returns:
+            Tuple (événement gardé, taux appliqué)
+        """
+        rate = self.rate(event, level)
+        if rate >= 1.0:
+            return True, rate
+        if rate <= 0.0:
+            return False, rate
+        draw = int(request_id[:8], 16) / 0x100000000 if request_id else secrets.randbelow(1 << 32) / 0x100000000
+        return draw < rate, rate
+
+
+class EventLog:
+    """Échantillonne les événements et les écrit en JSONL (thread-safe)"""
+    
+    def __init__(self, filepath: str, sampling: Optional[SamplingPolicy] = None):
+        """
+        Args:
+            filepath: Fichier JSONL (ouvert en ajout)
+            sampling: Taux d'échantillonnage (défaut: tout garder)
+        """
+        self.filepath = filepath
+        self.sampling = sampling or SamplingPolicy()
+        self.written = 0
+        self.sampled_out = 0
+        self._file = open(filepath, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def emit(self, name: str, level: str, fields: Dict[str, Any]) -> bool:
+        """
+        Écrit un événement s'il est retenu par l'échantillonnage
+        
+        Le fichier est vidé à chaque fin de requête (phase "request") et à chaque erreur.
+        
+        Returns:
+            True si l'événement a été écrit
+        """
+        request_id = _request_id.get()
+        keep, rate = self.sampling.keep(name, level, request_id)
+        if not keep:
+            with self._lock:
+                self.sampled_out += 1
+            return False
+        
+        record = {"ts": time.time(), "event": name, "level": level, "request_id": request_id}
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        record["sample_rate"] = rate
+        line = json.dumps(record, default=str, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._closed:
+                return False
+            try:
+                self._file.write(line)
+                if level == "error" or fields.get("phase") == "request":
+                    self._file.flush()
+                self.written += 1
+            except OSError as e:
+                logger.error("Erreur écriture événement: %s", e)
+                return False
+        return True
+    
+    def export_span(self, span: Span) -> bool:
+        """
+        Émet un span terminé comme événement (écouteur installé par configure_events)
+        
+        Seuls les spans de SPAN_PHASES deviennent des événements. Le niveau vaut
+        "error" si le span a échoué (exception, success faux, status autre que
+        success), "warning" si une vérification a refusé (allowed faux), "info" sinon.
+        
+        Returns:
+            True si l'événement a été écrit
+        """
+        phase = SPAN_PHASES.get(span.name) or SPAN_PHASES.get(span.name.split(".", 1)[0])
+        if phase is None:
+            return False
+        attributes = span.attributes
+        if (
+            "error" in attributes or attributes.get("success") is False
+            or attributes.get("status", "success") != "success"
+        ):
+            level = "error"
+        elif attributes.get("allowed") is False:
+            level = "warning"
+        else:
+            level = "info"
+        fields = {key: value for key, value in attributes.items() if key not in TRACE_ONLY_ATTRIBUTES}
+        fields["phase"] = phase
+        fields["duration"] = span.duration
+        return self.emit(span.name, level, fields)
+    
+    def close(self) -> None:
+        """Vide et ferme le fichier"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._file.close()
+        logger.debug(
+            "[Events] %s événements écrits, %s écartés par l'échantillonnage",
+            self.written, self.sampled_out
+        )
+
+
+def configure_events(filepath: str, sampling: Optional[str] = None) -> EventLog:
+    """
+    Active le journal d'événements global
+    
+    Args:
+        filepath: Fichier JSONL des événements
+        sampling: Spécification des taux (voir SamplingPolicy.parse), défaut: tout garder
+    
+    Returns:
+        Journal actif
+    
+    Raises:
+        ValueError: Si la spécification d'échantillonnage est invalide
+    """
+    global _event_log
+    policy = SamplingPolicy.parse(sampling)
+    shutdown_events()
+    _event_log = EventLog(filepath, policy)
+    set_span_listener(_event_log.export_span)
+    logger.info("Journal d'événements activé: %s (échantillonnage: %s)", filepath, sampling or "100%")
+    return _event_log
+
+
+def shutdown_events() -> None:
+    """Désactive le journal d'événements et ferme le fichier"""
+    global _event_log
+    event_log, _event_log = _event_log, None
+    if event_log is not None:
+        set_span_listener(None)
+        event_log.close()
+
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None) -> Iterator[Optional[str]]:
+    """
+    Rattache les événements du bloc à un identifiant de requête
+    
+    Sans journal actif ni identifiant imposé, le bloc s'exécute sans identifiant.
+    
+    Args:
+        request_id: Identifiant imposé (défaut: 16 caractères hexadécimaux aléatoires)
+    """
+    if request_id is None:
+        if _event_log is None:
+            yield None
+            return
+        request_id = secrets.token_hex(8)
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+atexit.register(shutdown_events)
@@ -5,27 +5,93 @@ Gère la sécurité: read_file, create_file, edit_file, delete_file, execute_com
 """
 
 import logging
-from typing import Any, Dict
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional, Tuple
 from src.tools import Tools
 from src.safety import SafetyValidator
+from src.approval import ApprovalPolicy, Approver
+from src.timing import PhaseTimer, timed
+from src.tracing import span
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(levelname)s] %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 class Executor:
     """Exécute les actions décidées par l'Agent avec validation de sécurité"""
     
-    def __init__(self, working_dir: str = "."):
-        """Initialise l'exécuteur avec les outils et le validateur"""
-        self.tools = Tools(working_dir=working_dir)
-        self.safety = SafetyValidator(working_dir=working_dir)
-        logger.debug(f"Executor initialisé avec working_dir: {working_dir}")
+    def __init__(
+        self,
+        working_dir: str = ".",
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        workspace_lock: Optional[threading.Lock] = None,
+        tools: Optional[Tools] = None
+    ):
+        """
+        Initialise l'exécuteur avec les outils et le validateur
         
-    def execute_action(self, action: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        Args:
+            working_dir: Répertoire de travail
+            approval_policy: Politique d'approbation des actions dangereuses
+            approver: Approbateur pour les actions non couvertes par la politique
+            workspace_lock: Verrou partagé par les exécuteurs d'un même répertoire
+                (sérialise les appels aux outils, mode batch)
+            tools: Outils partagés du répertoire (AgentRuntime), créés sinon
+        """
+        self.tools = tools or Tools(working_dir=working_dir)
+        self.safety = SafetyValidator(
+            working_dir=working_dir,
+            approval_policy=approval_policy,
+            approver=approver
+        )
+        self.workspace_lock = workspace_lock
+        logger.debug("Executor initialisé avec working_dir: %s", working_dir)
+    
+    def _validate(
+        self,
+        timer: Optional[PhaseTimer],
+        action: str,
+        check: str,
+        validator: Callable[..., Tuple[bool, str]],
+        *args: Any
+    ) -> Tuple[bool, str]:
+        """Exécute une vérification de sécurité (phase safety, span safety.<check>)"""
+        with timed(timer, "safety"), span(f"safety.{check}", action=action) as check_span:
+            is_valid, error_msg = validator(*args)
+            check_span.set_attribute("allowed", is_valid)
+        return is_valid, error_msg
+    
+    @staticmethod
+    def _refused(error_msg: str) -> Dict[str, Any]:
+        """Résultat d'une action refusée par un validateur de sécurité"""
+        return {"success": False, "error": error_msg, "safety_rejected": True}
+    
+    @staticmethod
+    def _declined(error_msg: str) -> Dict[str, Any]:
+        """Résultat d'une action refusée par la politique d'approbation ou l'utilisateur"""
+        return {"success": False, "error": error_msg, "approval_declined": True}
+    
+    def _run_tool(
+        self,
+        timer: Optional[PhaseTimer],
+        action: str,
+        tool: Callable[..., Dict[str, Any]],
+        *args: Any
+    ) -> Dict[str, Any]:
+        """Appelle un outil (phase tool, span tool.<action>)"""
+        lock = self.workspace_lock if self.workspace_lock is not None else nullcontext()
+        with timed(timer, "tool"), span(f"tool.{action}", action=action) as tool_span:
+            with lock:
+                result = tool(*args)
+            tool_span.set_attribute("success", result.get("success", False))
+        return result
+    
+    def execute_action(
+        self,
+        action: str,
+        parameters: Dict[str, Any],
+        timer: Optional[PhaseTimer] = None
+    ) -> Dict[str, Any]:
         """
         Exécute une action donnée avec les paramètres fournis
         Valide la sécurité avant exécution
@@ -33,79 +99,105 @@ class Executor:
         Args:
             action: Nom de l'action (read_file, create_file, edit_file, delete_file, execute_command, etc.)
             parameters: Paramètres pour l'action
-            
+            timer: Chronomètre de la requête (phases safety, approval, tool)
+        
         Returns:
             Dict avec le résultat de l'exécution
         """
-        logger.debug(f"[Exécution] Action: {action} | Paramètres: {parameters}")
+        logger.debug("[Exécution] Action: %s | Paramètres: %s", action, parameters)
         
         try:
             if action == "read_file":
                 path = parameters.get("path", "")
-                is_valid, error_msg = self.safety.validate_file_path(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: lecture refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                logger.info(f"[Sécurité] ✅ Lecture autorisée: {path}")
-                return self.tools.read_file(path)
+                    logger.warning("Sécurité: lecture refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                logger.info("[Sécurité] ✅ Lecture autorisée: %s", path)
+                return self._run_tool(timer, action, self.tools.read_file, path)
             
             elif action == "create_file":
                 path = parameters.get("path", "")
-                is_valid, error_msg = self.safety.validate_file_path(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: création refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                logger.info(f"[Sécurité] ✅ Création autorisée: {path}")
-                return self.tools.create_file(path, parameters.get("content", ""))
+                    logger.warning("Sécurité: création refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                logger.info("[Sécurité] ✅ Création autorisée: %s", path)
+                return self._run_tool(timer, action, self.tools.create_file, path, parameters.get("content", ""))
             
             elif action == "edit_file":
                 path = parameters.get("path", "")
-                is_valid, error_msg = self.safety.validate_file_path(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: édition refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                logger.info(f"[Sécurité] ✅ Édition autorisée: {path}")
-                logger.debug(f"Modification de fichier: {path}")
-                return self.tools.edit_file(path, parameters.get("content", ""))
+                    logger.warning("Sécurité: édition refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                logger.info("[Sécurité] ✅ Édition autorisée: %s", path)
+                logger.debug("Modification de fichier: %s", path)
+                return self._run_tool(timer, action, self.tools.edit_file, path, parameters.get("content", ""))
             
             elif action == "delete_file":
                 path = parameters.get("path", "")
-                is_valid, error_msg = self.safety.validate_delete_action(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: suppression refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                logger.info(f"[Sécurité] ⚠️  Suppression confirmée: {path}")
-                logger.debug(f"Suppression de fichier: {path}")
-                return self.tools.delete_file(path)
+                    logger.warning("Sécurité: suppression refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                is_approved, error_msg = self.safety.approve_delete(path, timer)
+                if not is_approved:
+                    logger.warning("Sécurité: suppression refusée - %s", error_msg)
+                    return self._declined(error_msg)
+                if self.safety.dry_run:
+                    logger.info("[Sécurité] Dry-run: suppression non exécutée: %s", path)
+                    return {
+                        "success": True,
+                        "message": f"[dry-run] Fichier qui serait supprimé: {path}",
+                        "dry_run": True
+                    }
+                logger.info("[Sécurité] ⚠️  Suppression confirmée: %s", path)
+                logger.debug("Suppression de fichier: %s", path)
+                return self._run_tool(timer, action, self.tools.delete_file, path)
             
             elif action == "execute_command":
                 command = parameters.get("command", "")
-                is_safe, error_msg = self.safety.is_command_safe(command)
+                is_safe, error_msg = self._validate(
+                    timer, action, "command", self.safety.is_command_safe, command
+                )
                 if not is_safe:
-                    logger.warning(f"Sécurité: commande refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                logger.info(f"[Sécurité] ✅ Commande autorisée: {command}")
-                logger.debug(f"Exécution de commande: {command}")
-                return self.tools.execute_command(command)
+                    logger.warning("Sécurité: commande refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                logger.info("[Sécurité] ✅ Commande autorisée: %s", command)
+                logger.debug("Exécution de commande: %s", command)
+                return self._run_tool(timer, action, self.tools.execute_command, command)
             
             elif action == "get_working_directory":
-                return self.tools.get_working_directory()
+                return self._run_tool(timer, action, self.tools.get_working_directory)
             
             elif action == "get_file_info":
                 path = parameters.get("path", "")
-                is_valid, error_msg = self.safety.validate_file_path(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: info fichier refusée - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                return self.tools.get_file_info(path)
+                    logger.warning("Sécurité: info fichier refusée - %s", error_msg)
+                    return self._refused(error_msg)
+                return self._run_tool(timer, action, self.tools.get_file_info, path)
             
             elif action == "list_files":
                 path = parameters.get("path", ".")
-                is_valid, error_msg = self.safety.validate_file_path(path)
+                is_valid, error_msg = self._validate(
+                    timer, action, "path", self.safety.validate_file_path, path
+                )
                 if not is_valid:
-                    logger.warning(f"Sécurité: listing refusé - {error_msg}")
-                    return {"success": False, "error": error_msg}
-                return self.tools.list_files(path)
+                    logger.warning("Sécurité: listing refusé - %s", error_msg)
+                    return self._refused(error_msg)
+                return self._run_tool(timer, action, self.tools.list_files, path)
             
             elif action == "error":
                 return {
@@ -114,14 +206,14 @@ class Executor:
                 }
             
             else:
-                logger.warning(f"Action inconnue: {action}")
+                logger.warning("Action inconnue: %s", action)
                 return {
                     "success": False,
                     "error": f"Action inconnue: {action}"
                 }
-                
+        
         except Exception as e:
-            logger.error(f"[Erreur Exécution] {str(e)}")
+            logger.error("[Erreur Exécution] %s", e)
             return {
                 "success": False,
                 "error": f"Erreur exécution: {str(e)}"
@@ -1,30 +1,274 @@
 """
 Historique des actions - Phase 4
 Enregistre toutes les actions exécutées par l'agent
+Tampon circulaire borné (deque) et agrégats maintenus en O(1)
 """
 
 import json
 import logging
-from datetime import datetime
+import math
+import sys
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Deque, Iterator, List, Dict, Any, Optional, Union
+from src.history_store import HistoryStore, open_history_store, run_query
+from src.history_writer import HistoryWriter
+from src.context import summarize_action
+from src.digest import BlobStore, digest_result
+from src.timing import PhaseTimer, timed
+from src.tracing import span
 
 logger = logging.getLogger(__name__)
 
 
+def parse_since(value: str) -> str:
+    """
+    Convertit une borne temporelle en horodatage ISO
+    
+    Accepte une date ISO (2024-05-01, 2024-05-01T12:00) ou une durée
+    relative: 30m, 12h, 7d, 2w.
+    
+    Args:
+        value: Borne temporelle
+        
+    Returns:
+        Horodatage ISO comparable aux timestamps de l'historique
+        
+    Raises:
+        ValueError: Si le format n'est pas reconnu
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*([smhdw])\s*', value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        seconds = amount * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}[unit]
+        return (datetime.now() - timedelta(seconds=seconds)).isoformat()
+    try:
+        return datetime.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Borne temporelle invalide: {value} (ex: 2024-05-01, 12h, 7d)")
+
+
+class ActionRecord:
+    """Enregistrement compact d'une action (__slots__, horodatage en float)"""
+    
+    __slots__ = (
+        "timestamp", "action", "parameters", "result",
+        "reasoning", "execution_time", "status", "timings", "usage", "summary"
+    )
+    
+    def __init__(
+        self,
+        timestamp: Union[float, str],
+        action: str,
+        parameters: Dict[str, Any],
+        result: Dict[str, Any],
+        reasoning: str,
+        execution_time: float,
+        status: str,
+        timings: Optional[Dict[str, float]] = None,
+        usage: Optional[Dict[str, int]] = None
+    ):
+        self.timestamp = timestamp
+        self.action = sys.intern(action)
+        self.parameters = parameters
+        self.result = result
+        self.reasoning = reasoning
+        self.execution_time = execution_time
+        self.status = sys.intern(status)
+        self.timings = timings
+        self.usage = usage
+        # Résumé d'une ligne pour le contexte du LLM (non persisté)
+        self.summary = summarize_action(self.action, parameters, result, self.status)
+    
+    @staticmethod
+    def format_timestamp(timestamp: Union[float, str, None]) -> Optional[str]:
+        """Convertit un horodatage interne au format ISO"""
+        if isinstance(timestamp, float):
+            return datetime.fromtimestamp(timestamp).isoformat()
+        return timestamp
+    
+    @property
+    def iso_timestamp(self) -> str:
+        """Horodatage au format ISO (calculé à la demande)"""
+        return str(self.format_timestamp(self.timestamp))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation dictionnaire (format des fichiers d'historique)"""
+        entry = {
+            "timestamp": self.iso_timestamp,
+            "action": self.action,
+            "parameters": self.parameters,
+            "result": self.result,
+            "reasoning": self.reasoning,
+            "execution_time": self.execution_time,
+            "status": self.status
+        }
+        if self.timings:
+            entry["timings"] = self.timings
+        if self.usage:
+            entry["usage"] = self.usage
+        return entry
+    
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any]) -> "ActionRecord":
+        """Reconstruit un enregistrement depuis un fichier d'historique"""
+        timestamp = entry.get("timestamp")
+        try:
+            timestamp = datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            timestamp = str(timestamp) if timestamp is not None else 0.0
+        return cls(
+            timestamp=timestamp,
+            action=str(entry.get("action", "?")),
+            parameters=entry.get("parameters", {}),
+            result=entry.get("result", {}),
+            reasoning=entry.get("reasoning", ""),
+            execution_time=float(entry.get("execution_time", 0) or 0),
+            status=str(entry.get("status", "success")),
+            timings=entry.get("timings"),
+            usage=entry.get("usage")
+        )
+
+
+class HistoryStats:
+    """
+    Agrégats de l'historique maintenus incrémentalement
+    
+    Compteurs, temps total et histogramme de latence (buckets log2 en ms)
+    couvrent toutes les actions enregistrées, y compris celles sorties du tampon.
+    """
+    
+    BUCKETS = 24  # 2^23 ms ≈ 2h20: au-delà, dernier bucket
+    
+    __slots__ = (
+        "total", "success_count", "error_count", "total_time",
+        "first_timestamp", "last_timestamp", "histogram"
+    )
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """Remet les agrégats à zéro"""
+        self.total = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.total_time = 0.0
+        self.first_timestamp: Union[float, str, None] = None
+        self.last_timestamp: Union[float, str, None] = None
+        self.histogram = [0] * self.BUCKETS
+    
+    def restore(self, summary: Dict[str, Any]) -> None:
+        """
+        Recharge les agrégats depuis un résumé stocké (SQLite, sidecar)
+        
+        Args:
+            summary: Dict produit par le store (total, success_count, ..., histogram)
+        """
+        self.reset()
+        self.total = int(summary.get("total", 0))
+        self.success_count = int(summary.get("success_count", 0))
+        self.error_count = int(summary.get("error_count", 0))
+        self.total_time = float(summary.get("total_time", 0.0))
+        self.first_timestamp = summary.get("first_timestamp")
+        self.last_timestamp = summary.get("last_timestamp")
+        for bucket, count in summary.get("histogram", {}).items():
+            self.histogram[min(int(bucket), self.BUCKETS - 1)] += int(count)
+    
+    @classmethod
+    def bucket_for(cls, seconds: float) -> int:
+        """Index du bucket: [2^(i-1), 2^i) ms, bucket 0 pour < 1 ms"""
+        ms = seconds * 1000.0
+        if ms < 1.0:
+            return 0
+        return min(int(math.log2(ms)) + 1, cls.BUCKETS - 1)
+    
+    def add(self, record: ActionRecord) -> None:
+        """Ajoute une action aux agrégats (O(1))"""
+        self.total += 1
+        if record.status == "success":
+            self.success_count += 1
+        elif record.status == "error":
+            self.error_count += 1
+        self.total_time += record.execution_time
+        self.histogram[self.bucket_for(record.execution_time)] += 1
+        
+        if self.first_timestamp is None:
+            self.first_timestamp = record.timestamp
+        self.last_timestamp = record.timestamp
+    
+    def percentile(self, q: float) -> float:
+        """
+        Percentile approximatif de la latence (borne haute du bucket)
+        
+        Args:
+            q: Quantile entre 0 et 1
+        
+        Returns:
+            Latence en secondes
+        """
+        if self.total == 0:
+            return 0.0
+        target = max(1, math.ceil(q * self.total))
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return (2 ** index) / 1000.0
+        return (2 ** (self.BUCKETS - 1)) / 1000.0
+
+
 class ActionHistory:
     """Gère l'historique des actions exécutées"""
     
-    def __init__(self, max_items: int = 100):
+    def __init__(self, max_items: int = 100, preview_chars: int = 200):
         """
         Initialise l'historique
         
         Args:
             max_items: Nombre maximum d'actions à conserver en mémoire
+            preview_chars: Longueur de l'aperçu conservé pour le contenu/sortie des actions
         """
-        self.actions: List[Dict[str, Any]] = []
+        self._records: Deque[ActionRecord] = deque(maxlen=max_items)
         self.max_items = max_items
-        logger.info(f"ActionHistory initialisé (max: {max_items} actions)")
+        self.preview_chars = preview_chars
+        self.blob_store: Optional[BlobStore] = None
+        self.stats = HistoryStats()
+        self.store: Optional[HistoryStore] = None
+        self.writer: Optional[HistoryWriter] = None
+        logger.info("ActionHistory initialisé (max: %s actions)", max_items)
+    
+    @property
+    def actions(self) -> List[Dict[str, Any]]:
+        """Actions conservées en mémoire, sous forme de dictionnaires"""
+        return [record.to_dict() for record in self._records]
+    
+    def _replace_records(
+        self,
+        entries: List[Dict[str, Any]],
+        summary: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Remplace le contenu de l'historique (chargement depuis un fichier)
+        
+        Args:
+            entries: Actions à charger
+            summary: Agrégats stockés couvrant tout le fichier (sinon calculés sur entries)
+        """
+        self._records.clear()
+        self.stats.reset()
+        if summary is not None:
+            self.stats.restore(summary)
+        for entry in entries:
+            record = ActionRecord.from_dict(entry)
+            # Les anciens fichiers contiennent les résultats complets
+            record.result, _ = digest_result(record.result, self.preview_chars)
+            if summary is None:
+                self.stats.add(record)
+            self._records.append(record)
     
     def record_action(
         self,
@@ -33,11 +277,17 @@ class ActionHistory:
         result: Dict[str, Any],
         reasoning: str = "",
         execution_time: float = 0.0,
-        status: str = "success"
+        status: str = "success",
+        timings: Optional[Dict[str, float]] = None,
+        timer: Optional[PhaseTimer] = None,
+        usage: Optional[Dict[str, int]] = None
     ) -> None:
         """
         Enregistre une action dans l'historique
         
+        Le résultat est conservé sous forme d'empreinte (taille, hash, aperçu),
+        la charge utile complète n'est gardée que dans un blob si activé.
+        
         Args:
             action: Nom de l'action (read_file, create_file, etc.)
             parameters: Paramètres de l'action
@@ -45,25 +295,58 @@ class ActionHistory:
             reasoning: Reasoning du LLM
             execution_time: Temps d'exécution en secondes
             status: Statut de l'action (success, error)
+            timings: Durées par phase de la requête (secondes)
+            timer: Chronomètre de la requête (phase history)
+            usage: Tokens consommés par l'appel LLM (voir TokenUsage.to_dict)
         """
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "action": action,
-            "parameters": parameters,
-            "result": result,
-            "reasoning": reasoning,
-            "execution_time": execution_time,
-            "status": status
-        }
+        with timed(timer, "history"), span("history.record"):
+            self._record(action, parameters, result, reasoning, execution_time, status, timings, usage)
+    
+    def _record(
+        self,
+        action: str,
+        parameters: Dict[str, Any],
+        result: Dict[str, Any],
+        reasoning: str,
+        execution_time: float,
+        status: str,
+        timings: Optional[Dict[str, float]],
+        usage: Optional[Dict[str, int]] = None
+    ) -> None:
+        """Construit l'enregistrement compact et le persiste (voir record_action)"""
+        digest, blobs = digest_result(
+            result,
+            self.preview_chars,
+            spill=self.blob_store is not None
+        )
+        record = ActionRecord(
+            timestamp=time.time(),
+            action=action,
+            parameters=parameters,
+            result=digest,
+            reasoning=reasoning,
+            execution_time=execution_time,
+            status=status,
+            timings=timings,
+            usage=usage
+        )
         
-        self.actions.append(entry)
+        # Le deque borné évince la plus ancienne action en O(1)
+        self._records.append(record)
+        self.stats.add(record)
         
-        # Limiter la taille en mémoire
-        if len(self.actions) > self.max_items:
-            removed = self.actions.pop(0)
-            logger.debug(f"Historique tronqué: {len(self.actions)} actions conservées")
+        # Persistance incrémentale: une ligne ajoutée, pas de réécriture complète
+        if self.writer is not None:
+            self.writer.submit(record.to_dict(), blobs)
+        elif self.store is not None:
+            try:
+                for sha256, data in blobs:
+                    self.blob_store.write(sha256, data)
+                self.store.append(record.to_dict())
+            except OSError as e:
+                logger.error("Erreur écriture journal historique: %s", e)
         
-        logger.debug(f"Action enregistrée: {action} ({status}) - {execution_time:.3f}s")
+        logger.debug("Action enregistrée: %s (%s) - %.3fs", action, status, execution_time)
     
     def get_recent_actions(self, count: int = 10) -> List[Dict[str, Any]]:
         """
@@ -71,20 +354,36 @@ class ActionHistory:
         
         Args:
             count: Nombre d'actions à retourner
-            
+        
         Returns:
             Liste des actions récentes
         """
-        return self.actions[-count:] if self.actions else []
+        if count <= 0 or not self._records:
+            return []
+        start = max(0, len(self._records) - count)
+        return [self._records[i].to_dict() for i in range(start, len(self._records))]
+    
+    def recent_records(self, count: int = 100) -> List[ActionRecord]:
+        """
+        Derniers enregistrements (résumés compris), du plus ancien au plus récent
+        
+        Args:
+            count: Nombre maximum d'enregistrements
+        """
+        if count <= 0 or not self._records:
+            return []
+        start = max(0, len(self._records) - count)
+        return [self._records[i] for i in range(start, len(self._records))]
     
     def get_action_summary(self) -> Dict[str, Any]:
         """
-        Retourne un résumé de l'historique
+        Retourne un résumé de l'historique (O(1), agrégats incrémentaux)
         
         Returns:
             Dict avec statistiques
         """
-        if not self.actions:
+        stats = self.stats
+        if stats.total == 0:
             return {
                 "total_actions": 0,
                 "success_count": 0,
@@ -92,20 +391,34 @@ class ActionHistory:
                 "total_execution_time": 0.0
             }
         
-        success_count = sum(1 for a in self.actions if a.get("status") == "success")
-        error_count = sum(1 for a in self.actions if a.get("status") == "error")
-        total_time = sum(a.get("execution_time", 0) for a in self.actions)
-        
         return {
-            "total_actions": len(self.actions),
-            "success_count": success_count,
-            "error_count": error_count,
-            "total_execution_time": total_time,
-            "average_execution_time": total_time / len(self.actions) if self.actions else 0,
-            "first_action": self.actions[0].get("timestamp") if self.actions else None,
-            "last_action": self.actions[-1].get("timestamp") if self.actions else None
+            "total_actions": stats.total,
+            "success_count": stats.success_count,
+            "error_count": stats.error_count,
+            "total_execution_time": stats.total_time,
+            "average_execution_time": stats.total_time / stats.total,
+            "p50_execution_time": stats.percentile(0.50),
+            "p95_execution_time": stats.percentile(0.95),
+            "first_action": ActionRecord.format_timestamp(stats.first_timestamp),
+            "last_action": ActionRecord.format_timestamp(stats.last_timestamp)
         }
     
+    def get_token_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        Tokens consommés par type d'action (actions du tampon)
+        
+        Returns:
+            Dict {action: {input_tokens, output_tokens, ..., calls}}
+        """
+        by_action: Dict[str, Dict[str, int]] = {}
+        for record in self._records:
+            if not record.usage:
+                continue
+            totals = by_action.setdefault(record.action, {})
+            for key, value in record.usage.items():
+                totals[key] = totals.get(key, 0) + int(value or 0)
+        return by_action
+    
     def to_json(self) -> str:
         """
         Sérialise l'historique en JSON
@@ -133,7 +446,7 @@ class ActionHistory:
         
         Args:
             filepath: Chemin du fichier de sauvegarde
-            
+        
         Returns:
             True si succès, False sinon
         """
@@ -144,11 +457,11 @@ class ActionHistory:
             with open(path, 'w', encoding='utf-8') as f:
                 json.dump(self.to_dict(), f, indent=2, default=str)
             
-            logger.info(f"Historique sauvegardé: {filepath} ({len(self.actions)} actions)")
+            logger.info("Historique sauvegardé: %s (%s actions)", filepath, len(self._records))
             return True
-            
+        
         except Exception as e:
-            logger.error(f"Erreur sauvegarde historique: {str(e)}")
+            logger.error("Erreur sauvegarde historique: %s", e)
             return False
     
     def load_from_file(self, filepath: str) -> bool:
@@ -157,32 +470,163 @@ class ActionHistory:
         
         Args:
             filepath: Chemin du fichier de sauvegarde
-            
+        
         Returns:
             True si succès, False sinon
         """
         try:
             path = Path(filepath)
             if not path.exists():
-                logger.warning(f"Fichier historique non trouvé: {filepath}")
+                logger.warning("Fichier historique non trouvé: %s", filepath)
                 return False
             
             with open(path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
             if isinstance(data, dict) and "actions" in data:
-                self.actions = data.get("actions", [])
+                entries = data.get("actions", [])
             else:
-                self.actions = data if isinstance(data, list) else []
+                entries = data if isinstance(data, list) else []
+            self._replace_records(entries)
             
-            logger.info(f"Historique chargé: {filepath} ({len(self.actions)} actions)")
+            logger.info("Historique chargé: %s (%s actions)", filepath, len(self._records))
             return True
-            
+        
         except Exception as e:
-            logger.error(f"Erreur chargement historique: {str(e)}")
+            logger.error("Erreur chargement historique: %s", e)
             return False
     
+    def attach_file(
+        self,
+        filepath: str,
+        background: bool = False,
+        writer_options: Optional[Dict[str, Any]] = None,
+        spill_blobs: bool = False,
+        lock: bool = True,
+        **store_options: Any
+    ) -> bool:
+        """
+        Associe un fichier d'historique persistant
+        
+        Journal JSONL en ajout seul (ancien format JSON accepté) ou base
+        SQLite selon l'extension (.db, .sqlite, .sqlite3). Les actions
+        existantes sont chargées, puis chaque record_action est persistée.
+        
+        Args:
+            filepath: Chemin du fichier d'historique
+            background: Si True, l'écriture se fait dans un thread dédié (HistoryWriter)
+            writer_options: Options du HistoryWriter (max_queue, batch_size, flush_interval)
+            spill_blobs: Si True, les charges utiles complètes sont déportées dans <fichier>.blobs/
+            lock: Réserver le journal à cet historique (False pour une simple lecture)
+            **store_options: Options du backend (fsync_every, compact_every, commit_every, ...)
+        
+        Returns:
+            True si succès, False sinon
+        """
+        store = None
+        try:
+            store = open_history_store(filepath, **store_options)
+            # Un seul écrivain par journal (daemon et exécution locale)
+            if lock:
+                store.lock_for_writing()
+            summary = store.summary()
+            entries = store.load(limit=self.max_items if summary is not None else None)
+            self._replace_records(entries, summary)
+            self.store = store
+            if spill_blobs:
+                self.blob_store = BlobStore(f"{filepath}.blobs")
+            if background:
+                self.writer = HistoryWriter(store, self.blob_store, **(writer_options or {}))
+            logger.info("Journal historique attaché: %s (%s actions)", filepath, len(self._records))
+            return True
+        except Exception as e:
+            logger.error("Erreur chargement historique: %s", e)
+            if store is not None:
+                store.unlock()
+            return False
+    
+    def query(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        action: Optional[str] = None,
+        failures_only: bool = False,
+        status: Optional[str] = None,
+        slowest: bool = False,
+        limit: Optional[int] = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche dans l'historique (fichier persistant si associé, sinon mémoire)
+        
+        Args:
+            since: Horodatage ISO minimum (inclus)
+            until: Horodatage ISO maximum (exclu)
+            action: Type d'action exact
+            failures_only: Ne garder que les actions en erreur
+            status: Statut exact (success, error)
+            slowest: Trier par temps d'exécution décroissant
+            limit: Nombre maximum de résultats
+            
+        Returns:
+            Liste des actions correspondantes
+        """
+        filters = dict(
+            since=since, until=until, action=action,
+            failures_only=failures_only, status=status, slowest=slowest, limit=limit
+        )
+        if self.store is not None:
+            self.flush()
+            return self.store.query(**filters)
+        return run_query(self.actions, **filters)
+    
+    def iter_stored(self, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Itère sur toutes les actions persistées, y compris celles hors mémoire
+        
+        Args:
+            reverse: Si True, de la plus récente à la plus ancienne
+            
+        Yields:
+            Actions au format dictionnaire
+        """
+        if self.store is None:
+            records = self.actions
+            return iter(records[::-1] if reverse else records)
+        self.flush()
+        return self.store.iter_records(reverse=reverse)
+    
+    def flush(self) -> None:
+        """Attend l'écriture des actions en file et synchronise le store"""
+        if self.writer is not None:
+            self.writer.flush()
+        if self.store is not None:
+            if self.writer is not None:
+                with self.writer.lock:
+                    self.store.sync()
+            else:
+                self.store.sync()
+    
+    def writer_stats(self) -> Optional[Dict[str, Any]]:
+        """Statistiques du thread d'écriture (None si écriture synchrone)"""
+        return self.writer.stats() if self.writer is not None else None
+    
+    def close(self) -> None:
+        """Ferme le journal associé (écritures en file, puis fsync)"""
+        if self.writer is not None:
+            self.writer.close()
+        if self.store is not None:
+            self.store.close()
+            self.store.unlock()
+    
     def clear(self) -> None:
         """Vide l'historique"""
-        self.actions.clear()
+        self._records.clear()
+        self.stats.reset()
+        if self.store is not None:
+            self.flush()
+            if self.writer is not None:
+                with self.writer.lock:
+                    self.store.truncate()
+            else:
+                self.store.truncate()
         logger.info("Historique vidé")
@@ -0,0 +1,785 @@
+"""
+Persistance de l'historique - Phase 5
+Journal JSONL en ajout seul: une ligne par action, coût constant par requête
+Fsync groupés, compaction en snapshot (sans perte par défaut), chargement tolérant aux crashs
+Backend SQLite optionnel (WAL, index) avec requêtes filtrées
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de daemon, pas de verrou
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SUFFIXES = {'.db', '.sqlite', '.sqlite3'}
+
+
+def matches_query(
+    entry: Dict[str, Any],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    action: Optional[str] = None,
+    failures_only: bool = False,
+    status: Optional[str] = None
+) -> bool:
+    """
+    Vérifie qu'une action correspond aux filtres d'une requête
+    
+    Args:
+        entry: Action (format dictionnaire de l'historique)
+        since: Horodatage ISO minimum (inclus)
+        until: Horodatage ISO maximum (exclu)
+        action: Type d'action exact
+        failures_only: Ne garder que les actions en erreur
+        status: Statut exact (success, error)
+    
+    Returns:
+        True si l'action correspond
+    """
+    timestamp = str(entry.get("timestamp", ""))
+    if since and timestamp < since:
+        return False
+    if until and timestamp >= until:
+        return False
+    if action and entry.get("action") != action:
+        return False
+    if failures_only and entry.get("status") == "success":
+        return False
+    if status and entry.get("status") != status:
+        return False
+    return True
+
+
+def run_query(
+    entries: Iterable[Dict[str, Any]],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    action: Optional[str] = None,
+    failures_only: bool = False,
+    status: Optional[str] = None,
+    slowest: bool = False,
+    limit: Optional[int] = 20
+) -> List[Dict[str, Any]]:
+    """
+    Exécute une requête en flux sur des actions (mémoire bornée par limit)
+    
+    Returns:
+        Les actions les plus lentes (ordre décroissant) si slowest,
+        sinon les dernières actions correspondantes (ordre chronologique)
+    """
+    matching = (
+        e for e in entries
+        if matches_query(e, since, until, action, failures_only, status)
+    )
+    if slowest:
+        if limit is None:
+            return sorted(matching, key=lambda e: e.get("execution_time", 0), reverse=True)
+        return heapq.nlargest(limit, matching, key=lambda e: e.get("execution_time", 0))
+    return list(deque(matching, maxlen=limit))
+
+
+def latency_bucket(seconds: float) -> int:
+    """Bucket log2 de latence en ms: [2^(i-1), 2^i) ms, bucket 0 pour < 1 ms"""
+    ms = seconds * 1000.0
+    if ms < 1.0:
+        return 0
+    return int(math.log2(ms)) + 1
+
+
+class StoreSummary:
+    """
+    Agrégats persistés à côté du journal (fichier sidecar .summary.json)
+    
+    Couvre toutes les actions écrites jusqu'à l'offset `size` du journal,
+    ce qui permet d'afficher le résumé sans relire l'historique.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """Remet les agrégats à zéro"""
+        self.data: Dict[str, Any] = {
+            "total": 0,
+            "success_count": 0,
+            "error_count": 0,
+            "total_time": 0.0,
+            "first_timestamp": None,
+            "last_timestamp": None,
+            "histogram": {},
+            "size": 0
+        }
+    
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Ajoute une action aux agrégats"""
+        data = self.data
+        status = entry.get("status")
+        execution_time = float(entry.get("execution_time", 0) or 0)
+        data["total"] += 1
+        if status == "success":
+            data["success_count"] += 1
+        elif status == "error":
+            data["error_count"] += 1
+        data["total_time"] += execution_time
+        bucket = str(latency_bucket(execution_time))
+        data["histogram"][bucket] = data["histogram"].get(bucket, 0) + 1
+        if data["first_timestamp"] is None:
+            data["first_timestamp"] = entry.get("timestamp")
+        data["last_timestamp"] = entry.get("timestamp")
+    
+    def load(self, path: Path) -> bool:
+        """Charge le sidecar; False s'il est absent ou invalide"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or not set(self.data) <= set(data):
+            return False
+        self.data = data
+        return True
+    
+    def save(self, path: Path) -> None:
+        """Écrit le sidecar (remplacement atomique)"""
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, path)
+
+
+class JsonlHistoryStore:
+    """
+    Journal d'historique au format JSONL
+    
+    Format du fichier:
+        {"__history__": "jsonl", "version": 1}      <- en-tête (snapshot)
+        {"timestamp": ..., "action": ..., ...}      <- une ligne par action
+    
+    Au démarrage, seule la fin du journal est lue (lecture à rebours par blocs)
+    et le résumé vient du sidecar <journal>.summary.json. Les actions plus
+    anciennes restent sur disque, accessibles via iter_records().
+    
+    L'ancien format (un document JSON complet écrit par save_to_file)
+    est toujours lu, puis converti en JSONL au premier chargement.
+    """
+    
+    HEADER_KEY = "__history__"
+    FORMAT_VERSION = 1
+    BLOCK_SIZE = 64 * 1024
+    
+    def __init__(
+        self,
+        filepath: str,
+        fsync_every: int = 20,
+        compact_every: int = 0,
+        max_records: int = 0
+    ):
+        """
+        Args:
+            filepath: Chemin du journal
+            fsync_every: Nombre d'ajouts entre deux fsync (1 = fsync à chaque action)
+            compact_every: Nombre d'ajouts avant compaction automatique (0 = jamais)
+            max_records: Nombre d'actions conservées par la compaction (0 = toutes);
+                au-delà, les actions les plus anciennes sont supprimées du disque
+        """
+        self.path = Path(filepath)
+        self.summary_path = self.path.with_name(self.path.name + ".summary.json")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.fsync_every = max(1, fsync_every)
+        self.compact_every = compact_every
+        self.max_records = max_records
+        self._handle: Optional[TextIO] = None
+        self._pending_fsync = 0
+        self._appended_since_compaction = 0
+        self._summary: Optional[StoreSummary] = None
+        self._lock_file: Optional[TextIO] = None
+    
+    def lock_for_writing(self) -> None:
+        """
+        Réserve le journal et son sidecar à ce store (verrou exclusif <journal>.lock)
+        
+        Deux écrivains (daemon et exécution locale) entrelaceraient leurs ajouts
+        et désynchroniseraient le sidecar. Le verrou est libéré par unlock().
+        
+        Raises:
+            RuntimeError: Si le journal est déjà verrouillé par un autre écrivain
+        """
+        if fcntl is None or self._lock_file is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, 'a', encoding='utf-8')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Historique déjà utilisé en écriture par un autre processus (daemon?): {self.path}"
+            )
+        self._lock_file = lock_file
+    
+    def unlock(self) -> None:
+        """Libère le verrou d'écriture (sans effet s'il n'est pas détenu)"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> str:
+        return json.dumps(entry, default=str, ensure_ascii=False, separators=(',', ':')) + "\n"
+    
+    def _decode(self, raw: bytes) -> Optional[Dict[str, Any]]:
+        """Décode une ligne; None pour l'en-tête, une ligne vide ou invalide"""
+        raw = raw.strip()
+        if not raw:
+            return None
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            logger.warning("Ligne d'historique invalide ignorée: %r", raw[:80])
+            return None
+        if not isinstance(entry, dict) or self.HEADER_KEY in entry:
+            return None
+        return entry
+    
+    def _header(self) -> Dict[str, Any]:
+        return {self.HEADER_KEY: "jsonl", "version": self.FORMAT_VERSION}
+    
+    def _is_legacy(self) -> bool:
+        """Détecte l'ancien format JSON (document indenté unique)"""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                # save_to_file écrivait "{" ou "[" seul sur la première ligne
+                return stripped in ('{', '[') or stripped.startswith('[')
+        return False
+    
+    def _load_legacy(self) -> List[Dict[str, Any]]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "actions" in data:
+            return data.get("actions", [])
+        return data if isinstance(data, list) else []
+    
+    def _repair_tail(self) -> None:
+        """
+        Retire une dernière ligne tronquée (crash pendant l'écriture)
+        
+        Seule la fin du fichier est inspectée, pour que les ajouts
+        suivants commencent sur une ligne valide.
+        """
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            
+            pos = end
+            while pos > 0:
+                step = min(self.BLOCK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    pos += newline + 1
+                    break
+            logger.warning("Dernière ligne tronquée ignorée: %s", self.path)
+            f.truncate(pos)
+    
+    def _iter_from(self, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """Parcourt le journal vers l'avant à partir d'un offset (lignes complètes)"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                entry = self._decode(raw)
+                if entry is not None:
+                    yield entry
+    
+    def _iter_reverse(self) -> Iterator[Dict[str, Any]]:
+        """Parcourt le journal à rebours, par blocs depuis la fin du fichier"""
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            remainder = b""
+            while pos > 0:
+                step = min(self.BLOCK_SIZE, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + remainder).split(b"\n")
+                # La première ligne du bloc peut être incomplète
+                remainder = lines[0]
+                for raw in reversed(lines[1:]):
+                    entry = self._decode(raw)
+                    if entry is not None:
+                        yield entry
+            entry = self._decode(remainder)
+            if entry is not None:
+                yield entry
+    
+    def iter_records(self, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Itère sur toutes les actions du journal sans les charger en mémoire
+        
+        Args:
+            reverse: Si True, de la plus récente à la plus ancienne
+        
+        Yields:
+            Actions au format dictionnaire
+        """
+        if not self.path.exists():
+            return iter(())
+        if self._is_legacy():
+            records = self._load_legacy()
+            return iter(records[::-1] if reverse else records)
+        return self._iter_reverse() if reverse else self._iter_from()
+    
+    def tail(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Lit les N dernières actions en lisant le fichier à rebours
+        
+        Args:
+            count: Nombre d'actions voulues
+        
+        Returns:
+            Liste des actions, de la plus ancienne à la plus récente
+        """
+        if count <= 0 or not self.path.exists():
+            return []
+        records = list(islice(self._iter_reverse(), count))
+        records.reverse()
+        return records
+    
+    def _convert_legacy(self) -> List[Dict[str, Any]]:
+        records = self._load_legacy()
+        logger.info("Conversion de l'historique JSON en JSONL: %s", self.path)
+        self.compact(records)
+        return records
+    
+    def load(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Charge les actions du journal (ancien format JSON accepté)
+        
+        Avec limit, seule la fin du fichier est lue.
+        
+        Args:
+            limit: Nombre maximum d'actions (les plus récentes) à retourner
+        
+        Returns:
+            Liste des actions, de la plus ancienne à la plus récente
+        """
+        if not self.path.exists():
+            return []
+        
+        if self._is_legacy():
+            records = self._convert_legacy()
+            return records[-limit:] if limit else records
+        
+        self._repair_tail()
+        if limit:
+            return self.tail(limit)
+        return list(deque(self._iter_from(), maxlen=self.max_records or None))
+    
+    def _ensure_summary(self) -> StoreSummary:
+        """
+        Charge le résumé depuis le sidecar, complété par les lignes écrites après
+        
+        Sans sidecar valide (première utilisation, fichier remplacé), le résumé
+        est reconstruit une fois par un parcours complet du journal.
+        """
+        if self._summary is not None:
+            return self._summary
+        
+        summary = StoreSummary()
+        if not self.path.exists():
+            self._summary = summary
+            return summary
+        
+        if self._is_legacy():
+            self._convert_legacy()
+        self._repair_tail()
+        
+        size = self.path.stat().st_size
+        offset = 0
+        if summary.load(self.summary_path) and summary.data["size"] <= size:
+            offset = summary.data["size"]
+        else:
+            summary.reset()
+        
+        for entry in self._iter_from(offset):
+            summary.add(entry)
+        summary.data["size"] = size
+        if offset != size:
+            summary.save(self.summary_path)
+        self._summary = summary
+        return summary
+    
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """
+        Agrégats de tout le journal (sidecar, sans relire l'historique)
+        
+        Returns:
+            Dict avec total, success_count, error_count, total_time,
+            first_timestamp, last_timestamp et histogram {bucket: count}
+        """
+        return dict(self._ensure_summary().data)
+    
+    def query(self, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        Requête en flux sur le journal (voir run_query pour les filtres)
+        
+        Returns:
+            Liste des actions correspondantes
+        """
+        return run_query(self.iter_records(), **filters)
+    
+    def _open(self) -> TextIO:
+        if self._handle is None:
+            self._ensure_summary()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            is_new = not self.path.exists() or self.path.stat().st_size == 0
+            self._handle = open(self.path, 'a', encoding='utf-8')
+            if is_new:
+                self._handle.write(self._encode(self._header()))
+        return self._handle
+    
+    def append(self, entry: Dict[str, Any]) -> None:
+        """
+        Ajoute une action en fin de journal
+        
+        Args:
+            entry: Action sérialisable en JSON
+        """
+        handle = self._open()
+        handle.write(self._encode(entry))
+        handle.flush()
+        self._summary.add(entry)
+        
+        self._pending_fsync += 1
+        if self._pending_fsync >= self.fsync_every:
+            self.sync()
+        
+        self._appended_since_compaction += 1
+        if self.compact_every and self._appended_since_compaction >= self.compact_every:
+            self.compact()
+    
+    def sync(self) -> None:
+        """Force l'écriture des ajouts en attente sur le disque (et du sidecar)"""
+        if self._handle is not None and self._pending_fsync:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+            self._summary.data["size"] = self._handle.tell()
+            self._summary.save(self.summary_path)
+        self._pending_fsync = 0
+    
+    def compact(self, records: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Réécrit le journal en snapshot (remplacement atomique)
+        
+        Sans max_records, aucune action n'est supprimée. Avec max_records (opt-in),
+        le résumé continue de couvrir toutes les actions enregistrées,
+        y compris celles qui ne sont plus dans le snapshot.
+        
+        Args:
+            records: Actions à écrire (le résumé est alors recalculé);
+                par défaut celles du journal (les max_records dernières si fixé)
+        """
+        if records is None:
+            self.sync()
+            if not self.path.exists():
+                records = []
+            elif self.max_records:
+                records = self.tail(self.max_records)
+            else:
+                records = list(self._iter_from())
+            summary = self._ensure_summary() if self.path.exists() else StoreSummary()
+        else:
+            summary = StoreSummary()
+            for entry in records:
+                summary.add(entry)
+            if self.max_records:
+                records = records[-self.max_records:]
+        
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self._encode(self._header()))
+            for entry in records:
+                f.write(self._encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+            summary.data["size"] = f.tell()
+        os.replace(tmp_path, self.path)
+        summary.save(self.summary_path)
+        self._summary = summary
+        
+        self._appended_since_compaction = 0
+        logger.debug("Historique compacté: %s (%s actions)", self.path, len(records))
+    
+    def truncate(self) -> None:
+        """Vide le journal (en-tête conservé)"""
+        self.compact([])
+    
+    def close(self) -> None:
+        """Synchronise et ferme le journal"""
+        if self._handle is not None:
+            self.sync()
+            self._handle.close()
+            self._handle = None
+
+
+class SQLiteHistoryStore:
+    """
+    Historique dans une base SQLite (mode WAL)
+    
+    Colonnes indexées (timestamp, action, status) pour les requêtes,
+    l'action complète est conservée en JSON dans la colonne data.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            action TEXT NOT NULL,
+            status TEXT NOT NULL,
+            execution_time REAL NOT NULL DEFAULT 0,
+            latency_bucket INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_actions_timestamp ON actions(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_actions_action ON actions(action);
+        CREATE INDEX IF NOT EXISTS idx_actions_status ON actions(status);
+        CREATE INDEX IF NOT EXISTS idx_actions_execution_time ON actions(execution_time);
+    """
+    
+    def __init__(self, filepath: str, commit_every: int = 1):
+        """
+        Args:
+            filepath: Chemin de la base SQLite
+            commit_every: Nombre d'ajouts entre deux commits
+        """
+        self.path = Path(filepath)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_every = max(1, commit_every)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+    
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Insère une action"""
+        execution_time = float(entry.get("execution_time", 0) or 0)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO actions (timestamp, action, status, execution_time, latency_bucket, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(entry.get("timestamp", "")),
+                    str(entry.get("action", "?")),
+                    str(entry.get("status", "success")),
+                    execution_time,
+                    latency_bucket(execution_time),
+                    json.dumps(entry, default=str, ensure_ascii=False)
+                )
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+    
+    def sync(self) -> None:
+        """Valide les insertions en attente"""
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+    
+    def iter_records(self, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Itère sur toutes les actions sans les charger en mémoire
+        
+        Args:
+            reverse: Si True, de la plus récente à la plus ancienne
+            
+        Yields:
+            Actions au format dictionnaire
+        """
+        order = "DESC" if reverse else "ASC"
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT data FROM actions ORDER BY id {order}")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(500)
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row[0])
+    
+    def load(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Charge les actions les plus récentes
+        
+        Args:
+            limit: Nombre maximum d'actions à retourner
+        
+        Returns:
+            Liste des actions, de la plus ancienne à la plus récente
+        """
+        sql = "SELECT data FROM actions ORDER BY id DESC"
+        params: List[Any] = []
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+    
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """
+        Agrégats calculés par SQLite (sans charger les actions)
+        
+        Returns:
+            Dict avec total, success_count, error_count, total_time,
+            first_timestamp, last_timestamp et histogram {bucket: count}
+        """
+        with self._lock:
+            total, success, errors, total_time, first, last = self._conn.execute(
+                "SELECT COUNT(*), "
+                "COALESCE(SUM(status = 'success'), 0), "
+                "COALESCE(SUM(status = 'error'), 0), "
+                "COALESCE(SUM(execution_time), 0), "
+                "MIN(timestamp), MAX(timestamp) FROM actions"
+            ).fetchone()
+            buckets = self._conn.execute(
+                "SELECT latency_bucket, COUNT(*) FROM actions GROUP BY latency_bucket"
+            ).fetchall()
+        return {
+            "total": total,
+            "success_count": success,
+            "error_count": errors,
+            "total_time": total_time,
+            "first_timestamp": first,
+            "last_timestamp": last,
+            "histogram": dict(buckets)
+        }
+    
+    def query(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        action: Optional[str] = None,
+        failures_only: bool = False,
+        status: Optional[str] = None,
+        slowest: bool = False,
+        limit: Optional[int] = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Requête indexée sur l'historique
+        
+        Returns:
+            Les actions les plus lentes (ordre décroissant) si slowest,
+            sinon les dernières actions correspondantes (ordre chronologique)
+        """
+        clauses = []
+        params: List[Any] = []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if failures_only:
+            clauses.append("status != 'success'")
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        
+        sql = "SELECT data FROM actions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY execution_time DESC" if slowest else " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        records = [json.loads(row[0]) for row in rows]
+        return records if slowest else records[::-1]
+    
+    def compact(self, records: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Remplace le contenu de la base (records) ou la réorganise (VACUUM)"""
+        with self._lock:
+            if records is not None:
+                self._conn.execute("DELETE FROM actions")
+            self._conn.commit()
+            self._pending = 0
+        if records is not None:
+            for entry in records:
+                self.append(entry)
+            self.sync()
+        else:
+            with self._lock:
+                self._conn.execute("VACUUM")
+    
+    def lock_for_writing(self) -> None:
+        """Sans effet: SQLite (WAL) gère lui-même les écrivains concurrents"""
+    
+    def unlock(self) -> None:
+        """Sans effet (voir lock_for_writing)"""
+    
+    def truncate(self) -> None:
+        """Vide la base"""
+        self.compact([])
+    
+    def close(self) -> None:
+        """Valide les insertions en attente et ferme la connexion"""
+        self.sync()
+        with self._lock:
+            self._conn.close()
+
+
+HistoryStore = Union[JsonlHistoryStore, SQLiteHistoryStore]
+
+
+def open_history_store(filepath: str, **options: Any) -> HistoryStore:
+    """
+    Ouvre le backend d'historique adapté à l'extension du fichier
+    
+    .db, .sqlite, .sqlite3 → SQLiteHistoryStore, sinon journal JSONL
+    
+    Args:
+        filepath: Chemin du fichier d'historique
+        **options: Options du backend
+    
+    Returns:
+        Store d'historique
+    """
+    if Path(filepath).suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteHistoryStore(filepath, **options)
+    return JsonlHistoryStore(filepath, **options)
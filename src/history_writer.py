@@ -0,0 +1,220 @@
+"""
+Écriture asynchrone de l'historique - Phase 5
+Thread d'écriture en arrière-plan: file bornée, flush groupés par nombre ou délai
+Aucune I/O d'historique sur le chemin de la requête
+"""
+
+import atexit
+import logging
+import queue
+import signal
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Writers actifs, vidés à la sortie du processus ou sur SIGINT/SIGTERM
+_active_writers: "weakref.WeakSet[HistoryWriter]" = weakref.WeakSet()
+_signal_handlers_installed = False
+
+# Action et blobs associés [(sha256, données)]
+QueueItem = Tuple[Dict[str, Any], List[Tuple[str, bytes]]]
+
+
+class HistoryWriter:
+    """Persiste les actions d'un store d'historique depuis un thread dédié"""
+    
+    def __init__(
+        self,
+        store: Any,
+        blob_store: Any = None,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 0.5
+    ):
+        """
+        Args:
+            store: Store d'historique (append, sync)
+            blob_store: BlobStore pour les charges utiles déportées (optionnel)
+            max_queue: Taille maximale de la file (au-delà, submit attend)
+            batch_size: Nombre d'actions déclenchant un flush
+            flush_interval: Délai maximum (secondes) avant le flush d'un lot partiel
+        """
+        self.store = store
+        self.blob_store = blob_store
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[QueueItem]]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        
+        self.flush_count = 0
+        self.written_count = 0
+        self.failed_count = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        _active_writers.add(self)
+    
+    def submit(
+        self,
+        entry: Dict[str, Any],
+        blobs: Optional[List[Tuple[str, bytes]]] = None
+    ) -> None:
+        """
+        Met une action en file d'écriture
+        
+        Après close(), l'écriture redevient synchrone.
+        
+        Args:
+            entry: Action au format dictionnaire
+            blobs: Charges utiles à déporter avant l'écriture de l'action
+        """
+        item = (entry, blobs or [])
+        if self._closed:
+            self._write_batch([item])
+            return
+        self._queue.put(item)
+    
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._queue.task_done()
+                return
+            
+            batch: List[QueueItem] = [entry]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            if stop:
+                return
+    
+    def _write_batch(self, batch: List[QueueItem]) -> None:
+        """
+        Écrit un lot action par action puis synchronise le store
+        
+        Une action en échec (blob ou ajout) est journalisée et comptée dans failed_count
+        sans empêcher l'écriture des suivantes; son blob manquant n'est jamais référencé.
+        """
+        start = time.perf_counter()
+        written = 0
+        with self.lock:
+            for entry, blobs in batch:
+                try:
+                    for sha256, data in blobs:
+                        self.blob_store.write(sha256, data)
+                    self.store.append(entry)
+                    written += 1
+                except Exception as e:
+                    self.failed_count += 1
+                    logger.error(
+                        "Erreur écriture journal historique (action %s ignorée): %s",
+                        entry.get("action", "?"), e
+                    )
+            try:
+                self.store.sync()
+            except Exception as e:
+                logger.error("Erreur synchronisation journal historique (%s actions ajoutées): %s", written, e)
+        latency = time.perf_counter() - start
+        
+        self.flush_count += 1
+        self.written_count += written
+        self.last_flush_latency = latency
+        self.total_flush_latency += latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        logger.debug("Historique: %s actions écrites en %.1fms", written, latency * 1000)
+    
+    def flush(self) -> None:
+        """Attend que toutes les actions en file soient écrites"""
+        if self._thread.is_alive():
+            self._queue.join()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du pipeline d'écriture
+        
+        Returns:
+            Dict avec queue_depth, flush_count, written_count, failed_count
+            (actions non écrites) et latences de flush (s)
+        """
+        return {
+            "queue_depth": self._queue.qsize(),
+            "flush_count": self.flush_count,
+            "written_count": self.written_count,
+            "failed_count": self.failed_count,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "average_flush_latency": (
+                self.total_flush_latency / self.flush_count if self.flush_count else 0.0
+            )
+        }
+    
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Vide la file, arrête le thread d'écriture
+        
+        Args:
+            timeout: Délai maximum d'attente du thread (secondes)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        _active_writers.discard(self)
+
+
+def flush_all_writers() -> None:
+    """Ferme (et vide) tous les writers actifs"""
+    for writer in list(_active_writers):
+        writer.close()
+
+
+def install_signal_handlers() -> None:
+    """
+    Vide les writers actifs sur SIGINT/SIGTERM avant le comportement précédent
+    
+    À appeler depuis le thread principal (contrainte du module signal).
+    """
+    global _signal_handlers_installed
+    if _signal_handlers_installed or threading.current_thread() is not threading.main_thread():
+        return
+    
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        
+        def handler(received, frame, previous=previous):
+            flush_all_writers()
+            if callable(previous):
+                previous(received, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(received, signal.SIG_DFL)
+                signal.raise_signal(received)
+        
+        signal.signal(signum, handler)
+    _signal_handlers_installed = True
+
+
+atexit.register(flush_all_writers)
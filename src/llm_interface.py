@@ -7,31 +7,95 @@ Support du contexte d'historique pour meilleure coordination des actions
 import json
 import os
 import logging
-from typing import Any, Dict, Optional, List
-from anthropic import Anthropic
+from typing import Any, Callable, Dict, Optional, List
+from src.digest import preview_text
+from src.rate_limit import PRIORITY_INTERACTIVE, RateScheduler, default_scheduler
+from src.timing import PhaseTimer, timed
+from src.tracing import span
+from src.usage import TokenBudget, TokenUsage, UsageTracker
 
 logger = logging.getLogger(__name__)
 
+# Longueur maximale d'une réponse (réservée auprès de l'ordonnanceur avant l'appel)
+MAX_TOKENS = 1024
+
+def create_client(base_url: Optional[str] = None) -> Any:
+    """
+    Crée un client Anthropic (le SDK n'est importé qu'ici)
+    
+    Args:
+        base_url: URL de l'API (défaut: $ANTHROPIC_BASE_URL, sinon l'API Anthropic),
+            par exemple un serveur factice local (benchmarks/mock_server.py)
+    
+    Raises:
+        ValueError: Si ANTHROPIC_API_KEY n'est pas configurée
+    """
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY non configurée dans les variables d'environnement")
+    options: Dict[str, Any] = {"api_key": api_key}
+    base_url = base_url or os.getenv("ANTHROPIC_BASE_URL")
+    if base_url:
+        options["base_url"] = base_url
+    max_retries = os.getenv("ANTHROPIC_MAX_RETRIES")
+    if max_retries:
+        options["max_retries"] = int(max_retries)
+    from anthropic import Anthropic
+    return Anthropic(**options)
+
 class LLMInterface:
     """Interface pour communiquer avec Claude via l'API Anthropic"""
     
-    def __init__(self, include_history: bool = False):
+    def __init__(
+        self,
+        include_history: bool = False,
+        rate_limiter: Optional[RateScheduler] = None,
+        client_factory: Optional[Callable[[], Any]] = None,
+        budget: Optional[TokenBudget] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        transport: Optional[Any] = None
+    ):
         """
-        Initialise le client Anthropic avec la clé API depuis l'environnement
+        Initialise l'interface; le SDK Anthropic n'est importé et le client
+        créé qu'au premier appel API (voir client)
         
         Args:
             include_history: Si True, les actions précédentes sont inclues dans le prompt
+            rate_limiter: Ordonnanceur de débit partagé, appliqué avant chaque appel API
+                (défaut: default_scheduler(), commun au processus)
+            client_factory: Fournit le client au premier appel API (client partagé
+                d'AgentRuntime); défaut: un client Anthropic propre à l'interface
+            budget: Limites de tokens de la session (refus des appels, réduction du contexte)
+            priority: Priorité auprès de l'ordonnanceur (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+            transport: Objet exposant messages.create, utilisé à la place du client
+                (CassetteRecorder, CassettePlayer, client factice)
         """
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY non configurée dans les variables d'environnement")
-        
-        self.client = Anthropic(api_key=api_key)
+        self._client = transport
+        self._client_factory = client_factory or create_client
         self.model = os.getenv("MODEL_NAME", "claude-3-5-haiku-20241022")
         self.conversation_history = []
         self.include_history = include_history
-        logger.info(f"LLMInterface initialisé | Model: {self.model} | History: {include_history}")
+        self.rate_limiter = rate_limiter if rate_limiter is not None else default_scheduler()
+        self.priority = priority
+        self.usage = UsageTracker(budget)
+        logger.info("LLMInterface initialisé | Model: %s | History: %s", self.model, include_history)
+    
+    
+    @property
+    def client(self) -> Any:
+        """
+        Client Anthropic, créé au premier usage (import du SDK différé)
         
+        Raises:
+            ValueError: Si ANTHROPIC_API_KEY n'est pas configurée
+        """
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+    
+    @client.setter
+    def client(self, value: Any) -> None:
+        self._client = value
     
     def set_history_context(self, recent_actions: List[Dict[str, Any]]) -> None:
         """
@@ -41,7 +105,7 @@ class LLMInterface:
             recent_actions: Liste des dernières actions exécutées
         """
         self.recent_actions = recent_actions
-        logger.debug(f"Contexte historique défini: {len(recent_actions)} actions")
+        logger.debug("Contexte historique défini: %s actions", len(recent_actions))
     
     def build_history_context(self, recent_actions: Optional[List[Dict[str, Any]]] = None) -> str:
         """
@@ -49,7 +113,7 @@ class LLMInterface:
         
         Args:
             recent_actions: Actions récentes à inclure
-            
+        
         Returns:
             String avec le contexte d'historique
         """
@@ -64,12 +128,13 @@ class LLMInterface:
             history_text += f"{i}. {status_symbol} {action.get('action', '?')} "
             history_text += f"({action.get('execution_time', 0):.2f}s)\n"
             
-            # Ajouter un résumé du résultat
+            # Ajouter un résumé du résultat (résultat brut ou empreinte)
             result = action.get("result", {})
             if isinstance(result, dict):
                 if result.get("success"):
-                    if "content" in result:
-                        history_text += f"   Résultat: {result['content'][:100]}...\n"
+                    preview = preview_text(result)
+                    if preview is not None:
+                        history_text += f"   Résultat: {preview[:100]}...\n"
                     elif "message" in result:
                         history_text += f"   Résultat: {result['message']}\n"
                 else:
@@ -155,7 +220,70 @@ Exemple de réponse REFUSÉE:
   "safety_check": "❌ Action REFUSÉE - accès système interdit"
 }"""
     
-    def call_llm(self, user_instruction: str, recent_actions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    def parse_response(self, assistant_message: str) -> Dict[str, Any]:
+        """
+        Extrait la décision JSON d'une réponse du modèle
+        
+        Args:
+            assistant_message: Texte brut de la réponse
+        
+        Returns:
+            Dict contenant: reasoning, action, parameters, safety_check
+        
+        Raises:
+            json.JSONDecodeError: Si aucune décision JSON valide n'est trouvée
+        """
+        # Nettoyer la réponse (supprimer espaces avant/après)
+        assistant_message = assistant_message.strip()
+        
+        # Extraire le premier objet JSON valide (gère les réponses multiples)
+        if '{' in assistant_message:
+            start_idx = assistant_message.find('{')
+            # Compter les accolades pour trouver la fin du premier objet JSON
+            bracket_count = 0
+            end_idx = start_idx
+            for i in range(start_idx, len(assistant_message)):
+                if assistant_message[i] == '{':
+                    bracket_count += 1
+                elif assistant_message[i] == '}':
+                    bracket_count -= 1
+                    if bracket_count == 0:
+                        end_idx = i + 1
+                        break
+            json_str = assistant_message[start_idx:end_idx]
+        else:
+            json_str = assistant_message
+        
+        # Essayer de parser le JSON - si ça échoue, essayer de le nettoyer
+        try:
+            result = json.loads(json_str)
+        except json.JSONDecodeError as e:
+            # Si le parsing échoue, essayer de nettoyer les caractères problématiques
+            logger.warning("Problème JSON détecté: %s", e)
+            # Normaliser les newlines et caractères de contrôle indésirables
+            # Mais préserver la structure JSON valide
+            # Remplacer les newlines à l'intérieur des strings avec des espaces
+            json_str_cleaned = json_str.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
+            # Supprimer les caractères de contrôle
+            json_str_cleaned = ''.join(char for char in json_str_cleaned if ord(char) >= 32 or char in '\t')
+            try:
+                result = json.loads(json_str_cleaned)
+            except json.JSONDecodeError:
+                # En dernier recours, utiliser la réponse brute
+                logger.error("Impossible de parser JSON: %s", json_str[:200])
+                raise
+        
+        logger.debug("Réponse LLM: %s", result.get('action', 'unknown'))
+        return result
+    
+    def call_llm(
+        self,
+        user_instruction: str,
+        recent_actions: Optional[List[Dict[str, Any]]] = None,
+        timer: Optional[PhaseTimer] = None,
+        history_context: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Appelle le modèle Claude avec une instruction utilisateur
         Optionnellement inclut un contexte d'historique
@@ -163,29 +291,88 @@ Exemple de réponse REFUSÉE:
         Args:
             user_instruction: L'instruction de l'utilisateur
             recent_actions: Actions récentes optionnelles pour le contexte
-            
+            timer: Chronomètre de la requête (phases llm.prompt, llm.wait, llm.api, llm.parse)
+            history_context: Contexte déjà construit (ContextBuilder), prioritaire sur recent_actions
+            model: Modèle de cet appel (ModelRouter), défaut: self.model
+        
         Returns:
-            Dict contenant: reasoning, action, parameters, safety_check
+            Dict contenant: reasoning, action, parameters, safety_check, model,
+            usage (tokens de l'appel) si l'API l'a renvoyé
+            et error_type (parse, api, budget) si aucune décision n'a été obtenue
         """
+        model = model or self.model
+        if self.usage.exhausted():
+            limit = self.usage.budget.max_session_tokens
+            logger.warning("Budget de tokens épuisé: %s/%s", self.usage.total.total_tokens, limit)
+            return {
+                "reasoning": "Budget de tokens de la session épuisé",
+                "action": "error",
+                "parameters": {},
+                "safety_check": f"❌ Budget de tokens dépassé ({self.usage.total.total_tokens}/{limit})",
+                "error_type": "budget"
+            }
+        
+        user_turn = {"role": "user", "content": user_instruction}
+        reserved = False
         try:
-            # Construire le prompt utilisateur avec contexte d'historique optionnel
-            user_prompt = user_instruction
-            if recent_actions and self.include_history:
-                user_prompt += self.build_history_context(recent_actions)
+            with timed(timer, "llm.prompt"), span("llm.prompt") as prompt_span:
+                # Contexte d'historique optionnel, envoyé avec l'instruction courante seulement
+                context = ""
+                if self.include_history:
+                    if history_context:
+                        context = history_context
+                    elif recent_actions:
+                        context = self.build_history_context(recent_actions)
+                
+                # La conversation ne garde que l'instruction: le contexte ne s'y accumule pas
+                self.conversation_history.append(user_turn)
+                system_prompt = self.build_system_prompt()
+                
+                # Respecter le budget de prompt: retirer le contexte, puis les échanges les plus anciens
+                context = self.usage.fit_prompt(self.conversation_history, system_prompt, context)
+                messages = self.conversation_history
+                if context:
+                    messages = messages[:-1] + [{"role": "user", "content": user_instruction + context}]
+                prompt_chars = len(system_prompt) + sum(len(str(message["content"])) for message in messages)
+                prompt_span.set_attribute("messages", len(self.conversation_history))
+                prompt_span.set_attribute("prompt_chars", prompt_chars)
+                prompt_span.set_attribute("context_chars", len(context))
             
-            # Ajouter le message utilisateur à l'historique
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_prompt
-            })
+            # Attendre un créneau si des limites de débit sont imposées (coût estimé avant envoi)
+            estimated_input = self.usage.estimate_tokens(prompt_chars)
+            if self.rate_limiter is not None:
+                with timed(timer, "llm.wait"), span("llm.wait", priority=self.priority):
+                    self.rate_limiter.acquire(estimated_input, MAX_TOKENS, self.priority)
+                reserved = True
             
             # Appel à l'API Claude
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                system=self.build_system_prompt(),
-                messages=self.conversation_history
-            )
+            with timed(timer, "llm.api"), span("llm.api", model=model) as api_span:
+                response = self.client.messages.create(
+                    model=model,
+                    max_tokens=MAX_TOKENS,
+                    system=system_prompt,
+                    messages=messages
+                )
+                usage = None
+                if getattr(response, "usage", None) is not None:
+                    usage = TokenUsage.from_response(response.usage)
+                    api_span.set_attribute("input_tokens", usage.input_tokens)
+                    api_span.set_attribute("output_tokens", usage.output_tokens)
+                    api_span.set_attribute("cache_read_input_tokens", usage.cache_read_input_tokens)
+                    api_span.set_attribute("cache_creation_input_tokens", usage.cache_creation_input_tokens)
+                    if reserved:
+                        # Les lectures de cache ne comptent pas dans la limite de tokens d'entrée
+                        reserved = False
+                        self.rate_limiter.settle(
+                            estimated_input,
+                            MAX_TOKENS,
+                            usage.input_tokens + usage.cache_creation_input_tokens,
+                            usage.output_tokens
+                        )
+                elif reserved:
+                    # Sans usage, rendre la réservation plutôt que de la perdre
+                    reserved = False
+                    self.rate_limiter.settle(estimated_input, MAX_TOKENS, 0, 0)
             
             # Extraire la réponse
             assistant_message = response.content[0].text
@@ -198,67 +385,48 @@ Exemple de réponse REFUSÉE:
             
             # Parser la réponse JSON
             try:
-                # Nettoyer la réponse (supprimer espaces avant/après)
-                assistant_message = assistant_message.strip()
-                
-                # Extraire le premier objet JSON valide (gère les réponses multiples)
-                if '{' in assistant_message:
-                    start_idx = assistant_message.find('{')
-                    # Compter les accolades pour trouver la fin du premier objet JSON
-                    bracket_count = 0
-                    end_idx = start_idx
-                    for i in range(start_idx, len(assistant_message)):
-                        if assistant_message[i] == '{':
-                            bracket_count += 1
-                        elif assistant_message[i] == '}':
-                            bracket_count -= 1
-                            if bracket_count == 0:
-                                end_idx = i + 1
-                                break
-                    json_str = assistant_message[start_idx:end_idx]
-                else:
-                    json_str = assistant_message
-                
-                # Essayer de parser le JSON - si ça échoue, essayer de le nettoyer
-                try:
-                    result = json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    # Si le parsing échoue, essayer de nettoyer les caractères problématiques
-                    logger.warning(f"Problème JSON détecté: {str(e)}")
-                    # Normaliser les newlines et caractères de contrôle indésirables
-                    # Mais préserver la structure JSON valide
-                    import re
-                    # Remplacer les newlines à l'intérieur des strings avec des espaces
-                    json_str_cleaned = json_str.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
-                    # Supprimer les caractères de contrôle
-                    json_str_cleaned = ''.join(char for char in json_str_cleaned if ord(char) >= 32 or char in '\t')
-                    try:
-                        result = json.loads(json_str_cleaned)
-                    except json.JSONDecodeError:
-                        # En dernier recours, utiliser la réponse brute
-                        logger.error(f"Impossible de parser JSON: {json_str[:200]}")
-                        raise
-                
-                logger.debug(f"Réponse LLM: {result.get('action', 'unknown')}")
-                return result
+                with timed(timer, "llm.parse"), span("llm.parse", response_chars=len(assistant_message)):
+                    result = self.parse_response(assistant_message)
             except json.JSONDecodeError:
                 # Si le modèle n'a pas répondu en JSON valide
-                logger.error(f"Réponse non-JSON: {assistant_message}")
-                return {
+                logger.error("Réponse non-JSON: %s", assistant_message)
+                result = {
                     "reasoning": "Réponse non structurée du modèle",
                     "action": "error",
                     "parameters": {},
-                    "safety_check": f"❌ Réponse invalide: {assistant_message[:100]}..."
+                    "safety_check": f"❌ Réponse invalide: {assistant_message[:100]}...",
+                    "error_type": "parse"
                 }
-                
+            
+            result["model"] = model
+            
+            # Comptabiliser les tokens par session et par type d'action
+            if usage is not None:
+                self.usage.record(str(result.get("action", "error")), usage, prompt_chars)
+                result["usage"] = usage.to_dict()
+            return result
+        
         except Exception as e:
+            # Rendre la réservation de débit et retirer l'instruction restée sans réponse
+            if reserved:
+                self.rate_limiter.settle(estimated_input, MAX_TOKENS, 0, 0)
+            if self.conversation_history and self.conversation_history[-1] is user_turn:
+                self.conversation_history.pop()
             return {
                 "reasoning": "Erreur lors de l'appel API",
                 "action": "error",
                 "parameters": {},
-                "safety_check": f"❌ Erreur API: {str(e)}"
+                "safety_check": f"❌ Erreur API: {str(e)}",
+                "error_type": "api"
             }
     
+    def discard_last_exchange(self) -> None:
+        """Retire le dernier échange (instruction et réponse) avant une nouvelle tentative"""
+        if self.conversation_history and self.conversation_history[-1]["role"] == "assistant":
+            self.conversation_history.pop()
+        if self.conversation_history and self.conversation_history[-1]["role"] == "user":
+            self.conversation_history.pop()
+    
     def reset_conversation(self):
         """Réinitialise l'historique de conversation"""
         self.conversation_history = []
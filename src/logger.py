@@ -1,35 +1,111 @@
 """
 Logger centralisé - Phase 4
 Configuration unifiée du logging pour tous les modules
+Écriture hors du chemin des requêtes (QueueHandler → QueueListener),
+fichier limité en taille avec rotation compressée (gzip)
+Fichier par défaut dans le répertoire d'état de l'utilisateur, hors du répertoire de travail
 """
 
+import atexit
+import gzip
 import logging
 import logging.handlers
+import os
+import queue
+import shutil
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+# Taille maximale du fichier de log avant rotation, et nombre d'archives .gz conservées
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# Messages en attente d'écriture; au-delà, les nouveaux messages sont abandonnés
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def default_state_dir() -> str:
+    """
+    Répertoire d'état propre à l'utilisateur
+    
+    %LOCALAPPDATA%\\agent-cli sous Windows,
+    $XDG_STATE_HOME/agent-cli sinon (défaut: ~/.local/state)
+    """
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "agent-cli")
+
+
+def default_log_file() -> str:
+    """Fichier de log par défaut: agent.log dans le répertoire d'état de l'utilisateur"""
+    return os.path.join(default_state_dir(), "agent.log")
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compresse le fichier plein en archive .gz (exécuté par le thread d'écriture)"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Dépose les enregistrements dans la file sans les formater
+    
+    Le message (msg % args) n'est construit que par le thread d'écriture;
+    si la file est pleine, l'enregistrement est abandonné plutôt que de bloquer la requête.
+    """
+    
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 class Logger:
     """Configuration centralisée du logging"""
     
-    _configured = False
+    _handler: Optional[DroppingQueueHandler] = None
+    _listener: Optional[logging.handlers.QueueListener] = None
+    _atexit_registered = False
     
     @staticmethod
     def configure(
         level: int = logging.INFO,
         log_file: Optional[str] = None,
-        format_string: Optional[str] = None
+        format_string: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+        queue_size: int = DEFAULT_QUEUE_SIZE
     ) -> None:
         """
         Configure le logging de l'application
         
+        Un nouvel appel remplace la configuration précédente (jamais de handlers en double).
+        
         Args:
             level: Niveau de log (DEBUG, INFO, WARNING, ERROR)
             log_file: Chemin optionnel pour le fichier de log
             format_string: Format personnalisé pour les logs
+            max_bytes: Taille du fichier de log déclenchant une rotation
+            backup_count: Nombre d'archives compressées conservées (<log_file>.1.gz, ...)
+            queue_size: Messages en attente d'écriture avant abandon
         """
-        if Logger._configured:
-            return
+        Logger.shutdown()
         
         if format_string is None:
             format_string = (
@@ -37,30 +113,66 @@ class Logger:
             )
         
         formatter = logging.Formatter(format_string)
-        
-        # Configuration du logger root
-        root_logger = logging.getLogger()
-        root_logger.setLevel(level)
+        handlers: List[logging.Handler] = []
         
         # Handler console
         console_handler = logging.StreamHandler()
         console_handler.setLevel(level)
         console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
         
-        # Handler fichier optionnel
+        # Handler fichier optionnel, limité en taille
         if log_file:
             log_path = Path(log_file)
             log_path.parent.mkdir(parents=True, exist_ok=True)
             
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                encoding='utf-8',
+                delay=True
+            )
+            file_handler.namer = _gzip_namer
+            file_handler.rotator = _gzip_rotator
             file_handler.setLevel(level)
             file_handler.setFormatter(formatter)
-            root_logger.addHandler(file_handler)
-            
-            root_logger.info(f"Log fichier activé: {log_file}")
+            handlers.append(file_handler)
+        
+        # Le thread appelant ne fait que déposer l'enregistrement dans la file
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+        queue_handler = DroppingQueueHandler(log_queue)
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
         
-        Logger._configured = True
+        # Configuration du logger root (niveau vérifié avant toute création d'enregistrement)
+        root_logger = logging.getLogger()
+        root_logger.setLevel(level)
+        root_logger.addHandler(queue_handler)
+        Logger._handler = queue_handler
+        Logger._listener = listener
+        if not Logger._atexit_registered:
+            atexit.register(Logger.shutdown)
+            Logger._atexit_registered = True
+        
+        if log_file:
+            root_logger.info("Log fichier activé: %s", log_file)
+    
+    @staticmethod
+    def shutdown() -> None:
+        """Écrit les messages en attente et retire les handlers installés par configure()"""
+        handler, Logger._handler = Logger._handler, None
+        listener, Logger._listener = Logger._listener, None
+        if handler is not None:
+            logging.getLogger().removeHandler(handler)
+            if handler.dropped:
+                logging.getLogger(__name__).warning(
+                    "%s messages de log abandonnés (file pleine)", handler.dropped
+                )
+        if listener is not None:
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
     
     @staticmethod
     def get_logger(name: str) -> logging.Logger:
@@ -69,7 +181,7 @@ class Logger:
         
         Args:
             name: Nom du module (__name__)
-            
+        
         Returns:
             Logger instance
         """
@@ -0,0 +1,203 @@
+"""
+Préchargement spéculatif - Phase 5
+Pendant l'appel au LLM, réchauffe le cache (contenu, listings) avec les chemins
+cités par l'instruction et touchés par les actions récentes
+Lecture seule: aucune action modifiante n'est jamais exécutée
+Exécuté sur un pool de threads borné, distinct de celui des requêtes
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import PurePosixPath
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from src.context import extract_paths
+from src.tools import Tools
+
+logger = logging.getLogger(__name__)
+
+# Actions en lecture seule dont la cible peut avoir été préchargée
+READ_ACTIONS = {"read_file": "path", "list_files": "path", "get_file_info": "path"}
+
+# Paramètres de chemin des actions récentes
+HISTORY_PATH_PARAMETERS = ("path", "source", "destination")
+
+# Threads du pool de préchargement des agents sans runtime
+DEFAULT_PREFETCH_WORKERS = 2
+
+_default_pool: Optional[ThreadPoolExecutor] = None
+_default_pool_lock = threading.Lock()
+
+
+def _default_submit(fn: Callable[..., Any], *args: Any) -> Future:
+    """Soumet au pool de préchargement commun (créé au premier usage)"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ThreadPoolExecutor(
+                max_workers=DEFAULT_PREFETCH_WORKERS, thread_name_prefix="prefetch"
+            )
+        return _default_pool.submit(fn, *args)
+
+
+def _normalize(path: str) -> str:
+    path = path.strip().replace("\\", "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return str(PurePosixPath(path or "."))
+
+
+class PrefetchTask:
+    """Préchargement d'une requête (exécuté sur le pool de préchargement)"""
+    
+    def __init__(self, paths: List[str]):
+        self.paths = paths
+        self.warmed: Dict[str, str] = {}
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+    
+    def cancel(self) -> None:
+        """Arrête le préchargement des chemins restants (la décision est arrivée)"""
+        self.cancelled.set()
+
+
+class Prefetcher:
+    """
+    Prédit les chemins utiles à la prochaine action et les précharge
+    
+    Candidats, par ordre de priorité:
+    1. chemins et noms de fichiers cités par l'instruction
+    2. répertoire de travail (list_files est l'action la plus fréquente)
+    3. chemins touchés par les dernières actions et leurs répertoires parents
+    Le taux de succès compte les actions en lecture seule dont la cible avait été préchargée.
+    """
+    
+    def __init__(
+        self,
+        tools: Tools,
+        validator: Optional[Callable[[str], Tuple[bool, str]]] = None,
+        max_paths: int = 8,
+        submit: Optional[Callable[..., Future]] = None
+    ):
+        """
+        Args:
+            tools: Outils (avec cache) de l'agent
+            validator: Validation de sécurité des chemins (SafetyValidator.validate_file_path)
+            max_paths: Nombre maximum de chemins préchargés par requête
+            submit: Soumission au pool de préchargement (AgentRuntime.submit_prefetch),
+                défaut: pool de préchargement commun aux agents
+        """
+        self.tools = tools
+        self.validator = validator
+        self.max_paths = max_paths
+        self.submit = submit or _default_submit
+        self.requests = 0
+        self.warmed = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """True si les outils disposent d'un cache à réchauffer"""
+        return self.tools.cache is not None and self.max_paths > 0
+    
+    def candidates(self, instruction: str, records: Sequence[Any] = ()) -> List[str]:
+        """
+        Chemins à précharger pour une instruction
+        
+        Args:
+            instruction: Nouvelle instruction
+            records: ActionRecord récents, du plus ancien au plus récent
+        """
+        paths = [_normalize(path) for path in extract_paths(instruction)]
+        paths.append(".")
+        for record in reversed(records):
+            for name in HISTORY_PATH_PARAMETERS:
+                value = record.parameters.get(name)
+                if isinstance(value, str) and value:
+                    path = _normalize(value)
+                    paths.append(path)
+                    paths.append(str(PurePosixPath(path).parent))
+        
+        selected = []
+        for path in dict.fromkeys(paths):
+            if len(selected) >= self.max_paths:
+                break
+            if self.validator is not None and not self.validator(path)[0]:
+                continue
+            selected.append(path)
+        return selected
+    
+    def _run(self, task: PrefetchTask) -> None:
+        try:
+            for path in task.paths:
+                if task.cancelled.is_set():
+                    break
+                kind = self.tools.prefetch(path)
+                if kind is not None:
+                    task.warmed[path] = kind
+        except Exception as e:
+            logger.debug("[Prefetch] Erreur: %s", e)
+        finally:
+            with self._lock:
+                self.warmed += len(task.warmed)
+            task.done.set()
+    
+    def start(self, instruction: str, records: Sequence[Any] = ()) -> Optional[PrefetchTask]:
+        """
+        Lance le préchargement en arrière-plan (tâche soumise au pool)
+        
+        Returns:
+            Tâche en cours, ou None si rien à précharger
+        """
+        if not self.enabled:
+            return None
+        paths = self.candidates(instruction, records)
+        if not paths:
+            return None
+        task = PrefetchTask(paths)
+        try:
+            self.submit(self._run, task)
+        except RuntimeError as e:
+            # Pool arrêté (fermeture du runtime): la requête continue sans préchargement
+            logger.debug("[Prefetch] Non lancé: %s", e)
+            return None
+        with self._lock:
+            self.requests += 1
+        return task
+    
+    def record(self, task: Optional[PrefetchTask], action: str, parameters: Dict[str, Any]) -> Optional[bool]:
+        """
+        Compare l'action décidée au préchargement
+        
+        Returns:
+            True (cible préchargée), False (manquée), None (action non concernée)
+        """
+        parameter = READ_ACTIONS.get(action)
+        if parameter is None:
+            return None
+        target = _normalize(str(parameters.get(parameter) or "."))
+        hit = task is not None and target in task.warmed
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        logger.debug("[Prefetch] %s %s: %s", action, target, 'préchargé' if hit else 'manqué')
+        return hit
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec requests, warmed (chemins préchargés), hits, misses et hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "requests": self.requests,
+                "warmed": self.warmed,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
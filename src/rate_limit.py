@@ -0,0 +1,243 @@
+"""
+Limitation de débit - Phase 5
+Ordonnanceur partagé entre threads pour respecter les limites de l'API:
+seaux à jetons requêtes/minute, tokens d'entrée/minute et tokens de sortie/minute,
+file de priorité (interactif avant batch)
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Priorités (plus petit = servi en premier)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class TokenBucket:
+    """Seau à jetons (non thread-safe, protégé par l'ordonnanceur)"""
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute: Débit soutenu (jetons par minute)
+            capacity: Réserve maximale (défaut: une minute de débit)
+        """
+        if per_minute <= 0:
+            raise ValueError(f"Débit invalide: {per_minute} par minute")
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def clamp(self, amount: float) -> float:
+        """Coût ramené à la capacité (une requête plus grosse que le seau passe quand il est plein)"""
+        return min(float(amount), self.capacity)
+    
+    def delay(self, amount: float) -> float:
+        """Temps avant que amount jetons soient disponibles (0 si déjà disponibles)"""
+        missing = self.clamp(amount) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+    
+    def consume(self, amount: float) -> None:
+        self.tokens -= self.clamp(amount)
+    
+    def adjust(self, delta: float) -> None:
+        """Corrige une estimation: delta > 0 rend des jetons, delta < 0 crée une dette"""
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class RateScheduler:
+    """
+    Ordonnanceur thread-safe des appels à l'API
+    
+    Un appel part quand il est en tête de la file de priorité et que chaque seau
+    (requêtes, tokens d'entrée, tokens de sortie) peut couvrir son coût estimé.
+    Les appels attendent le temps exact nécessaire au remplissage, sans rafale
+    synchronisée; à priorité égale, l'ordre d'arrivée est respecté.
+    Une fois la réponse reçue, settle() remplace l'estimation par les tokens réels.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        input_tokens_per_minute: Optional[float] = None,
+        output_tokens_per_minute: Optional[float] = None,
+        request_burst: Optional[int] = None
+    ):
+        """
+        Args:
+            requests_per_minute: Limite de requêtes par minute (RPM)
+            input_tokens_per_minute: Limite de tokens d'entrée par minute (ITPM)
+            output_tokens_per_minute: Limite de tokens de sortie par minute (OTPM)
+            request_burst: Requêtes pouvant partir d'un coup (défaut: 1, débit lissé)
+        """
+        self.requests = (
+            TokenBucket(requests_per_minute, max(1, request_burst or 1))
+            if requests_per_minute else None
+        )
+        self.input_tokens = TokenBucket(input_tokens_per_minute) if input_tokens_per_minute else None
+        self.output_tokens = TokenBucket(output_tokens_per_minute) if output_tokens_per_minute else None
+        self.total_wait = 0.0
+        self.granted = 0
+        self.wait_by_priority: Dict[int, float] = {}
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+    
+    def _costs(self, input_tokens: int, output_tokens: int) -> List[Tuple[TokenBucket, float]]:
+        costs = []
+        if self.requests is not None:
+            costs.append((self.requests, 1.0))
+        if self.input_tokens is not None:
+            costs.append((self.input_tokens, float(input_tokens)))
+        if self.output_tokens is not None:
+            costs.append((self.output_tokens, float(output_tokens)))
+        return costs
+    
+    def acquire(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> float:
+        """
+        Attend que l'appel puisse partir et réserve son coût estimé
+        
+        Args:
+            input_tokens: Tokens d'entrée estimés (prompt)
+            output_tokens: Tokens de sortie estimés (max_tokens)
+            priority: PRIORITY_INTERACTIVE, PRIORITY_BATCH ou autre entier
+        
+        Returns:
+            Temps d'attente (secondes)
+        """
+        costs = self._costs(input_tokens, output_tokens)
+        if not costs:
+            return 0.0
+        start = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] == ticket:
+                        for bucket, _ in costs:
+                            bucket.refill(now)
+                        delay = max(bucket.delay(amount) for bucket, amount in costs)
+                        if delay <= 0:
+                            for bucket, amount in costs:
+                                bucket.consume(amount)
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        # Pas en tête: réveil quand la tête part (ou qu'une priorité plus haute arrive)
+                        self._condition.wait()
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+            
+            waited = time.monotonic() - start
+            self.total_wait += waited
+            self.granted += 1
+            self.wait_by_priority[priority] = self.wait_by_priority.get(priority, 0.0) + waited
+        if waited > 0.1:
+            logger.debug("[RateScheduler] Attente %.2fs (priorité %s)", waited, priority)
+        return waited
+    
+    def settle(
+        self,
+        estimated_input: int,
+        estimated_output: int,
+        actual_input: int,
+        actual_output: int
+    ) -> None:
+        """
+        Remplace l'estimation réservée par acquire() par les tokens réels
+        
+        Args:
+            estimated_input, estimated_output: Coûts passés à acquire()
+            actual_input, actual_output: Tokens relevés dans response.usage
+        """
+        with self._condition:
+            now = time.monotonic()
+            if self.input_tokens is not None:
+                self.input_tokens.refill(now)
+                self.input_tokens.adjust(
+                    self.input_tokens.clamp(estimated_input) - self.input_tokens.clamp(actual_input)
+                )
+            if self.output_tokens is not None:
+                self.output_tokens.refill(now)
+                self.output_tokens.adjust(
+                    self.output_tokens.clamp(estimated_output) - self.output_tokens.clamp(actual_output)
+                )
+            self._condition.notify_all()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec granted, queued, total_wait et wait_by_priority
+        """
+        with self._condition:
+            return {
+                "granted": self.granted,
+                "queued": len(self._queue),
+                "total_wait": self.total_wait,
+                "wait_by_priority": dict(self.wait_by_priority)
+            }
+
+
+_default_scheduler: Optional[RateScheduler] = None
+_default_lock = threading.Lock()
+_default_loaded = False
+
+
+def _env_rate(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        rate = float(value)
+    except ValueError:
+        logger.warning("%s ignoré (nombre attendu): %s", name, value)
+        return None
+    return rate if rate > 0 else None
+
+
+def configure_scheduler(scheduler: Optional[RateScheduler]) -> None:
+    """Définit l'ordonnanceur commun à toutes les LLMInterface du processus (None = aucun)"""
+    global _default_scheduler, _default_loaded
+    with _default_lock:
+        _default_scheduler = scheduler
+        _default_loaded = True
+
+
+def default_scheduler() -> Optional[RateScheduler]:
+    """
+    Ordonnanceur commun du processus
+    
+    Configuré par configure_scheduler(), sinon à partir de AGENT_RPM,
+    AGENT_INPUT_TPM et AGENT_OUTPUT_TPM; None si aucune limite n'est définie.
+    """
+    global _default_scheduler, _default_loaded
+    with _default_lock:
+        if not _default_loaded:
+            rpm = _env_rate("AGENT_RPM")
+            itpm = _env_rate("AGENT_INPUT_TPM")
+            otpm = _env_rate("AGENT_OUTPUT_TPM")
+            if rpm or itpm or otpm:
+                _default_scheduler = RateScheduler(rpm, itpm, otpm)
+            _default_loaded = True
+        return _default_scheduler
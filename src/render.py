@@ -0,0 +1,152 @@
+"""
+Rendu des résultats - Phase 5
+Écrit les résultats par morceaux, sans reconstruire de grande chaîne:
+troncature début/fin des gros contenus (marqueur "N lignes de plus"),
+pager optionnel et sortie JSON diffusée au fil de l'encodage
+"""
+
+import json
+import os
+import shlex
+import subprocess
+import sys
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO
+
+OUTPUT_FORMATS = ("text", "json")
+
+# Lignes affichées par défaut dans un terminal (début + fin)
+DEFAULT_MAX_LINES = 200
+
+# Caractères par ligne affichée au-delà desquels le contenu est aussi tronqué (lignes très longues)
+MAX_CHARS_PER_LINE = 400
+
+
+def count_lines(text: str) -> int:
+    """Nombre de lignes d'un texte (une dernière ligne sans saut de ligne compte)"""
+    if not text:
+        return 0
+    return text.count("\n") + (0 if text.endswith("\n") else 1)
+
+
+def _head_end(text: str, lines: int) -> int:
+    """Position juste après les `lines` premières lignes"""
+    position = 0
+    for _ in range(lines):
+        position = text.find("\n", position) + 1
+        if position == 0:
+            return len(text)
+    return position
+
+
+def _tail_start(text: str, lines: int) -> int:
+    """Position du début des `lines` dernières lignes"""
+    position = len(text) - 1 if text.endswith("\n") else len(text)
+    for _ in range(lines):
+        position = text.rfind("\n", 0, position)
+        if position < 0:
+            return 0
+    return position + 1
+
+
+def iter_text(text: str, max_lines: Optional[int] = None) -> Iterator[str]:
+    """
+    Découpe un contenu pour affichage, tronqué au milieu s'il est trop grand
+    
+    Seuls le début et la fin sont copiés (slices du texte d'origine); les lignes
+    sont comptées sans découper le texte.
+    
+    Args:
+        text: Contenu à afficher (fichier lu, sortie de commande)
+        max_lines: Lignes affichées au plus, 3/4 au début et 1/4 à la fin (None ou 0 = tout)
+    
+    Yields:
+        Morceaux de texte, dans l'ordre d'affichage
+    """
+    if not max_lines or max_lines <= 0:
+        yield text
+        return
+    
+    max_chars = max_lines * MAX_CHARS_PER_LINE
+    total = count_lines(text)
+    tail = max_lines // 4 if max_lines >= 4 else min(1, max_lines - 1)
+    head = max_lines - tail
+    if total > max_lines:
+        head_end = _head_end(text, head)
+        tail_start = _tail_start(text, tail) if tail else len(text)
+        head_text = _clip(text, 0, head_end, max_chars - max_chars // 4)
+        yield head_text
+        if not head_text.endswith("\n"):
+            yield "\n"
+        yield f"… {total - head - tail} lignes de plus …\n"
+        if tail_start < len(text):
+            yield _clip(text, tail_start, len(text), max_chars // 4, keep_end=True)
+    elif len(text) > max_chars:
+        # Peu de lignes mais très longues (fichier minifié, JSON sur une ligne)
+        head_chars = max_chars - max_chars // 4
+        tail_chars = max_chars // 4
+        yield text[:head_chars]
+        yield f"\n… {len(text) - head_chars - tail_chars} caractères de plus …\n"
+        yield text[len(text) - tail_chars:]
+    else:
+        yield text
+
+
+def _clip(text: str, start: int, end: int, limit: int, keep_end: bool = False) -> str:
+    """Slice [start:end] limitée à `limit` caractères (la fin si keep_end)"""
+    if end - start <= limit:
+        return text[start:end]
+    if keep_end:
+        return "…" + text[end - limit:end]
+    return text[start:start + limit] + "…"
+
+
+def iter_json(result: Dict[str, Any]) -> Iterator[str]:
+    """
+    Encode un résultat en JSON (une ligne) morceau par morceau
+    
+    Les contenus sont encodés directement dans le flux, sans texte formaté intermédiaire.
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+    yield from encoder.iterencode(result)
+    yield "\n"
+
+
+def write_chunks(chunks: Iterable[str], stream: TextIO) -> None:
+    """Écrit les morceaux au fil de l'eau puis vide le flux"""
+    for chunk in chunks:
+        stream.write(chunk)
+    stream.flush()
+
+
+def default_max_lines(stream: TextIO) -> Optional[int]:
+    """Troncature par défaut: DEFAULT_MAX_LINES dans un terminal, rien sinon (redirection, pipe)"""
+    isatty = getattr(stream, "isatty", None)
+    return DEFAULT_MAX_LINES if callable(isatty) and isatty() else None
+
+
+def page_chunks(chunks: Iterable[str], stream: TextIO = sys.stdout) -> None:
+    """
+    Affiche les morceaux dans le pager ($PAGER, défaut: less -R, more sous Windows)
+    
+    Les morceaux sont transmis au pager au fil de l'eau; quitter le pager interrompt
+    l'écriture. Sans pager disponible, les morceaux sont écrits sur stream.
+    """
+    command = os.environ.get("PAGER") or ("more" if os.name == "nt" else "less -R")
+    try:
+        process = subprocess.Popen(
+            shlex.split(command, posix=os.name != "nt"),
+            stdin=subprocess.PIPE,
+            encoding=getattr(stream, "encoding", None) or "utf-8",
+            errors="replace"
+        )
+    except (OSError, ValueError):
+        write_chunks(chunks, stream)
+        return
+    try:
+        for chunk in chunks:
+            process.stdin.write(chunk)
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        # Pager quitté avant la fin de l'affichage
+        pass
+    process.wait()
@@ -0,0 +1,277 @@
+"""
+Routage de modèles - Phase 5
+Choisit un niveau de modèle (rapide → puissant) selon l'instruction et les taux
+de succès récents, escalade vers le niveau supérieur uniquement en cas d'échec
+avant toute exécution (réponse non parsable, refus de sécurité)
+Chaque décision et son issue sont journalisées pour l'ajustement des seuils
+(écriture par un thread dédié, hors du verrou du routeur)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from src.context import mentioned_paths
+from src.logger import DEFAULT_QUEUE_SIZE, DroppingQueueHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAST_MODEL = "claude-3-5-haiku-20241022"
+DEFAULT_STRONG_MODEL = "claude-3-5-sonnet-20241022"
+
+# Mots signalant une tâche complexe (édition, plusieurs fichiers, analyse)
+COMPLEX_KEYWORDS = (
+    "modifi", "édit", "edit", "refactor", "réécri", "corrig", "remplac", "plusieurs",
+    "tous les", "toutes les", "chaque", "script", "analys", "résum", "compar", "puis", "ensuite"
+)
+
+# Issues d'une tentative
+OUTCOME_SUCCESS = "success"
+OUTCOME_PARSE_ERROR = "parse_error"
+OUTCOME_SAFETY = "safety"
+OUTCOME_EXECUTION_ERROR = "execution_error"
+OUTCOME_REFUSED = "refused"
+OUTCOME_DECLINED = "declined"
+OUTCOME_API_ERROR = "api_error"
+
+# Issues qui justifient un modèle plus puissant: rien n'a encore été exécuté
+# (une action modifiante n'est jamais rejouée après une erreur d'exécution)
+ESCALATE_ON = (OUTCOME_PARSE_ERROR, OUTCOME_SAFETY)
+
+# Issues qui ne disent rien de la qualité du niveau (hors taux de succès)
+UNRATED_OUTCOMES = (OUTCOME_REFUSED, OUTCOME_DECLINED, OUTCOME_API_ERROR)
+
+
+def default_tiers() -> List[str]:
+    """Niveaux de modèles: $MODEL_TIERS (séparés par des virgules), sinon MODEL_NAME puis MODEL_STRONG"""
+    tiers = [model.strip() for model in os.getenv("MODEL_TIERS", "").split(",") if model.strip()]
+    if tiers:
+        return tiers
+    fast = os.getenv("MODEL_NAME", DEFAULT_FAST_MODEL)
+    strong = os.getenv("MODEL_STRONG", DEFAULT_STRONG_MODEL)
+    return [fast] if strong == fast else [fast, strong]
+
+
+def instruction_features(instruction: str) -> Dict[str, Any]:
+    """
+    Caractéristiques d'une instruction utilisées pour le routage
+    
+    Returns:
+        Dict avec words, paths, complex_keywords et complexity (score entier)
+    """
+    text = instruction.lower()
+    words = len(text.split())
+    paths = len(mentioned_paths(instruction))
+    keywords = [keyword for keyword in COMPLEX_KEYWORDS if keyword in text]
+    complexity = (words > 40) + (paths >= 2) + min(2, len(keywords))
+    return {
+        "words": words,
+        "paths": paths,
+        "complex_keywords": keywords,
+        "complexity": complexity
+    }
+
+
+def classify_outcome(llm_response: Dict[str, Any], execution_result: Dict[str, Any]) -> str:
+    """
+    Issue d'une tentative (voir ESCALATE_ON)
+    
+    Args:
+        llm_response: Décision renvoyée par LLMInterface.call_llm
+        execution_result: Résultat de Executor.execute_action
+    """
+    error_type = llm_response.get("error_type")
+    if error_type == "parse":
+        return OUTCOME_PARSE_ERROR
+    if error_type is not None:
+        return OUTCOME_API_ERROR
+    if llm_response.get("action") == "error":
+        # Refus délibéré du modèle: un modèle plus puissant refuserait aussi
+        return OUTCOME_REFUSED
+    if execution_result.get("approval_declined"):
+        # Refus de la politique ou de l'utilisateur: ne pas redemander avec un autre modèle
+        return OUTCOME_DECLINED
+    if execution_result.get("safety_rejected"):
+        return OUTCOME_SAFETY
+    if not execution_result.get("success", True):
+        return OUTCOME_EXECUTION_ERROR
+    return OUTCOME_SUCCESS
+
+
+class RouteDecision:
+    """Niveau choisi pour une tentative"""
+    
+    __slots__ = ("tier", "model", "reason", "features", "escalated_from", "started")
+    
+    def __init__(
+        self,
+        tier: int,
+        model: str,
+        reason: str,
+        features: Dict[str, Any],
+        escalated_from: Optional[str] = None
+    ):
+        self.tier = tier
+        self.model = model
+        self.reason = reason
+        self.features = features
+        self.escalated_from = escalated_from
+        self.started = time.perf_counter()
+
+
+class ModelRouter:
+    """
+    Routeur de modèles partagé (thread-safe)
+    
+    - complexité de l'instruction ≥ complex_threshold: niveau puissant d'emblée
+    - taux de succès récent du niveau rapide < min_success_rate: niveau puissant,
+      sauf une requête sur probe_every qui reste sur le niveau rapide pour le réévaluer
+    - échec (ESCALATE_ON): une nouvelle tentative au niveau supérieur
+    """
+    
+    def __init__(
+        self,
+        tiers: Optional[List[str]] = None,
+        complex_threshold: int = 2,
+        min_success_rate: float = 0.6,
+        window: int = 50,
+        min_samples: int = 10,
+        probe_every: int = 10,
+        log_file: Optional[str] = None
+    ):
+        """
+        Args:
+            tiers: Modèles du plus rapide au plus puissant (défaut: default_tiers())
+            complex_threshold: Score de complexité qui envoie au niveau puissant
+            min_success_rate: Taux de succès minimal du niveau rapide
+            window: Nombre de tentatives récentes suivies par niveau
+            min_samples: Tentatives nécessaires avant de juger un taux de succès
+            probe_every: Fréquence des requêtes de réévaluation du niveau rapide
+            log_file: Journal JSONL des décisions (défaut: $AGENT_ROUTING_LOG)
+        """
+        self.tiers = tiers or default_tiers()
+        self.complex_threshold = complex_threshold
+        self.min_success_rate = min_success_rate
+        self.min_samples = min_samples
+        self.probe_every = max(1, probe_every)
+        self.log_file = log_file or os.getenv("AGENT_ROUTING_LOG")
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=200)
+        self._outcomes: List[Deque[bool]] = [deque(maxlen=window) for _ in self.tiers]
+        self._routed = 0
+        self._lock = threading.Lock()
+        self._decision_log: Optional[logging.Logger] = None
+        self._log_listener: Optional[logging.handlers.QueueListener] = None
+        if self.log_file:
+            self._open_decision_log(self.log_file)
+    
+    def _open_decision_log(self, log_file: str) -> None:
+        """Journal des décisions: les requêtes déposent la ligne, un thread l'écrit"""
+        file_handler = logging.FileHandler(log_file, encoding='utf-8', delay=True)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=DEFAULT_QUEUE_SIZE)
+        # Logger hors de la hiérarchie: les lignes JSONL ne remontent pas au logger root
+        decision_log = logging.Logger(f"{__name__}.decisions", logging.INFO)
+        decision_log.addHandler(DroppingQueueHandler(log_queue))
+        self._log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        self._log_listener.start()
+        self._decision_log = decision_log
+        atexit.register(self.close)
+    
+    def success_rate(self, tier: int) -> Optional[float]:
+        """Taux de succès récent d'un niveau (None si trop peu de tentatives)"""
+        with self._lock:
+            outcomes = self._outcomes[tier]
+            if len(outcomes) < self.min_samples:
+                return None
+            return sum(outcomes) / len(outcomes)
+    
+    def route(self, instruction: str) -> RouteDecision:
+        """Niveau de la première tentative"""
+        features = instruction_features(instruction)
+        top = len(self.tiers) - 1
+        if top == 0:
+            return RouteDecision(0, self.tiers[0], "single_tier", features)
+        if features["complexity"] >= self.complex_threshold:
+            return RouteDecision(top, self.tiers[top], "complex", features)
+        
+        with self._lock:
+            self._routed += 1
+            probe = self._routed % self.probe_every == 0
+        rate = self.success_rate(0)
+        if rate is not None and rate < self.min_success_rate and not probe:
+            return RouteDecision(1, self.tiers[1], f"fast_tier_success_{rate:.2f}", features)
+        return RouteDecision(0, self.tiers[0], "probe" if probe and rate is not None else "simple", features)
+    
+    def escalate(self, decision: RouteDecision, outcome: str) -> Optional[RouteDecision]:
+        """
+        Niveau de la tentative suivante
+        
+        Returns:
+            Nouvelle décision, ou None si l'issue ne justifie pas d'escalade
+            ou si le niveau le plus puissant a déjà été utilisé
+        """
+        if outcome not in ESCALATE_ON or decision.tier >= len(self.tiers) - 1:
+            return None
+        tier = decision.tier + 1
+        logger.info("[Router] Escalade %s → %s (%s)", decision.model, self.tiers[tier], outcome)
+        return RouteDecision(
+            tier, self.tiers[tier], f"escalation_{outcome}", decision.features,
+            escalated_from=decision.model
+        )
+    
+    def record(self, decision: RouteDecision, outcome: str, action: Optional[str] = None) -> None:
+        """
+        Enregistre l'issue d'une tentative (taux de succès et journal)
+        
+        Args:
+            decision: Décision de la tentative
+            outcome: Issue (classify_outcome)
+            action: Action décidée par le modèle
+        """
+        entry = {
+            "timestamp": time.time(),
+            "model": decision.model,
+            "tier": decision.tier,
+            "reason": decision.reason,
+            "escalated_from": decision.escalated_from,
+            "features": decision.features,
+            "action": action,
+            "outcome": outcome,
+            "latency": time.perf_counter() - decision.started
+        }
+        with self._lock:
+            if outcome not in UNRATED_OUTCOMES:
+                self._outcomes[decision.tier].append(outcome == OUTCOME_SUCCESS)
+            self.decisions.append(entry)
+        decision_log = self._decision_log
+        if decision_log is not None:
+            decision_log.info("%s", json.dumps(entry, ensure_ascii=False))
+    
+    def close(self) -> None:
+        """Écrit les décisions en attente et ferme le journal de routage"""
+        listener, self._log_listener = self._log_listener, None
+        self._decision_log = None
+        if listener is not None:
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict {modèle: {attempts, success_rate}} sur la fenêtre récente
+        """
+        with self._lock:
+            return {
+                model: {
+                    "attempts": len(outcomes),
+                    "success_rate": sum(outcomes) / len(outcomes) if outcomes else None
+                }
+                for model, outcomes in zip(self.tiers, self._outcomes)
+            }
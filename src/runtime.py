@@ -0,0 +1,253 @@
+"""
+Runtime multi-sessions - Phase 5
+Possède les ressources partagées (client API et son pool de connexions, cache de contenu,
+espaces de travail par répertoire, pool de threads) et distribue des Agents légers
+Chaque session garde sa propre conversation et son propre historique
+"""
+
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from src.agent import Agent
+from src.approval import ApprovalPolicy, Approver, StaticApprover
+from src.cache import ContentCache
+from src.llm_interface import LLMInterface, create_client
+from src.rate_limit import PRIORITY_INTERACTIVE, RateScheduler
+from src.router import ModelRouter
+from src.tools import Tools
+from src.usage import TokenBudget, TokenUsage
+
+logger = logging.getLogger(__name__)
+
+
+class Workspace:
+    """Ressources partagées par les sessions d'un même répertoire"""
+    
+    def __init__(self, root: str, cache: ContentCache):
+        """
+        Args:
+            root: Répertoire de travail (chemin absolu)
+            cache: Cache de contenu du runtime
+        """
+        self.root = root
+        self.tools = Tools(working_dir=root, cache=cache)
+        self.lock = threading.Lock()
+
+
+class AgentRuntime:
+    """
+    Fabrique de sessions partageant un client, des caches et un pool de threads
+    
+    Exemple:
+        runtime = AgentRuntime(max_workers=8)
+        agent = runtime.session("alice", working_dir="./data")
+        result = runtime.submit(agent.process_request, "Lister les fichiers").result()
+        runtime.close()
+    """
+    
+    def __init__(
+        self,
+        max_workers: int = 4,
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        rate_limiter: Optional[RateScheduler] = None,
+        cache: Optional[ContentCache] = None,
+        token_budget: Optional[TokenBudget] = None,
+        router: Optional[ModelRouter] = None,
+        transport: Optional[Any] = None
+    ):
+        """
+        Args:
+            max_workers: Taille du pool de threads partagé
+            approval_policy: Politique d'approbation par défaut des sessions
+            approver: Approbateur par défaut (défaut: refus, jamais d'interaction)
+            rate_limiter: Limite de débit API commune à toutes les sessions
+            cache: Cache de contenu partagé (créé sinon)
+            token_budget: Limites de tokens appliquées à chaque session
+            router: Routeur de modèles commun (taux de succès de toutes les sessions)
+            transport: Transport des appels API commun aux sessions, à la place du client
+                Anthropic (CassetteRecorder, CassettePlayer)
+        """
+        self.max_workers = max(1, max_workers)
+        self.approval_policy = approval_policy
+        self.approver = approver or StaticApprover(answer=False)
+        self.rate_limiter = rate_limiter
+        self.cache = cache or ContentCache()
+        self.token_budget = token_budget
+        self.router = router or ModelRouter()
+        self.sessions: Dict[str, Agent] = {}
+        self._workspaces: Dict[str, Workspace] = {}
+        self._client: Any = transport
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._prefetch_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._session_ids = itertools.count(1)
+    
+    @property
+    def client(self) -> Any:
+        """
+        Client Anthropic unique du runtime (un seul pool de connexions HTTP)
+        
+        Raises:
+            ValueError: Si ANTHROPIC_API_KEY n'est pas configurée
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = create_client()
+            return self._client
+    
+    @client.setter
+    def client(self, value: Any) -> None:
+        with self._lock:
+            self._client = value
+    
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Pool de threads partagé (créé au premier usage)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="runtime")
+            return self._pool
+    
+    def workspace(self, working_dir: str) -> Workspace:
+        """Espace de travail partagé d'un répertoire (créé au premier usage)"""
+        root = str(Path(working_dir).resolve())
+        with self._lock:
+            workspace = self._workspaces.get(root)
+            if workspace is None:
+                workspace = Workspace(root, self.cache)
+                self._workspaces[root] = workspace
+            return workspace
+    
+    def session(
+        self,
+        session_id: Optional[str] = None,
+        working_dir: str = ".",
+        history_file: Optional[str] = None,
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None,
+        spill_blobs: bool = False,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Agent:
+        """
+        Agent d'une session (créé au premier appel, réutilisé ensuite)
+        
+        Args:
+            session_id: Identifiant de session (généré si absent)
+            working_dir: Répertoire de travail de la session
+            history_file: Journal d'historique propre à la session
+            approval_policy: Politique de la session (défaut: celle du runtime)
+            approver: Approbateur de la session (défaut: celui du runtime)
+            spill_blobs: Conserver les résultats complets dans <history_file>.blobs/
+            priority: Priorité des appels API auprès de l'ordonnanceur de débit
+        
+        Returns:
+            Agent de la session
+        """
+        if session_id is None:
+            session_id = f"session-{next(self._session_ids)}"
+        with self._lock:
+            agent = self.sessions.get(session_id)
+        if agent is not None:
+            return agent
+        
+        workspace = self.workspace(working_dir)
+        # Le client partagé n'est créé qu'au premier appel API d'une session
+        llm = LLMInterface(
+            include_history=True,
+            rate_limiter=self.rate_limiter,
+            client_factory=lambda: self.client,
+            budget=self.token_budget,
+            priority=priority
+        )
+        agent = Agent(
+            working_dir=workspace.root,
+            history_file=history_file,
+            approval_policy=approval_policy or self.approval_policy,
+            approver=approver or self.approver,
+            spill_blobs=spill_blobs,
+            workspace_lock=workspace.lock,
+            llm=llm,
+            tools=workspace.tools,
+            router=self.router,
+            prefetch_submit=self.submit_prefetch
+        )
+        with self._lock:
+            existing = self.sessions.get(session_id)
+            if existing is None:
+                self.sessions[session_id] = agent
+        if existing is not None:
+            agent.close()
+            return existing
+        logger.info("[Runtime] Session ouverte: %s (%s)", session_id, workspace.root)
+        return agent
+    
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Exécute une fonction sur le pool partagé"""
+        return self.pool.submit(fn, *args, **kwargs)
+    
+    def submit_prefetch(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Exécute un préchargement sur son propre pool (créé au premier usage)
+        
+        Séparé du pool des requêtes: un lot en attente n'y retarde pas le préchargement.
+        """
+        with self._lock:
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="prefetch"
+                )
+            return self._prefetch_pool.submit(fn, *args)
+    
+    def close_session(self, session_id: str) -> None:
+        """Ferme une session (vide son journal d'historique)"""
+        with self._lock:
+            agent = self.sessions.pop(session_id, None)
+        if agent is not None:
+            agent.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec sessions, workspaces, statistiques du cache de contenu,
+            tokens consommés par les sessions ouvertes, taux de succès par modèle
+            et taux de succès du préchargement
+        """
+        with self._lock:
+            tokens = TokenUsage()
+            prefetch_hits = prefetch_misses = 0
+            for agent in self.sessions.values():
+                tokens.add(agent.llm.usage.total)
+                prefetch = agent.prefetcher.stats()
+                prefetch_hits += prefetch["hits"]
+                prefetch_misses += prefetch["misses"]
+            return {
+                "sessions": len(self.sessions),
+                "workspaces": len(self._workspaces),
+                "cache": self.cache.stats(),
+                "tokens": tokens.to_dict(),
+                "models": self.router.stats(),
+                "prefetch_hit_rate": (
+                    prefetch_hits / (prefetch_hits + prefetch_misses)
+                    if prefetch_hits + prefetch_misses else 0.0
+                )
+            }
+    
+    def close(self) -> None:
+        """Ferme toutes les sessions, les pools de threads et le client"""
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        with self._lock:
+            pool, self._pool = self._pool, None
+            prefetch_pool, self._prefetch_pool = self._prefetch_pool, None
+            client, self._client = self._client, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        if prefetch_pool is not None:
+            prefetch_pool.shutdown(wait=True)
+        self.router.close()
+        if client is not None and hasattr(client, "close"):
+            client.close()
@@ -6,7 +6,10 @@ Valide les actions pour prévenir les comportements dangereux
 import logging
 import re
 from pathlib import Path
-from typing import Tuple, List
+from typing import Tuple, List, Optional
+from src.approval import ApprovalPolicy, Approver, InteractiveApprover
+from src.timing import PhaseTimer, timed
+from src.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -38,15 +41,24 @@ class SafetyValidator:
         '..', '../'
     }
     
-    def __init__(self, working_dir: str = "."):
+    def __init__(
+        self,
+        working_dir: str = ".",
+        approval_policy: Optional[ApprovalPolicy] = None,
+        approver: Optional[Approver] = None
+    ):
         """
         Initialise le validateur de sécurité
         
         Args:
             working_dir: Répertoire de travail autorisé
+            approval_policy: Politique d'approbation des suppressions (défaut: aucune règle)
+            approver: Approbateur pour les actions non couvertes (défaut: confirmation terminal)
         """
         self.working_dir = Path(working_dir).resolve()
-        logger.info(f"SafetyValidator initialisé avec working_dir: {self.working_dir}")
+        self.approval_policy = approval_policy or ApprovalPolicy()
+        self.approver = approver or InteractiveApprover()
+        logger.info("SafetyValidator initialisé avec working_dir: %s", self.working_dir)
     
     def validate_file_path(self, path: str) -> Tuple[bool, str]:
         """
@@ -148,42 +160,53 @@ class SafetyValidator:
         Returns:
             True si confirmation, False sinon
         """
-        logger.warning(f"Action dangereuse détectée: {action_type}")
-        logger.warning(f"Description: {description}")
+        logger.warning("Action dangereuse détectée: %s", action_type)
+        logger.warning("Description: %s", description)
         
-        try:
-            response = input(
-                f"\n⚠️  ACTION DANGEREUSE DÉTECTÉE: {action_type}\n"
-                f"Description: {description}\n"
-                f"Êtes-vous CERTAIN? (oui/non): "
-            )
-            
-            return response.lower() in ['oui', 'yes', 'o', 'y']
-        except EOFError:
-            # En cas d'entrée non disponible (scripts), refuser
-            logger.error("Impossible de confirmer action dangereuse: pas d'entrée disponible")
-            return False
+        return self.approver.approve(action_type, description)
     
-    def validate_delete_action(self, path: str) -> Tuple[bool, str]:
+    @property
+    def dry_run(self) -> bool:
+        """True si les actions dangereuses approuvées ne doivent pas être exécutées"""
+        return self.approval_policy.dry_run
+    
+    def validate_delete_action(self, path: str, timer: Optional[PhaseTimer] = None) -> Tuple[bool, str]:
         """
         Valide une action de suppression.
         
         Args:
             path: Fichier à supprimer
+            timer: Chronomètre de la requête (phases safety et approval)
             
         Returns:
             Tuple (is_valid, error_message)
         """
         # Vérifier d'abord le chemin
-        is_valid, error_msg = self.validate_file_path(path)
+        with timed(timer, "safety"), span("safety.path", action="delete_file") as path_span:
+            is_valid, error_msg = self.validate_file_path(path)
+            path_span.set_attribute("allowed", is_valid)
         if not is_valid:
             return False, error_msg
+        return self.approve_delete(path, timer)
+    
+    def approve_delete(self, path: str, timer: Optional[PhaseTimer] = None) -> Tuple[bool, str]:
+        """
+        Applique la politique d'approbation puis l'approbateur à une suppression
+        (chemin déjà validé)
         
-        # Suppression est dangereuse, demander confirmation
-        if not self.confirm_dangerous_action(
-            "delete_file",
-            f"Supprimer le fichier: {path}"
-        ):
-            return False, "❌ Suppression annulée par l'utilisateur"
+        Args:
+            path: Fichier à supprimer
+            timer: Chronomètre de la requête (phase approval)
         
-        return True, ""
+        Returns:
+            Tuple (is_approved, error_message)
+        """
+        # Suppression est dangereuse: appliquer la politique, puis l'approbateur
+        # (chronométré à part: une confirmation interactive attend l'utilisateur)
+        logger.warning("Action dangereuse détectée: delete_file (%s)", path)
+        with timed(timer, "approval"), span("safety.approval", action="delete_file") as approval_span:
+            is_approved, error_msg = self.approval_policy.evaluate_delete(
+                path, self.approver, self.working_dir
+            )
+            approval_span.set_attribute("allowed", is_approved)
+        return is_approved, error_msg
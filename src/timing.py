@@ -0,0 +1,84 @@
+"""
+Chronométrage par phase - Phase 5
+Découpe le temps d'une requête (LLM, parsing, sécurité, outil, historique)
+avec une horloge monotone (time.perf_counter)
+"""
+
+import math
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Optional
+
+
+class PhaseTimer:
+    """Accumule la durée de chaque phase d'une requête"""
+    
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Chronomètre un bloc; les durées d'une même phase s'additionnent
+        
+        Args:
+            name: Nom de la phase (llm.api, tool, ...)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+    
+    def elapsed(self) -> float:
+        """Temps écoulé depuis la création du chronomètre (secondes)"""
+        return time.perf_counter() - self._start
+    
+    def as_dict(self) -> Dict[str, float]:
+        """Copie des durées par phase (secondes)"""
+        return dict(self.phases)
+
+
+def timed(timer: Optional[PhaseTimer], name: str) -> ContextManager[None]:
+    """
+    Chronomètre un bloc si un PhaseTimer est fourni (sans coût sinon)
+    
+    Args:
+        timer: Chronomètre de la requête, ou None
+        name: Nom de la phase
+    """
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Percentile (méthode du rang le plus proche: rang ceil(q * n)) d'une liste triée non vide
+    
+    Args:
+        sorted_values: Durées triées par ordre croissant
+        q: Quantile entre 0 et 1 (0.95 pour p95)
+    """
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def format_timings(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """
+    Formate les durées par phase pour affichage
+    
+    Args:
+        timings: Durées par phase (secondes)
+        total: Temps total de la requête, pour le pourcentage et le reste non attribué
+    
+    Returns:
+        Lignes formatées
+    """
+    lines = []
+    for name, duration in timings.items():
+        share = f" ({duration / total * 100:5.1f}%)" if total else ""
+        lines.append(f"  {name:<14} {duration * 1000:9.1f}ms{share}")
+    if total:
+        other = max(0.0, total - sum(timings.values()))
+        lines.append(f"  {'autre':<14} {other * 1000:9.1f}ms ({other / total * 100:5.1f}%)")
+    return "\n".join(lines)
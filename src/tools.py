@@ -7,16 +7,26 @@ import os
 import subprocess
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from stat import S_ISDIR, S_ISREG
+from typing import List, Dict, Any, Optional
+from src.cache import ContentCache
+from src.tracing import current_span, span, spans_enabled
 
 logger = logging.getLogger(__name__)
 
 class Tools:
     """Ensemble des outils disponibles pour l'Agent"""
     
-    def __init__(self, working_dir: str = "."):
-        """Initialise les outils avec un répertoire de travail"""
+    def __init__(self, working_dir: str = ".", cache: Optional[ContentCache] = None):
+        """
+        Initialise les outils avec un répertoire de travail
+        
+        Args:
+            working_dir: Répertoire de travail
+            cache: Cache de contenu partagé pour read_file (optionnel)
+        """
         self.working_dir = Path(working_dir).resolve()
+        self.cache = cache
         
     def _validate_path(self, path: str) -> Path:
         """
@@ -65,8 +75,13 @@ class Tools:
                     "error": f"N'est pas un fichier: {path}"
                 }
             
-            with open(validated_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if self.cache is not None:
+                content = self.cache.read_text(validated_path)
+            else:
+                with open(validated_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            if spans_enabled():
+                current_span().set_attribute("bytes_read", len(content.encode('utf-8')))
             
             return {
                 "success": True,
@@ -105,6 +120,10 @@ class Tools:
             # Créer le fichier
             with open(validated_path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            if self.cache is not None:
+                self.cache.invalidate(validated_path)
+            if spans_enabled():
+                current_span().set_attribute("bytes_written", len(content.encode('utf-8')))
             
             return {
                 "success": True,
@@ -160,10 +179,10 @@ class Tools:
             return {
                 "success": True,
                 "path": str(validated_path),
-                "is_file": validated_path.is_file(),
-                "is_dir": validated_path.is_dir(),
+                "is_file": S_ISREG(stat.st_mode),
+                "is_dir": S_ISDIR(stat.st_mode),
                 "size": stat.st_size,
-                "modified": str(validated_path.stat().st_mtime)
+                "modified": str(stat.st_mtime)
             }
             
         except ValueError as e:
@@ -202,13 +221,16 @@ class Tools:
                     "error": f"N'est pas un répertoire: {path}"
                 }
             
-            items = []
-            for item in validated_path.iterdir():
-                items.append({
-                    "name": item.name,
-                    "is_file": item.is_file(),
-                    "size": item.stat().st_size if item.is_file() else 0
-                })
+            if self.cache is not None:
+                items = list(self.cache.list_dir(validated_path))
+            else:
+                items = []
+                for item in validated_path.iterdir():
+                    items.append({
+                        "name": item.name,
+                        "is_file": item.is_file(),
+                        "size": item.stat().st_size if item.is_file() else 0
+                    })
             
             return {
                 "success": True,
@@ -228,6 +250,32 @@ class Tools:
                 "error": f"Erreur listing: {str(e)}"
             }
     
+    def prefetch(self, path: str) -> Optional[str]:
+        """
+        Précharge un chemin dans le cache sans rien modifier
+        (contenu d'un fichier texte ou listing d'un répertoire)
+        
+        Args:
+            path: Chemin relatif au répertoire de travail
+        
+        Returns:
+            "file", "dir", ou None (absent, hors zone, illisible, pas de cache)
+        """
+        if self.cache is None:
+            return None
+        try:
+            validated_path = self._validate_path(path)
+            stat = validated_path.stat()
+            if S_ISDIR(stat.st_mode):
+                self.cache.list_dir(validated_path)
+                return "dir"
+            if S_ISREG(stat.st_mode) and stat.st_size <= self.cache.max_file_bytes:
+                self.cache.read_text(validated_path)
+                return "file"
+        except (ValueError, OSError, UnicodeDecodeError):
+            pass
+        return None
+    
     def edit_file(self, path: str, content: str) -> Dict[str, Any]:
         """
         Modifie le contenu d'un fichier existant.
@@ -261,8 +309,14 @@ class Tools:
             # Écrire le nouveau contenu
             with open(validated_path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            if self.cache is not None:
+                self.cache.invalidate(validated_path)
+            if spans_enabled():
+                tool_span = current_span()
+                tool_span.set_attribute("bytes_read", len(original_content.encode('utf-8')))
+                tool_span.set_attribute("bytes_written", len(content.encode('utf-8')))
             
-            logger.info(f"Fichier modifié: {path} ({len(content)} caractères)")
+            logger.info("Fichier modifié: %s (%s caractères)", path, len(content))
             
             return {
                 "success": True,
@@ -308,7 +362,9 @@ class Tools:
                 }
             
             validated_path.unlink()
-            logger.info(f"Fichier supprimé: {path}")
+            if self.cache is not None:
+                self.cache.invalidate(validated_path)
+            logger.info("Fichier supprimé: %s", path)
             
             return {
                 "success": True,
@@ -366,24 +422,32 @@ class Tools:
                 }
             
             # Exécuter avec timeout de 10 secondes
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10,
-                cwd=str(self.working_dir)
-            )
+            with span("subprocess", command=base_cmd) as process_span:
+                result = subprocess.run(
+                    command,
+                    shell=True,
+                    capture_output=True,
+                    text=True,
+                    timeout=10,
+                    cwd=str(self.working_dir)
+                )
+                process_span.set_attribute("exit_code", result.returncode)
+                process_span.set_attribute("stdout_bytes", len(result.stdout))
+                process_span.set_attribute("stderr_bytes", len(result.stderr))
+                process_span.set_attribute("success", result.returncode == 0)
+            # mkdir, touch, cp, mv: les métadonnées en cache ne sont plus fiables
+            if self.cache is not None:
+                self.cache.invalidate_metadata()
             
             if result.returncode == 0:
-                logger.info(f"Commande exécutée: {command}")
+                logger.info("Commande exécutée: %s", command)
                 return {
                     "success": True,
                     "output": result.stdout,
                     "command": command
                 }
             else:
-                logger.warning(f"Commande avec erreur: {command}")
+                logger.warning("Commande avec erreur: %s", command)
                 return {
                     "success": False,
                     "error": result.stderr if result.stderr else f"Code retour: {result.returncode}",
@@ -396,7 +460,7 @@ class Tools:
                 "error": f"Commande a dépassé le timeout (10s): {command}"
             }
         except Exception as e:
-            logger.error(f"Erreur exécution: {str(e)}")
+            logger.error("Erreur exécution: %s", e)
             return {
                 "success": False,
                 "error": f"Erreur exécution: {str(e)}"
@@ -0,0 +1,320 @@
+"""
+Traçage local - Phase 5
+Spans imbriqués (requête → prompt, API, parsing, sécurité, outil, sous-processus)
+exportés en JSONL ou au format Chrome trace-event (chrome://tracing, Perfetto)
+Les spans terminés sont aussi transmis à un écouteur optionnel (journal d'événements)
+Aucun coût mesurable quand le traçage et l'écouteur sont désactivés
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from src.timing import percentile
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMATS = ("jsonl", "chrome")
+
+# Span courant du contexte d'exécution (propre à chaque thread)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+# Tracer global (None = traçage désactivé)
+_tracer: Optional["Tracer"] = None
+
+# Écouteur des spans terminés (None = aucun), indépendant du traçage
+_span_listener: Optional[Callable[["Span"], None]] = None
+
+
+class _NoopSpan:
+    """Span vide renvoyé quand le traçage et l'écouteur sont désactivés"""
+    
+    __slots__ = ()
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+    
+    def __enter__(self) -> "_NoopSpan":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Intervalle chronométré avec attributs, rattaché à son span parent"""
+    
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_id", "start",
+        "duration", "attributes", "thread_id", "_perf_start", "_token"
+    )
+    
+    def __init__(self, tracer: Optional["Tracer"], name: str, attributes: Dict[str, Any]):
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(8)
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.start = 0.0
+        self.duration = 0.0
+        self._perf_start = 0.0
+        self._token = None
+    
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Ajoute un attribut (tokens, octets, code retour, ...)"""
+        self.attributes[key] = value
+    
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start = time.time()
+        self._perf_start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self._perf_start
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        if self.tracer is not None:
+            self.tracer.export(self)
+        listener = _span_listener
+        if listener is not None:
+            listener(self)
+        return False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation JSONL d'un span terminé"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "attributes": self.attributes
+        }
+
+
+class JsonlSpanExporter:
+    """Un span terminé par ligne JSON (fichier ouvert en ajout)"""
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, 'a', encoding='utf-8')
+    
+    def write(self, span: Span) -> None:
+        self._file.write(json.dumps(span.to_dict(), default=str, ensure_ascii=False) + "\n")
+    
+    def flush(self) -> None:
+        self._file.flush()
+    
+    def close(self) -> None:
+        self._file.close()
+
+
+class ChromeTraceExporter:
+    """
+    Format Chrome trace-event (tableau JSON d'événements complets "ph": "X")
+    
+    Le crochet final est écrit à la fermeture; les visualiseurs acceptent
+    aussi un fichier tronqué après un arrêt brutal.
+    """
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._file = open(filepath, 'w', encoding='utf-8')
+        self._file.write("[\n")
+        self._first = True
+    
+    def write(self, span: Span) -> None:
+        args = dict(span.attributes)
+        args["trace_id"] = span.trace_id
+        args["span_id"] = span.span_id
+        if span.parent_id is not None:
+            args["parent_id"] = span.parent_id
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": span.start * 1_000_000,
+            "dur": span.duration * 1_000_000,
+            "pid": os.getpid(),
+            "tid": span.thread_id,
+            "args": args
+        }
+        prefix = "" if self._first else ",\n"
+        self._first = False
+        self._file.write(prefix + json.dumps(event, default=str, ensure_ascii=False))
+    
+    def flush(self) -> None:
+        self._file.flush()
+    
+    def close(self) -> None:
+        self._file.write("\n]\n")
+        self._file.close()
+
+
+class Tracer:
+    """Crée les spans et les transmet à l'exporteur (thread-safe)"""
+    
+    def __init__(self, exporter: Any):
+        """
+        Args:
+            exporter: JsonlSpanExporter ou ChromeTraceExporter
+        """
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def span(self, name: str, **attributes: Any) -> Span:
+        """Nouveau span, enfant du span courant s'il existe"""
+        return Span(self, name, attributes)
+    
+    def export(self, span: Span) -> None:
+        """Écrit un span terminé; le fichier est vidé à la fin de chaque requête"""
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                self.exporter.write(span)
+                if span.parent_id is None:
+                    self.exporter.flush()
+            except (OSError, TypeError, ValueError) as e:
+                logger.error("Erreur export trace: %s", e)
+    
+    def close(self) -> None:
+        """Vide et ferme l'exporteur"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.exporter.close()
+
+
+def configure_tracing(filepath: str, trace_format: Optional[str] = None) -> Tracer:
+    """
+    Active le traçage global vers un fichier
+    
+    Args:
+        filepath: Fichier de trace
+        trace_format: "jsonl" ou "chrome" (défaut: chrome pour .json, jsonl sinon)
+    
+    Returns:
+        Tracer actif
+    
+    Raises:
+        ValueError: Si le format est inconnu
+    """
+    global _tracer
+    if trace_format is None:
+        trace_format = "chrome" if Path(filepath).suffix == ".json" else "jsonl"
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError(f"Format de trace inconnu: {trace_format} (attendu: {', '.join(TRACE_FORMATS)})")
+    
+    shutdown_tracing()
+    exporter = ChromeTraceExporter(filepath) if trace_format == "chrome" else JsonlSpanExporter(filepath)
+    _tracer = Tracer(exporter)
+    logger.info("Traçage activé: %s (%s)", filepath, trace_format)
+    return _tracer
+
+
+def shutdown_tracing() -> None:
+    """Désactive le traçage et ferme le fichier de trace"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+def set_span_listener(listener: Optional[Callable[[Span], None]]) -> None:
+    """
+    Installe la fonction appelée à la fin de chaque span (None pour la retirer)
+    
+    Les spans sont créés dès qu'un écouteur est installé, même sans traçage.
+    """
+    global _span_listener
+    _span_listener = listener
+
+
+def spans_enabled() -> bool:
+    """True si les spans sont créés (traçage actif ou écouteur installé)"""
+    return _tracer is not None or _span_listener is not None
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """
+    Ouvre un span (à utiliser avec with); span vide sans traçage ni écouteur
+    
+    Args:
+        name: Nom du span (agent.request, llm.api, tool.read_file, ...)
+        **attributes: Attributs initiaux
+    """
+    tracer = _tracer
+    if tracer is None:
+        if _span_listener is None:
+            return NOOP_SPAN
+        return Span(None, name, attributes)
+    return tracer.span(name, **attributes)
+
+
+def current_span() -> Any:
+    """Span courant (span vide si aucun ou si les spans sont désactivés)"""
+    if _tracer is None and _span_listener is None:
+        return NOOP_SPAN
+    return _current_span.get() or NOOP_SPAN
+
+
+def summarize_trace(filepath: str, slowest: int = 5) -> Dict[str, Any]:
+    """
+    Agrège un fichier de trace JSONL: percentiles par nom de span et requêtes les plus lentes
+    
+    Args:
+        filepath: Fichier JSONL produit par JsonlSpanExporter
+        slowest: Nombre de requêtes (spans racine) les plus lentes à retourner
+    
+    Returns:
+        Dict avec "spans" {nom: count, p50, p95, p99, max} et "slowest" [span racine]
+    """
+    durations: Dict[str, List[float]] = {}
+    roots: List[Dict[str, Any]] = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            durations.setdefault(record["name"], []).append(record["duration"])
+            if record.get("parent_id") is None:
+                roots.append(record)
+    
+    spans = {}
+    for name, values in durations.items():
+        values.sort()
+        spans[name] = {
+            "count": len(values),
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "max": values[-1]
+        }
+    roots.sort(key=lambda record: record["duration"], reverse=True)
+    return {"spans": spans, "slowest": roots[:slowest]}
+
+
+atexit.register(shutdown_tracing)
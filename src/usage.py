@@ -0,0 +1,213 @@
+"""
+Consommation de tokens - Phase 5
+Relevé de response.usage à chaque appel (entrée, sortie, lecture/écriture de cache),
+agrégats par session et par type d'action, budgets de session et de prompt
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Caractères par token avant le premier appel (affiné ensuite par les relevés réels)
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+
+class TokenUsage:
+    """Tokens consommés par un ou plusieurs appels"""
+    
+    __slots__ = (
+        "input_tokens", "output_tokens",
+        "cache_read_input_tokens", "cache_creation_input_tokens", "calls"
+    )
+    
+    def __init__(
+        self,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cache_read_input_tokens: int = 0,
+        cache_creation_input_tokens: int = 0,
+        calls: int = 0
+    ):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.cache_read_input_tokens = cache_read_input_tokens
+        self.cache_creation_input_tokens = cache_creation_input_tokens
+        self.calls = calls
+    
+    @classmethod
+    def from_response(cls, usage: Any) -> "TokenUsage":
+        """Construit depuis response.usage du SDK (champs absents ou None = 0)"""
+        return cls(
+            input_tokens=getattr(usage, "input_tokens", None) or 0,
+            output_tokens=getattr(usage, "output_tokens", None) or 0,
+            cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+            cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+            calls=1
+        )
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TokenUsage":
+        """Construit depuis la forme stockée dans l'historique"""
+        return cls(**{key: int(data.get(key, 0) or 0) for key in cls.__slots__})
+    
+    @property
+    def prompt_tokens(self) -> int:
+        """Tokens du prompt, cache compris"""
+        return self.input_tokens + self.cache_read_input_tokens + self.cache_creation_input_tokens
+    
+    @property
+    def total_tokens(self) -> int:
+        """Tokens du prompt et de la réponse"""
+        return self.prompt_tokens + self.output_tokens
+    
+    def add(self, other: "TokenUsage") -> None:
+        """Ajoute les tokens d'un autre relevé"""
+        for key in self.__slots__:
+            setattr(self, key, getattr(self, key) + getattr(other, key))
+    
+    def to_dict(self) -> Dict[str, int]:
+        return {key: getattr(self, key) for key in self.__slots__}
+    
+    def format(self) -> str:
+        """Forme courte pour affichage"""
+        text = f"entrée {self.input_tokens} | sortie {self.output_tokens}"
+        if self.cache_read_input_tokens or self.cache_creation_input_tokens:
+            text += (
+                f" | cache lu {self.cache_read_input_tokens}"
+                f" / écrit {self.cache_creation_input_tokens}"
+            )
+        return text
+
+
+class TokenBudget:
+    """
+    Limites de tokens d'une session
+    
+    - max_session_tokens: au-delà, les appels suivants sont refusés
+    - max_prompt_tokens: le contexte d'historique, puis les messages les plus
+      anciens de la conversation sont retirés du prompt pour rester sous la limite
+      (limite abaissée au reste du budget de session s'il est plus petit)
+    """
+    
+    def __init__(
+        self,
+        max_session_tokens: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None
+    ):
+        self.max_session_tokens = max_session_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+
+
+class UsageTracker:
+    """Agrégats de tokens d'une session (total et par type d'action), thread-safe"""
+    
+    def __init__(self, budget: Optional[TokenBudget] = None):
+        """
+        Args:
+            budget: Limites de la session (optionnel)
+        """
+        self.budget = budget or TokenBudget()
+        self.total = TokenUsage()
+        self.by_action: Dict[str, TokenUsage] = {}
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+        self._lock = threading.Lock()
+    
+    def record(self, action: str, usage: TokenUsage, prompt_chars: int = 0) -> None:
+        """
+        Comptabilise un appel
+        
+        Args:
+            action: Action décidée par le LLM (error si réponse invalide)
+            usage: Tokens relevés dans response.usage
+            prompt_chars: Taille du prompt envoyé, pour affiner l'estimation
+        """
+        with self._lock:
+            self.total.add(usage)
+            self.by_action.setdefault(action, TokenUsage()).add(usage)
+            if prompt_chars and usage.prompt_tokens:
+                self.chars_per_token = prompt_chars / usage.prompt_tokens
+    
+    def exhausted(self) -> bool:
+        """True si le budget de session est épuisé"""
+        limit = self.budget.max_session_tokens
+        return limit is not None and self.total.total_tokens >= limit
+    
+    def estimate_tokens(self, chars: int) -> int:
+        """Estimation du nombre de tokens d'un texte (ratio observé sur la session)"""
+        return int(chars / self.chars_per_token) + 1
+    
+    def prompt_limit(self) -> Optional[int]:
+        """Tokens de prompt autorisés: max_prompt_tokens, borné par le reste du budget de session"""
+        limits = []
+        if self.budget.max_prompt_tokens is not None:
+            limits.append(self.budget.max_prompt_tokens)
+        if self.budget.max_session_tokens is not None:
+            with self._lock:
+                limits.append(max(0, self.budget.max_session_tokens - self.total.total_tokens))
+        return min(limits) if limits else None
+    
+    def fit_prompt(self, messages: List[Dict[str, Any]], system_prompt: str, context: str = "") -> str:
+        """
+        Ajuste le prompt à prompt_limit(): le contexte d'historique est retiré
+        en premier, puis les échanges les plus anciens (voir trim_messages)
+        
+        Args:
+            messages: Conversation (modifiée sur place)
+            system_prompt: Prompt système envoyé avec la conversation
+            context: Contexte d'historique ajouté à l'instruction courante
+        
+        Returns:
+            Contexte à envoyer ("" s'il a été retiré)
+        """
+        limit = self.prompt_limit()
+        if limit is None:
+            return context
+        chars = len(system_prompt) + sum(len(str(message["content"])) for message in messages)
+        if context and self.estimate_tokens(chars + len(context)) > limit:
+            logger.info("Budget prompt: contexte d'historique retiré (%s caractères)", len(context))
+            context = ""
+        self.trim_messages(messages, system_prompt + context)
+        return context
+    
+    def trim_messages(self, messages: List[Dict[str, Any]], system_prompt: str) -> int:
+        """
+        Retire les échanges les plus anciens pour respecter prompt_limit()
+        
+        Le dernier message (l'instruction courante) est toujours conservé.
+        Les messages sont retirés par paires utilisateur/assistant pour garder l'alternance.
+        
+        Args:
+            messages: Conversation (modifiée sur place)
+            system_prompt: Prompt système envoyé avec la conversation
+        
+        Returns:
+            Nombre de messages retirés
+        """
+        limit = self.prompt_limit()
+        if limit is None:
+            return 0
+        chars = len(system_prompt) + sum(len(str(message["content"])) for message in messages)
+        removed = 0
+        while len(messages) > 2 and self.estimate_tokens(chars) > limit:
+            for message in messages[:2]:
+                chars -= len(str(message["content"]))
+            del messages[:2]
+            removed += 2
+        if removed:
+            logger.info("Budget prompt: %s messages anciens retirés du contexte", removed)
+        return removed
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict avec total, by_action ({action: tokens}) et budget
+        """
+        with self._lock:
+            return {
+                "total": self.total.to_dict(),
+                "by_action": {action: usage.to_dict() for action, usage in self.by_action.items()},
+                "max_session_tokens": self.budget.max_session_tokens,
+                "max_prompt_tokens": self.budget.max_prompt_tokens
+            }